@@ -10,13 +10,40 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
 import os
 from datetime import datetime
-import sqlite3
 
 # Configuration de l'application
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'ief-louga-secret-key-2025'
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///ief_louga.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Instrumentation des requêtes SQL
+    SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 200))
+    SLOW_QUERY_LOG = os.environ.get('SLOW_QUERY_LOG', 'slow_queries.log')
+    DEBUG_QUERIES = os.environ.get('DEBUG_QUERIES', '0') == '1'
+    DEBUG_QUERIES_HISTORY = int(os.environ.get('DEBUG_QUERIES_HISTORY', 50))
+    QUERY_AUDIT = os.environ.get('QUERY_AUDIT', '0') == '1'
+    # Garde-fou : budget par requête HTTP (0 = illimité), surchargé par route
+    QUERY_TIME_BUDGET_MS = float(os.environ.get('QUERY_TIME_BUDGET_MS', 3000))
+    QUERY_STEP_BUDGET = int(os.environ.get('QUERY_STEP_BUDGET', 100_000_000))
+    QUERY_BUDGETS = {
+        'personnel.api_export': (15000, 500_000_000),
+        'etablissements.api_export': (15000, 500_000_000),
+        'rapports.export_complete_excel': (15000, 500_000_000),
+        'rapports.export_executive_pdf': (10000, 300_000_000),
+        'rapports.api_constructeur_export': (15000, 500_000_000),
+        'rapports.api_pivot_export': (15000, 500_000_000),
+        'rapports.pivot_html': (15000, 500_000_000),
+    }
+    # Profilage à la demande (désactivé sans jeton)
+    PROFILING_TOKEN = os.environ.get('PROFILING_TOKEN', '')
+    PROFILING_DIR = os.environ.get('PROFILING_DIR', 'profils')
+    PROFILING_INTERVAL = float(os.environ.get('PROFILING_INTERVAL', 0.005))
+    # Pages d'analyses servies par le moteur en colonnes (si NumPy est installé)
+    ANALYTICS_NUMPY = os.environ.get('ANALYTICS_NUMPY', '1') == '1'
+    # Listes JSON sérialisées par SQLite (json_group_array) plutôt que par jsonify
+    JSON_SQL = os.environ.get('JSON_SQL', '1') == '1'
+    # Constructeur de rapports : coût estimé maximal (lignes visitées, 0 = illimité)
+    REPORT_COST_LIMIT = int(os.environ.get('REPORT_COST_LIMIT', 20_000_000))
 
 # Initialisation des extensions
 db = SQLAlchemy()
@@ -31,18 +58,35 @@ def create_app():
     db.init_app(app)
     cors.init_app(app)
     
+    from app.instrumentation import init_instrumentation
+    from app.profilage import init_profilage
+    init_instrumentation(app)
+    init_profilage(app)
+    
     # Enregistrement des blueprints
     from app.blueprints.main import main_bp
     from app.blueprints.api import api_bp
     from app.blueprints.etablissements import etablissements_bp
     from app.blueprints.personnel import personnel_bp
     from app.blueprints.rapports import rapports_bp
+    from app.blueprints.metriques import metriques_bp
     
     app.register_blueprint(main_bp)
     app.register_blueprint(api_bp, url_prefix='/api')
     app.register_blueprint(etablissements_bp, url_prefix='/etablissements')
     app.register_blueprint(personnel_bp, url_prefix='/personnel')
     app.register_blueprint(rapports_bp, url_prefix='/rapports')
+    app.register_blueprint(metriques_bp)
+    
+    # Chronologie des requêtes SQL, uniquement si DEBUG_QUERIES=1
+    if app.config['DEBUG_QUERIES']:
+        from app.blueprints.debug import debug_bp
+        app.register_blueprint(debug_bp, url_prefix='/debug')
+    
+    # Profils cProfile / flamegraph, uniquement si PROFILING_TOKEN est défini
+    if app.config['PROFILING_TOKEN']:
+        from app.blueprints.profilage import profilage_bp
+        app.register_blueprint(profilage_bp, url_prefix='/debug/profils')
     
     # Filtres personnalisés pour les templates
     @app.template_filter('format_number')
@@ -69,6 +113,15 @@ def create_app():
     def internal_error(error):
         return render_template('errors/500.html'), 500
     
+    @app.errorhandler(RequeteTropCouteuse)
+    def requete_trop_couteuse(error):
+        conseil = ("Affinez les filtres (commune, établissement, corps, grade...) "
+                   "ou consultez les résultats page par page.")
+        if request.blueprint == 'api' or '/api/' in request.path:
+            return jsonify({'error': str(error), 'motif': error.motif, 'conseil': conseil}), error.code
+        return render_template('errors/requete_trop_couteuse.html',
+                             erreur=error, conseil=conseil), error.code
+    
     return app
 
 # Classes de modèles pour l'ORM (optionnel, on utilise directement SQLite)
@@ -108,6 +161,11 @@ class Etablissement(db.Model):
     date_creation = db.Column(db.Date)
     date_ouverture = db.Column(db.Date)
     observations = db.Column(db.Text)
+    coordonnees_validees = db.Column(db.Integer, default=0)
+    directeur_valide = db.Column(db.Integer, default=0)
+    dates_coherentes = db.Column(db.Integer, default=1)
+    notes_qualite = db.Column(db.Text)
+    qualite_score = db.Column(db.Integer)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relations
@@ -139,42 +197,11 @@ class Personnel(db.Model):
     date_arrivee_poste = db.Column(db.Date)
     situation_matrimoniale = db.Column(db.String(50))
     nombre_enfants = db.Column(db.Integer)
+    qualite_score = db.Column(db.Integer)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 # Fonctions utilitaires pour les requêtes directes SQLite
-def get_db_connection():
-    """Obtient une connexion à la base de données SQLite"""
-    conn = sqlite3.connect('ief_louga.db')
-    conn.row_factory = sqlite3.Row  # Pour avoir des résultats sous forme de dictionnaire
-    return conn
-
-def execute_query(query, params=None):
-    """Exécute une requête et retourne les résultats"""
-    conn = get_db_connection()
-    try:
-        if params:
-            cursor = conn.execute(query, params)
-        else:
-            cursor = conn.execute(query)
-        
-        results = cursor.fetchall()
-        return [dict(row) for row in results]
-    finally:
-        conn.close()
-
-def execute_query_single(query, params=None):
-    """Exécute une requête et retourne un seul résultat"""
-    conn = get_db_connection()
-    try:
-        if params:
-            cursor = conn.execute(query, params)
-        else:
-            cursor = conn.execute(query)
-        
-        result = cursor.fetchone()
-        return dict(result) if result else None
-    finally:
-        conn.close()
+from app.database import get_db_connection, execute_query, execute_query_single, RequeteTropCouteuse
 
 if __name__ == '__main__':
     app = create_app()
@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Moteur d'analyses en colonnes (NumPy, optionnel)
+Le personnel et les établissements sont chargés une fois par génération des
+données en tableaux de codes entiers (catégories, dates en années) ; les
+agrégats des pages d'analyses sont calculés par bincount/unique vectorisés.
+Sans NumPy, ou avec ANALYTICS_NUMPY=0, les pages gardent leurs requêtes SQL.
+Les résultats reproduisent ceux des requêtes SQL (mêmes clés, mêmes arrondis).
+"""
+
+import math
+
+from flask import current_app
+
+from app import get_db_connection
+from app.generation import CacheGeneration
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Année de référence de l'ancienneté (identique aux requêtes SQL)
+ANNEE_REFERENCE = 2024
+
+
+def arrondi(valeur):
+    """ROUND(x, 1) de SQLite : demi arrondi à l'unité supérieure"""
+    return math.floor(valeur * 10 + 0.5) / 10
+
+
+def categoriser(valeurs):
+    """(codes, libellés) ; None et '' reçoivent le code -1"""
+    libelles = {}
+    codes = [libelles.setdefault(v, len(libelles)) if v else -1 for v in valeurs]
+    return np.array(codes, dtype=np.int64), list(libelles)
+
+
+def ordonner(lignes, cle):
+    """Tri décroissant stable après le tri des groupes par libellé (ordre du GROUP BY)"""
+    return sorted(lignes, key=cle, reverse=True)
+
+
+class ColonnesAnalytiques:
+    """Colonnes du personnel, des établissements et des communes"""
+
+    def __init__(self, conn):
+        # Communes (ordre des identifiants, comme GROUP BY c.id)
+        communes = conn.execute("SELECT id, nom, arrondissement FROM communes ORDER BY id").fetchall()
+        self.commune_ids = np.array([c[0] for c in communes], dtype=np.int64)
+        self.commune_noms = [c[1] for c in communes]
+        self.commune_arrondissements = [c[2] for c in communes]
+
+        # Établissements
+        lignes = conn.execute("""
+            SELECT id, type_etablissement, statut_code, COALESCE(commune_id, -1),
+                   coordonnees_x IS NOT NULL, directeur IS NOT NULL
+            FROM etablissements
+            ORDER BY id
+        """).fetchall()
+        self.etab_ids = np.array([l[0] for l in lignes], dtype=np.int64)
+        self.etab_type, self.types = categoriser(l[1] for l in lignes)
+        self.etab_statut = np.array([l[2] for l in lignes], dtype=np.int64)
+        self.etab_commune = self._positions(self.commune_ids, np.array([l[3] for l in lignes], dtype=np.int64))
+        self.etab_geolocalise = np.array([l[4] for l in lignes], dtype=bool)
+        self.etab_directeur = np.array([l[5] for l in lignes], dtype=bool)
+
+        # Personnel : clés des dimensions, -1 pour NULL
+        lignes = conn.execute("""
+            SELECT COALESCE(corps_id, -1), COALESCE(grade_id, -1), COALESCE(fonction_id, -1),
+                   genre_code, COALESCE(etablissement_id, -1),
+                   service IS NOT NULL AND service != '',
+                   date_entree_enseignement IS NOT NULL,
+                   COALESCE(CAST(SUBSTR(date_entree_enseignement, 1, 4) AS INTEGER), 0),
+                   diplome_academique
+            FROM personnel
+        """).fetchall()
+        colonnes = np.array([l[:8] for l in lignes], dtype=np.int64).reshape(-1, 8)
+        self.corps, self.grade, self.fonction = colonnes[:, 0], colonnes[:, 1], colonnes[:, 2]
+        self.genre = colonnes[:, 3]
+        self.etablissement_id = colonnes[:, 4]
+        self.service = colonnes[:, 5].astype(bool)
+        self.a_date_entree = colonnes[:, 6].astype(bool)
+        self.annee_entree = colonnes[:, 7]
+        self.diplome, self.diplomes = categoriser(l[8] for l in lignes)
+        self.etablissement = self._positions(self.etab_ids, self.etablissement_id)
+
+        self.libelles = {
+            'corps': dict(conn.execute("SELECT id, libelle FROM dim_corps").fetchall()),
+            'grade': dict(conn.execute("SELECT id, libelle FROM dim_grades").fetchall()),
+            'fonction': dict(conn.execute("SELECT id, libelle FROM dim_fonctions").fetchall()),
+        }
+
+        # Effectif de chaque établissement
+        rattaches = self.etablissement[self.etablissement >= 0]
+        self.effectif_etab = np.bincount(rattaches, minlength=len(self.etab_ids))
+
+    @staticmethod
+    def _positions(ids_tries, valeurs):
+        """Position de chaque valeur dans ids_tries ; -1 si absente"""
+        if not len(ids_tries):
+            return np.full(len(valeurs), -1, dtype=np.int64)
+        positions = np.searchsorted(ids_tries, valeurs)
+        positions = np.minimum(positions, len(ids_tries) - 1)
+        return np.where(ids_tries[positions] == valeurs, positions, -1)
+
+    @staticmethod
+    def _compter(codes, taille, masque=None):
+        """Effectif par code (codes >= 0), éventuellement restreint au masque"""
+        valides = codes >= 0
+        if masque is not None:
+            valides &= masque
+        return np.bincount(codes[valides], minlength=taille)
+
+    @staticmethod
+    def _groupes(codes, libelles):
+        """[(libellé, code)] des codes présents, triés par libellé (ordre du GROUP BY)"""
+        return sorted((libelles[c], c) for c in np.unique(codes[codes >= 0]).tolist())
+
+    # Pages d'analyses du personnel
+
+    def analyses_personnel(self):
+        taille = max(self.corps.max(initial=-1), self.grade.max(initial=-1),
+                     self.fonction.max(initial=-1), self.diplome.max(initial=-1)) + 1
+        hommes, femmes = self.genre == 1, self.genre == 2
+        affectes = self.etablissement_id >= 0
+
+        # Par corps
+        total = self._compter(self.corps, taille)
+        nb_hommes = self._compter(self.corps, taille, hommes)
+        nb_femmes = self._compter(self.corps, taille, femmes)
+        nb_affectes = self._compter(self.corps, taille, affectes)
+        nb_service = self._compter(self.corps, taille, self.service)
+        base = int(self.etablissement_id.max(initial=0)) + 1
+        avec_etab = affectes & (self.corps >= 0)
+        paires = np.unique(self.corps[avec_etab] * base + self.etablissement_id[avec_etab])
+        nb_etabs = np.bincount(paires // base, minlength=taille)
+        avec_date = self.a_date_entree & (self.corps >= 0)
+        nb_dates = np.bincount(self.corps[avec_date], minlength=taille)
+        somme_anciennete = np.bincount(self.corps[avec_date],
+                                       weights=ANNEE_REFERENCE - self.annee_entree[avec_date], minlength=taille)
+        analyses_corps = ordonner([{
+            'corps': libelle,
+            'total': int(total[c]),
+            'hommes': int(nb_hommes[c]),
+            'femmes': int(nb_femmes[c]),
+            'affectes_etablissement': int(nb_affectes[c]),
+            'affectes_service': int(nb_service[c]),
+            'etablissements_differents': int(nb_etabs[c]),
+            'anciennete_moyenne': float(somme_anciennete[c] / nb_dates[c]) if nb_dates[c] else None,
+        } for libelle, c in self._groupes(self.corps, self.libelles['corps'])], lambda l: l['total'])
+
+        # Par fonction
+        total = self._compter(self.fonction, taille)
+        nb_hommes = self._compter(self.fonction, taille, hommes)
+        nb_femmes = self._compter(self.fonction, taille, femmes)
+        nb_affectes = self._compter(self.fonction, taille, affectes)
+        analyses_fonction = ordonner([{
+            'fonction': libelle,
+            'total': int(total[c]),
+            'hommes': int(nb_hommes[c]),
+            'femmes': int(nb_femmes[c]),
+            'affectes': int(nb_affectes[c]),
+        } for libelle, c in self._groupes(self.fonction, self.libelles['fonction'])], lambda l: l['total'])
+
+        # Par grade
+        total = self._compter(self.grade, taille)
+        nb_affectes = self._compter(self.grade, taille, affectes)
+        analyses_grade = ordonner([{
+            'grade': libelle,
+            'total': int(total[c]),
+            'affectes': int(nb_affectes[c]),
+            'taux_affectation': arrondi(nb_affectes[c] * 100.0 / total[c]),
+        } for libelle, c in self._groupes(self.grade, self.libelles['grade'])], lambda l: l['total'])
+
+        # Par qualification (15 premières)
+        total = self._compter(self.diplome, taille)
+        nb_hommes = self._compter(self.diplome, taille, hommes)
+        nb_femmes = self._compter(self.diplome, taille, femmes)
+        qualifications = ordonner([{
+            'diplome_academique': libelle,
+            'total': int(total[c]),
+            'hommes': int(nb_hommes[c]),
+            'femmes': int(nb_femmes[c]),
+        } for libelle, c in self._groupes(self.diplome, self.diplomes)], lambda l: l['total'])[:15]
+
+        return {
+            'analyses_corps': analyses_corps,
+            'analyses_fonction': analyses_fonction,
+            'analyses_grade': analyses_grade,
+            'qualifications': qualifications,
+            'repartition_geo': self._repartition_geo(),
+        }
+
+    def _repartition_geo(self):
+        """Par arrondissement : communes ⟕ établissements ⟕ personnel"""
+        arrondissements = sorted(set(self.commune_arrondissements), key=lambda a: (a is not None, a or ''))
+        code_arrondissement = {a: i for i, a in enumerate(arrondissements)}
+        arr_commune = np.array([code_arrondissement[a] for a in self.commune_arrondissements], dtype=np.int64)
+        taille = len(arrondissements)
+
+        # Établissements rattachés à une commune connue
+        dans_commune = self.etab_commune >= 0
+        arr_etab = np.full(len(self.etab_ids), -1, dtype=np.int64)
+        arr_etab[dans_commune] = arr_commune[self.etab_commune[dans_commune]]
+        nb_etabs = self._compter(arr_etab, taille)
+
+        # Personnel de ces établissements
+        rattaches = self.etablissement >= 0
+        arr_personnel = np.full(len(self.etablissement), -1, dtype=np.int64)
+        arr_personnel[rattaches] = arr_etab[self.etablissement[rattaches]]
+        total = self._compter(arr_personnel, taille)
+        avec_corps = (arr_personnel >= 0) & (self.corps >= 0)
+        base = int(self.corps.max(initial=0)) + 1
+        paires = np.unique(arr_personnel[avec_corps] * base + self.corps[avec_corps])
+        nb_corps = np.bincount(paires // base, minlength=taille)
+
+        return ordonner([{
+            'arrondissement': arrondissement,
+            'total_personnel': int(total[a]),
+            'etablissements_avec_personnel': int(nb_etabs[a]),
+            'corps_differents': int(nb_corps[a]),
+            'personnel_par_etablissement': arrondi(total[a] / nb_etabs[a]) if nb_etabs[a] else None,
+        } for a, arrondissement in enumerate(arrondissements) if total[a] > 0], lambda l: l['total_personnel'])
+
+    # Page d'analyses des établissements
+
+    def analyses_etablissements(self):
+        taille = len(self.types)
+        effectif = self.effectif_etab
+        groupes = self._groupes(self.etab_type, self.types)
+
+        total = self._compter(self.etab_type, taille)
+        par_statut = {code: self._compter(self.etab_type, taille, self.etab_statut == code) for code in (1, 2, 3)}
+        somme_effectif = np.bincount(self.etab_type[self.etab_type >= 0],
+                                     weights=effectif[self.etab_type >= 0], minlength=taille)
+        geolocalises = self._compter(self.etab_type, taille, self.etab_geolocalise)
+        avec_directeur = self._compter(self.etab_type, taille, self.etab_directeur)
+
+        analyses_type = ordonner([{
+            'type_etablissement': libelle,
+            'total': int(total[t]),
+            'publics': int(par_statut[1][t]),
+            'prives': int(par_statut[2][t]),
+            'communautaires': int(par_statut[3][t]),
+            'personnel_moyen': float(somme_effectif[t] / total[t]),
+            'geolocalises': int(geolocalises[t]),
+        } for libelle, t in groupes], lambda l: l['total'])
+
+        performance_type = ordonner([{
+            'type_etablissement': libelle,
+            'nombre': int(total[t]),
+            'personnel_moyen': float(somme_effectif[t] / total[t]),
+            'avec_directeur': int(avec_directeur[t]),
+            'taux_encadrement': arrondi(avec_directeur[t] * 100.0 / total[t]),
+        } for libelle, t in groupes], lambda l: l['personnel_moyen'])
+
+        # Par commune
+        nb_communes = len(self.commune_ids)
+        dans_commune = self.etab_commune >= 0
+        communes_etab = self.etab_commune[dans_commune]
+        nombre = np.bincount(communes_etab, minlength=nb_communes)
+        personnel = np.bincount(communes_etab, weights=effectif[dans_commune], minlength=nb_communes)
+        avec_type = dans_commune & (self.etab_type >= 0)
+        paires = np.unique(self.etab_commune[avec_type] * max(taille, 1) + self.etab_type[avec_type])
+        nb_types = np.bincount(paires // max(taille, 1), minlength=nb_communes)
+
+        analyses_commune = ordonner([{
+            'commune': self.commune_noms[c],
+            'arrondissement': self.commune_arrondissements[c],
+            'total_etablissements': int(nombre[c]),
+            'types_differents': int(nb_types[c]),
+            'total_personnel': int(personnel[c]),
+            'ratio_personnel_etablissement': arrondi(personnel[c] / nombre[c]),
+        } for c in range(nb_communes) if nombre[c] > 0], lambda l: l['total_etablissements'])
+
+        return {
+            'analyses_type': analyses_type,
+            'analyses_commune': analyses_commune,
+            'performance_type': performance_type,
+        }
+
+
+def construire_colonnes():
+    conn = get_db_connection()
+    try:
+        return ColonnesAnalytiques(conn)
+    finally:
+        conn.close()
+
+
+COLONNES = CacheGeneration(construire_colonnes, nom='analytique_colonnes')
+
+
+def moteur_disponible():
+    return np is not None and current_app.config.get('ANALYTICS_NUMPY', True)
+
+
+def analyses_personnel():
+    """Agrégats de personnel.analytics ; None si le moteur n'est pas disponible"""
+    if not moteur_disponible():
+        return None
+    return COLONNES.obtenir().analyses_personnel()
+
+
+def analyses_etablissements():
+    """Agrégats de etablissements.analytics ; None si le moteur n'est pas disponible"""
+    if not moteur_disponible():
+        return None
+    return COLONNES.obtenir().analyses_etablissements()
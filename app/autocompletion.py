@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Autocomplétion des établissements et des agents
+Index de préfixes en mémoire (tableau trié + recherche dichotomique),
+reconstruit à chaque changement de génération des données
+"""
+
+from bisect import bisect_left
+
+from app import get_db_connection
+from app.generation import CacheGeneration
+from normalisation import normaliser_texte
+
+
+class IndexPrefixes:
+    """Clés normalisées triées ; chaque clé renvoie vers un identifiant"""
+
+    def __init__(self, entrees):
+        """entrees : itérable de (id, libellé, [clés normalisées])"""
+        self.libelles = {}
+        paires = []
+        for ident, libelle, cles in entrees:
+            self.libelles[ident] = libelle
+            paires.extend((cle, ident) for cle in cles if cle)
+        paires.sort()
+        self.cles = [cle for cle, _ in paires]
+        self.ids = [ident for _, ident in paires]
+
+    def __len__(self):
+        return len(self.libelles)
+
+    def chercher(self, prefixe, limite=10):
+        """Identifiants et libellés dont une clé commence par le préfixe"""
+        resultats = []
+        vus = set()
+        position = bisect_left(self.cles, prefixe)
+        while position < len(self.cles) and len(resultats) < limite:
+            if not self.cles[position].startswith(prefixe):
+                break
+            ident = self.ids[position]
+            if ident not in vus:
+                vus.add(ident)
+                resultats.append({'id': ident, 'libelle': self.libelles[ident]})
+            position += 1
+        return resultats
+
+
+def suffixes_mots(texte):
+    """'EE ARTILLERIE NORD' -> ['EE ARTILLERIE NORD', 'ARTILLERIE NORD', 'NORD']"""
+    mots = normaliser_texte(texte).split()
+    return [' '.join(mots[i:]) for i in range(len(mots))]
+
+
+def construire_index_etablissements():
+    conn = get_db_connection()
+    try:
+        cursor = conn.execute("SELECT id, nom FROM etablissements")
+        return IndexPrefixes(
+            (ident, nom, suffixes_mots(nom)) for ident, nom in cursor
+        )
+    finally:
+        conn.close()
+
+
+def construire_index_agents():
+    conn = get_db_connection()
+    try:
+        cursor = conn.execute("SELECT id, matricule, nom, prenom FROM personnel")
+        entrees = []
+        for ident, matricule, nom, prenom in cursor:
+            nom_complet = normaliser_texte(f"{nom} {prenom or ''}")
+            prenom_nom = normaliser_texte(f"{prenom or ''} {nom}")
+            libelle = f"{nom} {prenom or ''} ({matricule})".replace(' ()', '')
+            entrees.append((ident, libelle, [nom_complet, prenom_nom, normaliser_texte(matricule)]))
+        return IndexPrefixes(entrees)
+    finally:
+        conn.close()
+
+
+INDEX_AUTOCOMPLETION = {
+    'etablissement': CacheGeneration(construire_index_etablissements, nom='autocompletion_etablissements'),
+    'agent': CacheGeneration(construire_index_agents, nom='autocompletion_agents'),
+}
+
+
+def autocompleter(kind, requete, limite=10):
+    """Suggestions pour un type ('etablissement' ou 'agent') ; None si type inconnu"""
+    cache = INDEX_AUTOCOMPLETION.get(kind)
+    if cache is None:
+        return None
+    prefixe = normaliser_texte(requete)
+    if not prefixe:
+        return []
+    return cache.obtenir().chercher(prefixe, limite)
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Index bitmap du personnel pour les filtres combinés
+Les agents sont numérotés dans l'ordre d'affichage (nom, prénom) ; chaque
+valeur de facette est un ensemble de positions, stocké en entier Python
+(bit n levé = n-ième agent) ou, pour les valeurs rares, en tableau trié de
+positions. Un filtre combiné est un ET entre facettes et un OU entre les
+valeurs d'une même facette ; le total et les identifiants de la page en
+découlent sans requête SQL
+"""
+
+from array import array
+from collections import defaultdict
+
+from app import get_db_connection
+from app.generation import CacheGeneration
+
+FACETTES_BITMAPS = ('corps', 'grade', 'genre', 'fonction', 'etablissement_id', 'commune_id')
+
+# En dessous d'une position levée sur 32, un tableau d'entiers 32 bits est
+# plus compact que le bitmap
+DENSITE_BITMAP = 32
+
+# Octets parcourus d'un coup lors de la recherche des positions d'une page
+TAILLE_BLOC = 64
+
+
+if hasattr(int, 'bit_count'):
+    def compter_bits(bitmap):
+        return bitmap.bit_count()
+else:  # Python < 3.10
+    def compter_bits(bitmap):
+        return bin(bitmap).count('1')
+
+
+class IndexBitmaps:
+    """Positions des agents par valeur de facette"""
+
+    def __init__(self, lignes):
+        """lignes : (id, valeur de chaque facette), dans l'ordre d'affichage"""
+        self.ids = array('q')
+        positions = {facette: defaultdict(list) for facette in FACETTES_BITMAPS}
+        for position, (ident, *valeurs) in enumerate(lignes):
+            self.ids.append(ident)
+            for facette, valeur in zip(FACETTES_BITMAPS, valeurs):
+                if valeur is not None and valeur != '':
+                    positions[facette][str(valeur)].append(position)
+
+        self.taille = len(self.ids)
+        self.tous = (1 << self.taille) - 1
+        self.conteneurs = {
+            facette: {valeur: self._conteneur(liste) for valeur, liste in valeurs.items()}
+            for facette, valeurs in positions.items()
+        }
+
+    def _conteneur(self, positions):
+        if len(positions) * DENSITE_BITMAP >= self.taille:
+            return self._bitmap(positions)
+        return array('I', positions)
+
+    def _bitmap(self, positions):
+        octets = bytearray((self.taille + 7) // 8)
+        for position in positions:
+            octets[position >> 3] |= 1 << (position & 7)
+        return int.from_bytes(octets, 'little')
+
+    def bitmap(self, facette, valeur):
+        """Bitmap d'une valeur (0 si inconnue)"""
+        conteneur = self.conteneurs[facette].get(str(valeur))
+        if conteneur is None:
+            return 0
+        if isinstance(conteneur, int):
+            return conteneur
+        return self._bitmap(conteneur)
+
+    def filtrer(self, selection):
+        """Bitmap des agents retenus ; selection : {facette: valeur ou liste de valeurs}"""
+        resultat = self.tous
+        for facette in FACETTES_BITMAPS:
+            valeurs = selection.get(facette)
+            if not valeurs:
+                continue
+            if isinstance(valeurs, str):
+                valeurs = [valeurs]
+            union = 0
+            for valeur in valeurs:
+                union |= self.bitmap(facette, valeur)
+            resultat &= union
+            if not resultat:
+                break
+        return resultat
+
+    def page(self, bitmap, debut, nombre):
+        """Identifiants des agents retenus de rang debut à debut + nombre
+
+        Seul le début du bitmap est lu, doublé jusqu'à contenir la fin de la
+        page : le coût suit le rang de la page et non la taille de l'index
+        """
+        fin = TAILLE_BLOC * 8
+        prefixe = bitmap & ((1 << fin) - 1)
+        retenus = compter_bits(prefixe)
+        while fin < self.taille and retenus < debut + nombre:
+            prefixe = bitmap & ((1 << 2 * fin) - 1)
+            retenus += compter_bits(prefixe >> fin)
+            fin *= 2
+        octets = prefixe.to_bytes((min(fin, self.taille) + 7) // 8, 'little')
+        ids = []
+        a_sauter = debut
+        for indice in range(0, len(octets), TAILLE_BLOC):
+            bloc = int.from_bytes(octets[indice:indice + TAILLE_BLOC], 'little')
+            if not bloc:
+                continue
+            nb_bits = compter_bits(bloc)
+            if nb_bits <= a_sauter:
+                a_sauter -= nb_bits
+                continue
+            base = indice * 8
+            while bloc and len(ids) < nombre:
+                bit_bas = bloc & -bloc
+                bloc ^= bit_bas
+                if a_sauter:
+                    a_sauter -= 1
+                    continue
+                ids.append(self.ids[base + bit_bas.bit_length() - 1])
+            if len(ids) >= nombre:
+                break
+        return ids
+
+
+def construire_index_bitmaps():
+    conn = get_db_connection()
+    try:
+        cursor = conn.execute("""
+            SELECT id, corps, grade, genre, fonction, etablissement_id, commune_id
+            FROM personnel_read
+            ORDER BY nom, prenom, id
+        """)
+        return IndexBitmaps(cursor)
+    finally:
+        conn.close()
+
+
+INDEX_BITMAPS = CacheGeneration(construire_index_bitmaps, nom='bitmaps_personnel')
+
+
+def page_personnel(selection, debut, nombre):
+    """(total, identifiants de la page) pour les filtres de la sélection, dans l'ordre nom, prénom"""
+    index = INDEX_BITMAPS.obtenir()
+    bitmap = index.filtrer(selection)
+    return compter_bits(bitmap), index.page(bitmap, debut, nombre)
+
+
+def trier_selon(lignes, ids):
+    """Lignes lues par identifiant, remises dans l'ordre de la page"""
+    rang = {ident: position for position, ident in enumerate(ids)}
+    return sorted(lignes, key=lambda ligne: rang[ligne['id']])
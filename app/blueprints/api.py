@@ -5,44 +5,18 @@ Blueprint API - Endpoints REST pour les données
 """
 
 from flask import Blueprint, jsonify, request
-import sqlite3
 import json
+from collections import defaultdict
 
-api_bp = Blueprint('api', __name__)
-
-def get_db_connection():
-    """Obtient une connexion à la base de données SQLite"""
-    conn = sqlite3.connect('ief_louga.db')
-    conn.row_factory = sqlite3.Row  # Pour avoir des résultats sous forme de dictionnaire
-    return conn
+from app.recherche import condition_recherche
+from app.autocompletion import autocompleter
+from app.bitmaps import page_personnel, trier_selon
+from app.cube import DIMENSIONS, DimensionInconnue, cube
+from app.facettes import facettes_etablissements, facettes_personnel
+from app.database import (champs_table, execute_query, execute_query_json, execute_query_single,
+                          json_sql, reponse_json, tableau_json)
 
-def execute_query(query, params=None):
-    """Exécute une requête et retourne les résultats"""
-    conn = get_db_connection()
-    try:
-        if params:
-            cursor = conn.execute(query, params)
-        else:
-            cursor = conn.execute(query)
-        
-        results = cursor.fetchall()
-        return [dict(row) for row in results]
-    finally:
-        conn.close()
-
-def execute_query_single(query, params=None):
-    """Exécute une requête et retourne un seul résultat"""
-    conn = get_db_connection()
-    try:
-        if params:
-            cursor = conn.execute(query, params)
-        else:
-            cursor = conn.execute(query)
-        
-        result = cursor.fetchone()
-        return dict(result) if result else None
-    finally:
-        conn.close()
+api_bp = Blueprint('api', __name__)
 
 @api_bp.route('/etablissements')
 def api_etablissements():
@@ -64,33 +38,37 @@ def api_etablissements():
         SELECT 
             e.*,
             c.nom as commune_nom,
-            c.arrondissement,
-            (SELECT COUNT(*) FROM personnel p WHERE p.etablissement_id = e.id) as nombre_personnel
+            c.arrondissement
         FROM etablissements e
         LEFT JOIN communes c ON e.commune_id = c.id
         WHERE 1=1
     """
     
+    conditions = ""
     params = []
     
     if type_etablissement:
-        query += " AND e.type_etablissement = ?"
+        conditions += " AND e.type_etablissement = ?"
         params.append(type_etablissement)
     
     if commune_id:
-        query += " AND e.commune_id = ?"
+        conditions += " AND e.commune_id = ?"
         params.append(commune_id)
     
     if statut:
-        query += " AND e.statut LIKE ?"
+        conditions += " AND e.statut LIKE ?"
         params.append(f'%{statut}%')
     
     if search:
-        query += " AND (e.nom LIKE ? OR e.directeur LIKE ? OR c.nom LIKE ?)"
+        conditions += " AND (e.nom LIKE ? OR e.directeur LIKE ? OR c.nom LIKE ?)"
         params.extend([f'%{search}%', f'%{search}%', f'%{search}%'])
     
-    # Compter le total
-    count_query = f"SELECT COUNT(*) as total FROM ({query}) as subq"
+    query += conditions
+    
+    # Compter le total (jointure des communes seulement pour la recherche :
+    # sinon le comptage est couvert par les index composites)
+    jointure_communes = " LEFT JOIN communes c ON e.commune_id = c.id" if search else ""
+    count_query = f"SELECT COUNT(*) as total FROM etablissements e{jointure_communes} WHERE 1=1{conditions}"
     total = execute_query_single(count_query, params)['total']
     
     # Ajouter pagination
@@ -115,110 +93,159 @@ def api_personnel():
     
     # Paramètres de filtrage
     etablissement_id = request.args.get('etablissement_id')
+    commune_id = request.args.get('commune_id')
     corps = request.args.get('corps')
     grade = request.args.get('grade')
     fonction = request.args.get('fonction')
     genre = request.args.get('genre')
     search = request.args.get('search', '').strip()
     
-    # Pagination
-    page = int(request.args.get('page', 1))
+    # Pagination (page 0 ou négative : première page, quel que soit le chemin suivi)
+    page = max(int(request.args.get('page', 1)), 1)
     per_page = int(request.args.get('per_page', 25))
     offset = (page - 1) * per_page
     
     # Construction de la requête
     query = """
-        SELECT 
-            p.*,
-            e.nom as etablissement_nom,
-            e.type_etablissement,
-            c.nom as commune_nom
-        FROM personnel p
-        LEFT JOIN etablissements e ON p.etablissement_id = e.id
-        LEFT JOIN communes c ON e.commune_id = c.id
-        WHERE 1=1
+        SELECT p.*
+        FROM personnel_read p
     """
     
-    params = []
-    
-    if etablissement_id:
-        query += " AND p.etablissement_id = ?"
-        params.append(etablissement_id)
-    
-    if corps:
-        query += " AND p.corps = ?"
-        params.append(corps)
-    
-    if grade:
-        query += " AND p.grade = ?"
-        params.append(grade)
-    
-    if fonction:
-        query += " AND p.fonction = ?"
-        params.append(fonction)
-    
-    if genre:
-        query += " AND p.genre = ?"
-        params.append(genre)
-    
-    if search:
-        query += " AND (p.nom LIKE ? OR p.prenom LIKE ? OR p.matricule LIKE ?)"
-        params.extend([f'%{search}%', f'%{search}%', f'%{search}%'])
-    
-    # Compter le total
-    count_query = f"SELECT COUNT(*) as total FROM ({query}) as subq"
-    total = execute_query_single(count_query, params)['total']
-    
-    # Ajouter pagination
-    query += " ORDER BY p.nom, p.prenom LIMIT ? OFFSET ?"
-    params.extend([per_page, offset])
-    
-    personnel = execute_query(query, params)
-    
+    if not search:
+        # Filtres seuls : total et page lus dans l'index bitmap, SQL ne lit que les lignes de la page
+        total, ids = page_personnel({
+            'etablissement_id': etablissement_id,
+            'commune_id': commune_id,
+            'corps': corps,
+            'grade': grade,
+            'fonction': fonction,
+            'genre': genre
+        }, offset, per_page)
+        
+        personnel = []
+        if json_sql():
+            # Lignes dans l'ordre de la page (rang dans json_each), sérialisées par SQLite
+            personnel = execute_query_json(tableau_json(champs_table('p', 'personnel_read'), """
+                FROM json_each(?) j
+                JOIN personnel_read p ON p.id = j.value
+                ORDER BY j.key
+            """), [json.dumps(ids)]) if ids else '[]'
+        elif ids:
+            query += f" WHERE p.id IN ({', '.join('?' * len(ids))})"
+            personnel = trier_selon(execute_query(query, ids), ids)
+    else:
+        conditions = ""
+        params = []
+        
+        if etablissement_id:
+            conditions += " AND p.etablissement_id = ?"
+            params.append(etablissement_id)
+        
+        if commune_id:
+            conditions += " AND p.commune_id = ?"
+            params.append(commune_id)
+        
+        if corps:
+            conditions += " AND p.corps = ?"
+            params.append(corps)
+        
+        if grade:
+            conditions += " AND p.grade = ?"
+            params.append(grade)
+        
+        if fonction:
+            conditions += " AND p.fonction = ?"
+            params.append(fonction)
+        
+        if genre:
+            conditions += " AND p.genre = ?"
+            params.append(genre)
+        
+        condition, condition_params = condition_recherche(search)
+        conditions += " AND " + condition
+        params.extend(condition_params)
+        
+        query += " WHERE 1=1" + conditions
+        
+        # Compter le total (couvert par les index composites)
+        count_query = f"SELECT COUNT(*) as total FROM personnel_read p WHERE 1=1{conditions}"
+        total = execute_query_single(count_query, params)['total']
+        
+        # Ajouter pagination
+        query += " ORDER BY p.nom, p.prenom LIMIT ? OFFSET ?"
+        params.extend([per_page, offset])
+        
+        if json_sql():
+            source = "FROM personnel_read p WHERE 1=1" + conditions + " ORDER BY p.nom, p.prenom LIMIT ? OFFSET ?"
+            personnel = execute_query_json(tableau_json(champs_table('p', 'personnel_read'), source), params)
+        else:
+            personnel = execute_query(query, params)
+    
+    pagination = {
+        'page': page,
+        'per_page': per_page,
+        'total': total,
+        'pages': (total + per_page - 1) // per_page
+    }
+    if json_sql():
+        return reponse_json({'personnel': personnel, 'pagination': json.dumps(pagination)})
     return jsonify({
         'personnel': personnel,
-        'pagination': {
-            'page': page,
-            'per_page': per_page,
-            'total': total,
-            'pages': (total + per_page - 1) // per_page
-        }
+        'pagination': pagination
     })
 
 @api_bp.route('/communes')
 def api_communes():
     """API pour lister les communes"""
+    if json_sql():
+        communes = execute_query_json(tableau_json(champs_table('c', 'communes'), "FROM communes c ORDER BY c.nom"))
+        return reponse_json({'communes': communes})
+    
     communes = execute_query("""
-        SELECT 
-            c.*,
-            COUNT(e.id) as nombre_etablissements
+        SELECT c.*
         FROM communes c
-        LEFT JOIN etablissements e ON c.id = e.commune_id
-        GROUP BY c.id, c.nom
         ORDER BY c.nom
     """)
     
     return jsonify({'communes': communes})
 
+@api_bp.route('/cube')
+def api_cube():
+    """Tableau croisé des effectifs : ?dims=corps,genre&filters=commune:Louga,statut:Public
+
+    Les valeurs des filtres sont comparées exactement (casse comprise).
+    """
+    
+    dimensions = [d.strip() for d in request.args.get('dims', '').split(',') if d.strip()]
+    
+    # Une même dimension répétée dans filters accepte plusieurs valeurs
+    filtres = defaultdict(list)
+    for clause in request.args.get('filters', '').split(','):
+        if ':' in clause:
+            dimension, valeur = clause.split(':', 1)
+            filtres[dimension.strip()].append(valeur.strip())
+    
+    try:
+        cellules = cube(dimensions, filtres)
+    except DimensionInconnue as e:
+        return jsonify({'error': f'Dimension inconnue : {e}', 'dimensions': list(DIMENSIONS)}), 400
+    
+    return jsonify({
+        'dims': dimensions,
+        'filters': filtres,
+        'cellules': cellules
+    })
+
 @api_bp.route('/filters/etablissements')
 def api_filters_etablissements():
-    """API pour les options de filtrage des établissements"""
-    
-    # Types d'établissements
-    types = execute_query("""
-        SELECT DISTINCT type_etablissement
-        FROM etablissements
-        WHERE type_etablissement IS NOT NULL
-        ORDER BY type_etablissement
-    """)
+    """API pour les options de filtrage des établissements, avec l'effectif de chaque valeur"""
     
-    # Statuts
-    statuts = execute_query("""
-        SELECT DISTINCT statut
-        FROM etablissements
-        WHERE statut IS NOT NULL
-        ORDER BY statut
-    """)
+    # Types, statuts et effectifs pour la sélection courante (cache par génération)
+    total, effectifs = facettes_etablissements({
+        'type_etablissement': request.args.get('type_etablissement', ''),
+        'statut': request.args.get('statut', ''),
+        'commune_id': request.args.get('commune_id', '')
+    })
     
     # Communes
     communes = execute_query("""
@@ -228,52 +255,33 @@ def api_filters_etablissements():
     """)
     
     return jsonify({
-        'types': [t['type_etablissement'] for t in types],
-        'statuts': [s['statut'] for s in statuts],
-        'communes': communes
+        'types': list(effectifs['type_etablissement']),
+        'statuts': list(effectifs['statut']),
+        'communes': communes,
+        'total': total,
+        'effectifs': effectifs
     })
 
 @api_bp.route('/filters/personnel')
 def api_filters_personnel():
-    """API pour les options de filtrage du personnel"""
-    
-    # Corps
-    corps = execute_query("""
-        SELECT DISTINCT corps
-        FROM personnel
-        WHERE corps IS NOT NULL AND corps != ''
-        ORDER BY corps
-    """)
-    
-    # Grades
-    grades = execute_query("""
-        SELECT DISTINCT grade
-        FROM personnel
-        WHERE grade IS NOT NULL AND grade != ''
-        ORDER BY grade
-    """)
-    
-    # Fonctions
-    fonctions = execute_query("""
-        SELECT DISTINCT fonction
-        FROM personnel
-        WHERE fonction IS NOT NULL AND fonction != ''
-        ORDER BY fonction
-    """)
-    
-    # Genres
-    genres = execute_query("""
-        SELECT DISTINCT genre
-        FROM personnel
-        WHERE genre IS NOT NULL AND genre != ''
-        ORDER BY genre
-    """)
+    """API pour les options de filtrage du personnel, avec l'effectif de chaque valeur"""
+    
+    # Corps, grades, fonctions, genres et effectifs pour la sélection courante (cache par génération)
+    total, effectifs = facettes_personnel({
+        'corps': request.args.get('corps', ''),
+        'grade': request.args.get('grade', ''),
+        'fonction': request.args.get('fonction', ''),
+        'genre': request.args.get('genre', ''),
+        'etablissement_id': request.args.get('etablissement_id', '')
+    })
     
     return jsonify({
-        'corps': [c['corps'] for c in corps],
-        'grades': [g['grade'] for g in grades],
-        'fonctions': [f['fonction'] for f in fonctions],
-        'genres': [g['genre'] for g in genres]
+        'corps': list(effectifs['corps']),
+        'grades': list(effectifs['grade']),
+        'fonctions': list(effectifs['fonction']),
+        'genres': list(effectifs['genre']),
+        'total': total,
+        'effectifs': effectifs
     })
 
 @api_bp.route('/etablissement/<int:etablissement_id>')
@@ -306,8 +314,8 @@ def api_etablissement_detail(etablissement_id):
     stats_personnel = execute_query_single("""
         SELECT 
             COUNT(*) as total,
-            COUNT(CASE WHEN genre = 'M' OR genre = 'H' THEN 1 END) as hommes,
-            COUNT(CASE WHEN genre = 'F' THEN 1 END) as femmes
+            COUNT(CASE WHEN genre_code = 1 THEN 1 END) as hommes,
+            COUNT(CASE WHEN genre_code = 2 THEN 1 END) as femmes
         FROM personnel
         WHERE etablissement_id = ?
     """, [etablissement_id])
@@ -323,14 +331,8 @@ def api_personnel_detail(personnel_id):
     """Détails d'une personne"""
     
     personne = execute_query_single("""
-        SELECT 
-            p.*,
-            e.nom as etablissement_nom,
-            e.type_etablissement,
-            c.nom as commune_nom
-        FROM personnel p
-        LEFT JOIN etablissements e ON p.etablissement_id = e.id
-        LEFT JOIN communes c ON e.commune_id = c.id
+        SELECT p.*
+        FROM personnel_read p
         WHERE p.id = ?
     """, [personnel_id])
     
@@ -339,6 +341,171 @@ def api_personnel_detail(personnel_id):
     
     return jsonify({'personne': personne})
 
+@api_bp.route('/autocomplete')
+def api_autocomplete():
+    """Suggestions d'établissements ou d'agents à partir d'un préfixe"""
+    
+    kind = request.args.get('kind', 'etablissement')
+    q = request.args.get('q', '')
+    limit = min(max(request.args.get('limit', 10, type=int), 1), 50)
+    
+    resultats = autocompleter(kind, q, limit)
+    if resultats is None:
+        return jsonify({'error': 'Type inconnu (etablissement ou agent)'}), 400
+    
+    return jsonify({
+        'kind': kind,
+        'q': q,
+        'resultats': resultats
+    })
+
+@api_bp.route('/doublons')
+def api_doublons():
+    """API pour lister les doublons potentiels du personnel"""
+
+    # Paramètres de filtrage
+    score_min = min(max(request.args.get('score_min', 0, type=float), 0.0), 1.0)
+    statut = request.args.get('statut')
+
+    # Pagination
+    page = int(request.args.get('page', 1))
+    per_page = int(request.args.get('per_page', 25))
+    offset = (page - 1) * per_page
+
+    conditions = ["d.score >= ?"]
+    params = [score_min]
+
+    if statut:
+        conditions.append("d.statut = ?")
+        params.append(statut)
+
+    where_clause = " WHERE " + " AND ".join(conditions)
+
+    total = execute_query_single(
+        "SELECT COUNT(*) as total FROM doublons_personnel d" + where_clause, params
+    )['total']
+
+    doublons = execute_query("""
+        SELECT
+            d.id, d.score, d.motifs, d.statut,
+            d.personnel_id_1, p1.matricule as matricule_1, p1.nom as nom_1, p1.prenom as prenom_1,
+            d.personnel_id_2, p2.matricule as matricule_2, p2.nom as nom_2, p2.prenom as prenom_2
+        FROM doublons_personnel d
+        JOIN personnel p1 ON d.personnel_id_1 = p1.id
+        JOIN personnel p2 ON d.personnel_id_2 = p2.id
+    """ + where_clause + " ORDER BY d.score DESC, d.id LIMIT ? OFFSET ?",
+        params + [per_page, offset])
+
+    return jsonify({
+        'doublons': doublons,
+        'pagination': {
+            'page': page,
+            'per_page': per_page,
+            'total': total,
+            'pages': (total + per_page - 1) // per_page
+        }
+    })
+
+@api_bp.route('/personnel/<int:personnel_id>/doublons')
+def api_personnel_doublons(personnel_id):
+    """Doublons potentiels d'une personne"""
+
+    doublons = execute_query("""
+        SELECT
+            d.id, d.score, d.motifs, d.statut,
+            p.id as personnel_id, p.matricule, p.nom, p.prenom,
+            p.date_naissance, p.numero_cni
+        FROM doublons_personnel d
+        JOIN personnel p ON p.id = CASE
+            WHEN d.personnel_id_1 = ? THEN d.personnel_id_2
+            ELSE d.personnel_id_1
+        END
+        WHERE d.personnel_id_1 = ? OR d.personnel_id_2 = ?
+        ORDER BY d.score DESC
+    """, [personnel_id, personnel_id, personnel_id])
+
+    return jsonify({'doublons': doublons})
+
+@api_bp.route('/qualite/<table_source>')
+def api_qualite(table_source):
+    """Synthèse de la qualité des données d'une table (etablissements ou personnel)"""
+
+    if table_source not in ('etablissements', 'personnel'):
+        return jsonify({'error': 'Table inconnue'}), 404
+
+    # Nombre de lignes par règle enfreinte (index idx_anomalies_regle)
+    anomalies = execute_query("""
+        SELECT regle, COUNT(*) as count
+        FROM anomalies_qualite
+        WHERE table_source = ?
+        GROUP BY regle
+        ORDER BY count DESC
+    """, [table_source])
+
+    # Distribution des scores (index sur qualite_score)
+    scores = execute_query(f"""
+        SELECT
+            (qualite_score / 10) * 10 as tranche,
+            COUNT(*) as count
+        FROM {table_source}
+        WHERE qualite_score IS NOT NULL
+        GROUP BY tranche
+        ORDER BY tranche
+    """)
+
+    score_moyen = execute_query_single(
+        f"SELECT ROUND(AVG(qualite_score), 1) as moyenne FROM {table_source}"
+    )['moyenne']
+
+    return jsonify({
+        'table': table_source,
+        'score_moyen': score_moyen,
+        'anomalies': anomalies,
+        'scores': scores
+    })
+
+@api_bp.route('/qualite/<table_source>/<regle>')
+def api_qualite_regle(table_source, regle):
+    """Lignes enfreignant une règle de qualité"""
+
+    if table_source not in ('etablissements', 'personnel'):
+        return jsonify({'error': 'Table inconnue'}), 404
+
+    # Pagination
+    page = int(request.args.get('page', 1))
+    per_page = int(request.args.get('per_page', 25))
+    offset = (page - 1) * per_page
+
+    total = execute_query_single("""
+        SELECT COUNT(*) as total
+        FROM anomalies_qualite
+        WHERE table_source = ? AND regle = ?
+    """, [table_source, regle])['total']
+
+    colonnes = "t.id, t.nom, t.qualite_score"
+    if table_source == 'personnel':
+        colonnes += ", t.prenom, t.matricule"
+
+    lignes = execute_query(f"""
+        SELECT {colonnes}
+        FROM anomalies_qualite a
+        JOIN {table_source} t ON t.id = a.ligne_id
+        WHERE a.table_source = ? AND a.regle = ?
+        ORDER BY a.ligne_id
+        LIMIT ? OFFSET ?
+    """, [table_source, regle, per_page, offset])
+
+    return jsonify({
+        'regle': regle,
+        'lignes': lignes,
+        'pagination': {
+            'page': page,
+            'per_page': per_page,
+            'total': total,
+            'pages': (total + per_page - 1) // per_page
+        }
+    })
+
 @api_bp.route('/export/etablissements')
 def api_export_etablissements():
     """Export des données d'établissements (CSV)"""
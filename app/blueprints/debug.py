@@ -0,0 +1,24 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Blueprint Debug - Chronologie des requêtes SQL par requête HTTP
+Enregistré uniquement lorsque DEBUG_QUERIES=1
+"""
+
+from flask import Blueprint, render_template, jsonify, request, current_app
+
+from app.instrumentation import dernieres_requetes
+
+debug_bp = Blueprint('debug', __name__)
+
+@debug_bp.route('/queries')
+def queries():
+    """Dernières requêtes HTTP avec leurs requêtes SQL chronométrées"""
+    requetes = dernieres_requetes()
+
+    if request.args.get('format') == 'json':
+        return jsonify(requetes)
+
+    return render_template('debug/queries.html',
+                         requetes=requetes,
+                         seuil_lent=current_app.config['SLOW_QUERY_MS'])
@@ -5,46 +5,16 @@ Blueprint Établissements - Gestion et visualisation des établissements
 """
 
 from flask import Blueprint, render_template, request, jsonify, send_file, make_response
-import sqlite3
 import csv
 import io
 from datetime import datetime
 
-etablissements_bp = Blueprint('etablissements', __name__)
-
-def get_db_connection():
-    """Obtient une connexion à la base de données SQLite"""
-    conn = sqlite3.connect('ief_louga.db')
-    conn.row_factory = sqlite3.Row  # Pour avoir des résultats sous forme de dictionnaire
-    return conn
+from app.database import (execute_query, execute_query_single, RequeteTropCouteuse, champs_table,
+                          execute_query_json, json_sql, reponse_json, tableau_json)
+from app.analytique import analyses_etablissements
+from app.facettes import facettes_etablissements
 
-def execute_query(query, params=None):
-    """Exécute une requête et retourne les résultats"""
-    conn = get_db_connection()
-    try:
-        if params:
-            cursor = conn.execute(query, params)
-        else:
-            cursor = conn.execute(query)
-        
-        results = cursor.fetchall()
-        return [dict(row) for row in results]
-    finally:
-        conn.close()
-
-def execute_query_single(query, params=None):
-    """Exécute une requête et retourne un seul résultat"""
-    conn = get_db_connection()
-    try:
-        if params:
-            cursor = conn.execute(query, params)
-        else:
-            cursor = conn.execute(query)
-        
-        result = cursor.fetchone()
-        return dict(result) if result else None
-    finally:
-        conn.close()
+etablissements_bp = Blueprint('etablissements', __name__)
 
 @etablissements_bp.route('/')
 def index():
@@ -71,17 +41,15 @@ def index():
             e.coordonnees_x as longitude,
             e.coordonnees_y as latitude,
             c.nom as commune_nom,
-            COUNT(p.id) as personnel_count
+            e.nombre_personnel as personnel_count
         FROM etablissements e
         LEFT JOIN communes c ON e.commune_id = c.id
-        LEFT JOIN personnel p ON e.id = p.etablissement_id
     """
     
     # Requête pour le comptage total
     count_query = """
-        SELECT COUNT(DISTINCT e.id) as total
+        SELECT COUNT(*) as total
         FROM etablissements e
-        LEFT JOIN communes c ON e.commune_id = c.id
     """
     
     conditions = []
@@ -111,8 +79,8 @@ def index():
     # Compter le total
     total_count = execute_query_single(count_query, params)['total']
     
-    # Ajouter pagination et groupement
-    etablissements_query += " GROUP BY e.id ORDER BY e.nom LIMIT ? OFFSET ?"
+    # Pagination dans l'ordre de l'index (nom) ; effectif compté pour la page seulement
+    etablissements_query += " ORDER BY e.nom LIMIT ? OFFSET ?"
     params.extend([per_page, offset])
     
     etablissements = execute_query(etablissements_query, params)
@@ -145,13 +113,12 @@ def index():
         'iter_pages': lambda: iter_pages()
     }
     
-    # Données pour les filtres
-    types_etablissements = execute_query("""
-        SELECT DISTINCT type_etablissement
-        FROM etablissements
-        WHERE type_etablissement IS NOT NULL
-        ORDER BY type_etablissement
-    """)
+    # Données pour les filtres : valeurs et effectifs pour la sélection courante
+    _, facettes = facettes_etablissements({
+        'type_etablissement': type_filter,
+        'statut': statut_filter,
+        'commune_id': commune_filter
+    })
     
     communes_list = execute_query("""
         SELECT id, nom
@@ -162,7 +129,7 @@ def index():
     return render_template('etablissements/index.html',
                          stats=stats,
                          etablissements=etablissements,
-                         types_etablissements=types_etablissements,
+                         facettes=facettes,
                          communes_list=communes_list,
                          pagination=pagination,
                          filters={
@@ -189,6 +156,21 @@ def carte():
     return render_template('etablissements/carte.html',
                          etablissements=etablissements_geo)
 
+@etablissements_bp.route('/api/carte')
+def api_carte():
+    """API des établissements géolocalisés (données de la carte)"""
+    source = """
+        FROM etablissements e
+        LEFT JOIN communes c ON e.commune_id = c.id
+        WHERE e.coordonnees_x IS NOT NULL AND e.coordonnees_y IS NOT NULL
+    """
+    if json_sql():
+        champs = champs_table('e', 'etablissements') + [('commune_nom', 'c.nom')]
+        return reponse_json({'etablissements': execute_query_json(tableau_json(champs, source))})
+    
+    etablissements_geo = execute_query(f"SELECT e.*, c.nom as commune_nom {source}")
+    return jsonify({'etablissements': etablissements_geo})
+
 @etablissements_bp.route('/detail/<int:etablissement_id>')
 def detail(etablissement_id):
     """Détail d'un établissement"""
@@ -230,8 +212,7 @@ def par_type(type_etablissement):
     etablissements = execute_query("""
         SELECT 
             e.*,
-            c.nom as commune_nom,
-            (SELECT COUNT(*) FROM personnel p WHERE p.etablissement_id = e.id) as nombre_personnel
+            c.nom as commune_nom
         FROM etablissements e
         LEFT JOIN communes c ON e.commune_id = c.id
         WHERE e.type_etablissement = ?
@@ -242,8 +223,8 @@ def par_type(type_etablissement):
     stats = execute_query_single("""
         SELECT 
             COUNT(*) as total,
-            COUNT(CASE WHEN statut LIKE '%Public%' THEN 1 END) as publics,
-            COUNT(CASE WHEN statut LIKE '%Privé%' THEN 1 END) as prives,
+            COUNT(CASE WHEN statut_code = 1 THEN 1 END) as publics,
+            COUNT(CASE WHEN statut_code = 2 THEN 1 END) as prives,
             COUNT(CASE WHEN coordonnees_x IS NOT NULL THEN 1 END) as avec_coordonnees
         FROM etablissements
         WHERE type_etablissement = ?
@@ -269,15 +250,15 @@ def get_etablissements_stats():
     
     # Établissements par statut
     etablissements_publics = execute_query_single(
-        "SELECT COUNT(*) as count FROM etablissements WHERE statut LIKE '%Public%'"
+        "SELECT COUNT(*) as count FROM etablissements WHERE statut_code = 1"
     )['count']
     
     etablissements_prives = execute_query_single(
-        "SELECT COUNT(*) as count FROM etablissements WHERE statut LIKE '%Privé%' OR statut LIKE '%privé%'"
+        "SELECT COUNT(*) as count FROM etablissements WHERE statut_code = 2"
     )['count']
     
     etablissements_com_ass = execute_query_single(
-        "SELECT COUNT(*) as count FROM etablissements WHERE statut LIKE '%Com_Ass%'"
+        "SELECT COUNT(*) as count FROM etablissements WHERE statut_code = 3"
     )['count']
     
     # Totaux par type
@@ -285,8 +266,8 @@ def get_etablissements_stats():
         SELECT 
             type_etablissement,
             COUNT(*) as count,
-            COUNT(CASE WHEN statut LIKE '%Public%' THEN 1 END) as publics,
-            COUNT(CASE WHEN statut LIKE '%Privé%' THEN 1 END) as prives
+            COUNT(CASE WHEN statut_code = 1 THEN 1 END) as publics,
+            COUNT(CASE WHEN statut_code = 2 THEN 1 END) as prives
         FROM etablissements
         GROUP BY type_etablissement
         ORDER BY count DESC
@@ -306,14 +287,7 @@ def get_etablissements_stats():
     """)
     
     # Géolocalisation
-    geo_stats = execute_query_single("""
-        SELECT 
-            COUNT(*) as total,
-            COUNT(CASE WHEN coordonnees_x IS NOT NULL THEN 1 END) as avec_coordonnees,
-            COUNT(CASE WHEN directeur IS NOT NULL AND directeur != '' THEN 1 END) as avec_directeur,
-            COUNT(CASE WHEN contact_1 IS NOT NULL AND contact_1 != '' THEN 1 END) as avec_contact
-        FROM etablissements
-    """)
+    geo_stats = get_completude_etablissements()
     
     return {
         'total_etablissements': total_etablissements,
@@ -326,14 +300,36 @@ def get_etablissements_stats():
         'geo_stats': geo_stats
     }
 
+def get_completude_etablissements():
+    """Complétude des fiches, lue dans les anomalies de qualité indexées (voir qualite.py)"""
+    
+    total = execute_query_single(
+        "SELECT COUNT(*) as count FROM etablissements"
+    )['count']
+    
+    anomalies = {a['regle']: a['count'] for a in execute_query("""
+        SELECT regle, COUNT(*) as count
+        FROM anomalies_qualite
+        WHERE table_source = 'etablissements'
+        GROUP BY regle
+    """)}
+    
+    return {
+        'total': total,
+        'avec_coordonnees': total - anomalies.get('coordonnees_manquantes', 0),
+        'avec_directeur': total - anomalies.get('directeur_manquant', 0),
+        'avec_contact': total - anomalies.get('contact_manquant', 0),
+        'avec_email': total - anomalies.get('email_manquant', 0)
+    }
+
 def get_etablissement_personnel_stats(etablissement_id):
     """Statistiques du personnel d'un établissement"""
     
     return execute_query_single("""
         SELECT 
             COUNT(*) as total,
-            COUNT(CASE WHEN genre IN ('M', 'H') THEN 1 END) as hommes,
-            COUNT(CASE WHEN genre = 'F' THEN 1 END) as femmes,
+            COUNT(CASE WHEN genre_code = 1 THEN 1 END) as hommes,
+            COUNT(CASE WHEN genre_code = 2 THEN 1 END) as femmes,
             COUNT(CASE WHEN contact IS NOT NULL AND contact != '' THEN 1 END) as avec_contact,
             COUNT(DISTINCT corps) as nombre_corps,
             COUNT(DISTINCT grade) as nombre_grades,
@@ -357,7 +353,7 @@ def api_export():
         query = """
             SELECT 
                 e.nom as 'Nom Établissement',
-                e.code_etablissement as 'Code',
+                e.code as 'Code',
                 e.type_etablissement as 'Type',
                 e.statut as 'Statut',
                 c.nom as 'Commune',
@@ -369,10 +365,9 @@ def api_export():
                 e.adresse as 'Adresse',
                 e.coordonnees_x as 'Longitude',
                 e.coordonnees_y as 'Latitude',
-                COUNT(p.id) as 'Nombre Personnel'
+                e.nombre_personnel as 'Nombre Personnel'
             FROM etablissements e
             LEFT JOIN communes c ON e.commune_id = c.id
-            LEFT JOIN personnel p ON e.id = p.etablissement_id
         """
         
         conditions = []
@@ -397,7 +392,7 @@ def api_export():
         if conditions:
             query += " WHERE " + " AND ".join(conditions)
         
-        query += " GROUP BY e.id ORDER BY e.nom"
+        query += " ORDER BY e.nom"
         
         # Exécuter la requête
         data = execute_query(query, params)
@@ -416,6 +411,8 @@ def api_export():
         
         return response
         
+    except RequeteTropCouteuse:
+        raise
     except Exception as e:
         return jsonify({'error': f'Erreur lors de l\'export: {str(e)}'}), 500
 
@@ -423,15 +420,28 @@ def api_export():
 def analytics():
     """Page d'analyses détaillées des établissements"""
     
+    # Moteur en colonnes (cache par génération) ou agrégats SQL
+    analyses = analyses_etablissements() or get_etablissements_analyses()
+    
+    # Taux de géolocalisation
+    geo_analyse = get_completude_etablissements()
+    
+    return render_template('etablissements/analytics.html',
+                         geo_analyse=geo_analyse,
+                         **analyses)
+
+def get_etablissements_analyses():
+    """Agrégats de la page d'analyses, calculés en SQL"""
+    
     # Analyses par type
     analyses_type = execute_query("""
         SELECT 
             type_etablissement,
             COUNT(*) as total,
-            COUNT(CASE WHEN statut LIKE '%Public%' THEN 1 END) as publics,
-            COUNT(CASE WHEN statut LIKE '%Privé%' THEN 1 END) as prives,
-            COUNT(CASE WHEN statut LIKE '%Com_Ass%' THEN 1 END) as communautaires,
-            AVG((SELECT COUNT(*) FROM personnel p WHERE p.etablissement_id = e.id)) as personnel_moyen,
+            COUNT(CASE WHEN statut_code = 1 THEN 1 END) as publics,
+            COUNT(CASE WHEN statut_code = 2 THEN 1 END) as prives,
+            COUNT(CASE WHEN statut_code = 3 THEN 1 END) as communautaires,
+            AVG(nombre_personnel) as personnel_moyen,
             COUNT(CASE WHEN coordonnees_x IS NOT NULL THEN 1 END) as geolocalises
         FROM etablissements e
         WHERE type_etablissement IS NOT NULL
@@ -439,40 +449,27 @@ def analytics():
         ORDER BY total DESC
     """)
     
-    # Analyses par commune
+    # Analyses par commune (compteurs stockés ; la jointure ne sert qu'aux types)
     analyses_commune = execute_query("""
         SELECT 
             c.nom as commune,
             c.arrondissement,
-            COUNT(e.id) as total_etablissements,
+            c.nombre_etablissements as total_etablissements,
             COUNT(DISTINCT e.type_etablissement) as types_differents,
-            COUNT(p.id) as total_personnel,
-            ROUND(CAST(COUNT(p.id) AS FLOAT) / NULLIF(COUNT(e.id), 0), 1) as ratio_personnel_etablissement
+            c.nombre_personnel as total_personnel,
+            ROUND(CAST(c.nombre_personnel AS FLOAT) / NULLIF(c.nombre_etablissements, 0), 1) as ratio_personnel_etablissement
         FROM communes c
-        LEFT JOIN etablissements e ON c.id = e.commune_id
-        LEFT JOIN personnel p ON e.id = p.etablissement_id
-        GROUP BY c.id, c.nom, c.arrondissement
-        HAVING total_etablissements > 0
+        JOIN etablissements e ON c.id = e.commune_id
+        GROUP BY c.id
         ORDER BY total_etablissements DESC
     """)
     
-    # Taux de géolocalisation
-    geo_analyse = execute_query_single("""
-        SELECT 
-            COUNT(*) as total,
-            COUNT(CASE WHEN coordonnees_x IS NOT NULL THEN 1 END) as avec_coordonnees,
-            COUNT(CASE WHEN directeur IS NOT NULL AND directeur != '' THEN 1 END) as avec_directeur,
-            COUNT(CASE WHEN contact_1 IS NOT NULL AND contact_1 != '' THEN 1 END) as avec_contact,
-            COUNT(CASE WHEN email_directeur IS NOT NULL AND email_directeur != '' THEN 1 END) as avec_email
-        FROM etablissements
-    """)
-    
     # Performance par type (simulation)
     performance_type = execute_query("""
         SELECT 
             type_etablissement,
             COUNT(*) as nombre,
-            AVG((SELECT COUNT(*) FROM personnel p WHERE p.etablissement_id = e.id)) as personnel_moyen,
+            AVG(nombre_personnel) as personnel_moyen,
             COUNT(CASE WHEN directeur IS NOT NULL THEN 1 END) as avec_directeur,
             ROUND(COUNT(CASE WHEN directeur IS NOT NULL THEN 1 END) * 100.0 / COUNT(*), 1) as taux_encadrement
         FROM etablissements e
@@ -481,11 +478,11 @@ def analytics():
         ORDER BY personnel_moyen DESC
     """)
     
-    return render_template('etablissements/analytics.html',
-                         analyses_type=analyses_type,
-                         analyses_commune=analyses_commune,
-                         geo_analyse=geo_analyse,
-                         performance_type=performance_type)
+    return {
+        'analyses_type': analyses_type,
+        'analyses_commune': analyses_commune,
+        'performance_type': performance_type
+    }
 
 @etablissements_bp.route('/<int:etablissement_id>')
 def view_detail(etablissement_id):
@@ -525,8 +522,8 @@ def fiche(etablissement_id):
     stats_personnel = execute_query_single("""
         SELECT 
             COUNT(*) as total,
-            COUNT(CASE WHEN genre IN ('M', 'H') THEN 1 END) as hommes,
-            COUNT(CASE WHEN genre = 'F' THEN 1 END) as femmes,
+            COUNT(CASE WHEN genre_code = 1 THEN 1 END) as hommes,
+            COUNT(CASE WHEN genre_code = 2 THEN 1 END) as femmes,
             COUNT(DISTINCT corps) as nombre_corps,
             COUNT(DISTINCT grade) as nombre_grades,
             COUNT(DISTINCT fonction) as nombre_fonctions
@@ -4,45 +4,13 @@
 Blueprint principal - Dashboard général et page d'accueil
 """
 
-from flask import Blueprint, render_template, jsonify
-import sqlite3
+from flask import Blueprint, render_template, jsonify, request
 from datetime import datetime
 
-main_bp = Blueprint('main', __name__)
-
-def get_db_connection():
-    """Obtient une connexion à la base de données SQLite"""
-    conn = sqlite3.connect('ief_louga.db')
-    conn.row_factory = sqlite3.Row  # Pour avoir des résultats sous forme de dictionnaire
-    return conn
-
-def execute_query(query, params=None):
-    """Exécute une requête et retourne les résultats"""
-    conn = get_db_connection()
-    try:
-        if params:
-            cursor = conn.execute(query, params)
-        else:
-            cursor = conn.execute(query)
-        
-        results = cursor.fetchall()
-        return [dict(row) for row in results]
-    finally:
-        conn.close()
+from app.cube import DIMENSIONS, DimensionInconnue, croiser
+from app.database import execute_query, execute_query_single
 
-def execute_query_single(query, params=None):
-    """Exécute une requête et retourne un seul résultat"""
-    conn = get_db_connection()
-    try:
-        if params:
-            cursor = conn.execute(query, params)
-        else:
-            cursor = conn.execute(query)
-        
-        result = cursor.fetchone()
-        return dict(result) if result else None
-    finally:
-        conn.close()
+main_bp = Blueprint('main', __name__)
 
 @main_bp.route('/')
 def index():
@@ -72,6 +40,64 @@ def api_dashboard_stats():
     stats = get_general_statistics()
     return jsonify(stats)
 
+# Paramètre de sélection -> dimension du cube
+SELECTION_DASHBOARD = {
+    'arrondissement': 'arrondissement',
+    'commune': 'commune',
+    'type': 'type_etablissement',
+    'statut': 'statut',
+    'corps': 'corps',
+    'grade': 'grade',
+    'fonction': 'fonction',
+    'genre': 'genre',
+}
+
+GRAPHIQUES_DASHBOARD = ('type_etablissement', 'commune', 'statut', 'corps', 'grade', 'fonction', 'genre')
+
+@main_bp.route('/api/dashboard/graphiques')
+def api_dashboard_graphiques():
+    """Tous les graphiques du dashboard pour une sélection : ?commune=Louga&type=ELEMENTAIRE&genre=F
+
+    Chaque graphique applique les filtres posés sur les autres dimensions (filtrage croisé) ;
+    une valeur répétée accepte plusieurs valeurs.
+    """
+    selection = {}
+    for parametre in request.args:
+        if parametre not in SELECTION_DASHBOARD:
+            return jsonify({'error': f'Dimension inconnue : {parametre}',
+                            'dimensions': list(SELECTION_DASHBOARD)}), 400
+        valeurs = [v for v in request.args.getlist(parametre) if v]
+        if valeurs:
+            selection[SELECTION_DASHBOARD[parametre]] = valeurs
+    
+    try:
+        totaux, graphiques = croiser(selection, GRAPHIQUES_DASHBOARD)
+    except DimensionInconnue as e:
+        return jsonify({'error': f'Dimension inconnue : {e}', 'dimensions': list(DIMENSIONS)}), 400
+    
+    return jsonify({
+        'selection': {parametre: request.args.getlist(parametre) for parametre in request.args},
+        'totaux': totaux,
+        'repartition_etablissements': classer(graphiques['type_etablissement'], 'type_etablissement'),
+        'repartition_communes': classer(graphiques['commune'], 'commune', 10),
+        'repartition_statut': classer(graphiques['statut'], 'statut'),
+        'repartition_personnel': {
+            'par_corps': classer(graphiques['corps'], 'corps', 8),
+            'par_grade': classer(graphiques['grade'], 'grade', 10),
+            'par_fonction': classer(graphiques['fonction'], 'fonction', 8)
+        },
+        'repartition_genre': classer(graphiques['genre'], 'genre')
+    })
+
+def classer(valeurs, nom, limite=None):
+    """Lignes {nom, count, effectif} par nombre d'établissements (sinon effectif) décroissant"""
+    lignes = [{nom: valeur, 'count': etablissements if etablissements is not None else effectif,
+               'etablissements': etablissements, 'effectif': effectif}
+              for valeur, (etablissements, effectif) in valeurs.items()
+              if valeur is not None and (etablissements or effectif)]
+    lignes.sort(key=lambda ligne: (-ligne['count'], -ligne['effectif'], ligne[nom]))
+    return lignes[:limite]
+
 def get_general_statistics():
     """Récupère les statistiques générales"""
     
@@ -90,26 +116,26 @@ def get_general_statistics():
         "SELECT COUNT(*) as count FROM communes"
     )['count']
     
-    # Établissements par statut
+    # Établissements par statut (statut_code : 1 public, 2 privé, 3 communautaire)
     etablissements_publics = execute_query_single(
-        "SELECT COUNT(*) as count FROM etablissements WHERE statut LIKE '%Public%'"
+        "SELECT COUNT(*) as count FROM etablissements WHERE statut_code = 1"
     )['count']
     
     etablissements_prives = execute_query_single(
-        "SELECT COUNT(*) as count FROM etablissements WHERE statut LIKE '%Privé%' OR statut LIKE '%privé%'"
+        "SELECT COUNT(*) as count FROM etablissements WHERE statut_code = 2"
     )['count']
     
     etablissements_com_ass = execute_query_single(
-        "SELECT COUNT(*) as count FROM etablissements WHERE statut LIKE '%Com_Ass%' OR statut LIKE '%Communautaire%'"
+        "SELECT COUNT(*) as count FROM etablissements WHERE statut_code = 3"
     )['count']
     
-    # Personnel par genre
+    # Personnel par genre (genre_code : 1 homme, 2 femme)
     personnel_hommes = execute_query_single(
-        "SELECT COUNT(*) as count FROM personnel WHERE genre IN ('M', 'H')"
+        "SELECT COUNT(*) as count FROM personnel WHERE genre_code = 1"
     )['count']
     
     personnel_femmes = execute_query_single(
-        "SELECT COUNT(*) as count FROM personnel WHERE genre = 'F'"
+        "SELECT COUNT(*) as count FROM personnel WHERE genre_code = 2"
     )['count']
     
     # Personnel affecté vs non affecté
@@ -164,11 +190,11 @@ def get_personnel_statistics():
     # Par corps
     par_corps = execute_query("""
         SELECT 
-            corps,
+            d.libelle as corps,
             COUNT(*) as count
-        FROM personnel
-        WHERE corps IS NOT NULL AND corps != ''
-        GROUP BY corps
+        FROM personnel p
+        JOIN dim_corps d ON d.id = p.corps_id
+        GROUP BY p.corps_id
         ORDER BY count DESC
         LIMIT 8
     """)
@@ -176,11 +202,11 @@ def get_personnel_statistics():
     # Par grade
     par_grade = execute_query("""
         SELECT 
-            grade,
+            d.libelle as grade,
             COUNT(*) as count
-        FROM personnel
-        WHERE grade IS NOT NULL AND grade != ''
-        GROUP BY grade
+        FROM personnel p
+        JOIN dim_grades d ON d.id = p.grade_id
+        GROUP BY p.grade_id
         ORDER BY count DESC
         LIMIT 10
     """)
@@ -188,11 +214,11 @@ def get_personnel_statistics():
     # Par fonction
     par_fonction = execute_query("""
         SELECT 
-            fonction,
+            d.libelle as fonction,
             COUNT(*) as count
-        FROM personnel
-        WHERE fonction IS NOT NULL AND fonction != ''
-        GROUP BY fonction
+        FROM personnel p
+        JOIN dim_fonctions d ON d.id = p.fonction_id
+        GROUP BY p.fonction_id
         ORDER BY count DESC
         LIMIT 8
     """)
@@ -0,0 +1,16 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Blueprint Métriques - Exposition Prometheus (/metrics)
+"""
+
+from flask import Blueprint, Response
+
+from app.metriques import REGISTRE
+
+metriques_bp = Blueprint('metriques', __name__)
+
+@metriques_bp.route('/metrics')
+def metrics():
+    """Métriques de l'application au format texte Prometheus"""
+    return Response(REGISTRE.exposer(), mimetype='text/plain; version=0.0.4; charset=utf-8')
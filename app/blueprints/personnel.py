@@ -5,46 +5,19 @@ Blueprint Personnel - Gestion et visualisation du personnel
 """
 
 from flask import Blueprint, render_template, request, jsonify, send_file, make_response
-import sqlite3
 import csv
 import io
+from collections import defaultdict
 from datetime import datetime
 
-personnel_bp = Blueprint('personnel', __name__)
-
-def get_db_connection():
-    """Obtient une connexion à la base de données SQLite"""
-    conn = sqlite3.connect('ief_louga.db')
-    conn.row_factory = sqlite3.Row  # Pour avoir des résultats sous forme de dictionnaire
-    return conn
-
-def execute_query(query, params=None):
-    """Exécute une requête et retourne les résultats"""
-    conn = get_db_connection()
-    try:
-        if params:
-            cursor = conn.execute(query, params)
-        else:
-            cursor = conn.execute(query)
-        
-        results = cursor.fetchall()
-        return [dict(row) for row in results]
-    finally:
-        conn.close()
+from app.recherche import condition_recherche
+from app.database import execute_query, execute_query_single, RequeteTropCouteuse
+from app.analytique import analyses_personnel, arrondi
+from app.bitmaps import page_personnel, trier_selon
+from app.cube import cube
+from app.facettes import facettes_personnel
 
-def execute_query_single(query, params=None):
-    """Exécute une requête et retourne un seul résultat"""
-    conn = get_db_connection()
-    try:
-        if params:
-            cursor = conn.execute(query, params)
-        else:
-            cursor = conn.execute(query)
-        
-        result = cursor.fetchone()
-        return dict(result) if result else None
-    finally:
-        conn.close()
+personnel_bp = Blueprint('personnel', __name__)
 
 @personnel_bp.route('/')
 def index():
@@ -59,66 +32,72 @@ def index():
     grade_filter = request.args.get('grade', '')
     genre_filter = request.args.get('genre', '')
     etablissement_filter = request.args.get('etablissement_id', '')
-    page = request.args.get('page', 1, type=int)
+    page = max(request.args.get('page', 1, type=int), 1)
     per_page = 50
     offset = (page - 1) * per_page
     
-    # Construction de la requête pour le personnel
+    # Construction de la requête pour le personnel (table de lecture : noms
+    # de l'établissement et de la commune déjà présents, sans jointure)
     personnel_query = """
-        SELECT 
-            p.*,
-            e.nom as etablissement_nom,
-            e.type_etablissement,
-            c.nom as commune_nom
-        FROM personnel p
-        LEFT JOIN etablissements e ON p.etablissement_id = e.id
-        LEFT JOIN communes c ON e.commune_id = c.id
+        SELECT p.*
+        FROM personnel_read p
     """
     
-    # Requête pour le comptage total
+    # Requête pour le comptage total (couverte par les index composites)
     count_query = """
         SELECT COUNT(*) as total
-        FROM personnel p
-        LEFT JOIN etablissements e ON p.etablissement_id = e.id
-        LEFT JOIN communes c ON e.commune_id = c.id
+        FROM personnel_read p
     """
     
-    conditions = []
-    params = []
-    
     if search:
-        conditions.append("(p.nom LIKE ? OR p.prenom LIKE ? OR p.matricule LIKE ?)")
-        params.extend([f'%{search}%', f'%{search}%', f'%{search}%'])
-    
-    if corps_filter:
-        conditions.append("p.corps = ?")
-        params.append(corps_filter)
-    
-    if grade_filter:
-        conditions.append("p.grade = ?")
-        params.append(grade_filter)
-    
-    if genre_filter:
-        conditions.append("p.genre = ?")
-        params.append(genre_filter)
-    
-    if etablissement_filter:
-        conditions.append("p.etablissement_id = ?")
-        params.append(etablissement_filter)
-    
-    if conditions:
+        conditions = []
+        params = []
+        
+        condition, condition_params = condition_recherche(search)
+        conditions.append(condition)
+        params.extend(condition_params)
+        
+        if corps_filter:
+            conditions.append("p.corps = ?")
+            params.append(corps_filter)
+        
+        if grade_filter:
+            conditions.append("p.grade = ?")
+            params.append(grade_filter)
+        
+        if genre_filter:
+            conditions.append("p.genre = ?")
+            params.append(genre_filter)
+        
+        if etablissement_filter:
+            conditions.append("p.etablissement_id = ?")
+            params.append(etablissement_filter)
+        
         where_clause = " WHERE " + " AND ".join(conditions)
         personnel_query += where_clause
         count_query += where_clause
-    
-    # Compter le total
-    total_count = execute_query_single(count_query, params)['total']
-    
-    # Ajouter pagination
-    personnel_query += " ORDER BY p.nom, p.prenom LIMIT ? OFFSET ?"
-    params.extend([per_page, offset])
-    
-    personnel = execute_query(personnel_query, params)
+        
+        # Compter le total
+        total_count = execute_query_single(count_query, params)['total']
+        
+        # Ajouter pagination
+        personnel_query += " ORDER BY p.nom, p.prenom LIMIT ? OFFSET ?"
+        params.extend([per_page, offset])
+        
+        personnel = execute_query(personnel_query, params)
+    else:
+        # Filtres seuls : total et page lus dans l'index bitmap, SQL ne lit que les lignes de la page
+        total_count, ids = page_personnel({
+            'corps': corps_filter,
+            'grade': grade_filter,
+            'genre': genre_filter,
+            'etablissement_id': etablissement_filter
+        }, offset, per_page)
+        
+        personnel = []
+        if ids:
+            personnel_query += f" WHERE p.id IN ({', '.join('?' * len(ids))})"
+            personnel = trier_selon(execute_query(personnel_query, ids), ids)
     
     # Calculs de pagination
     total_pages = (total_count + per_page - 1) // per_page
@@ -155,34 +134,27 @@ def index():
         'par_fonction': stats['par_fonction']
     }
     
-    # Données pour les filtres
-    corps_list = execute_query("""
-        SELECT DISTINCT corps
-        FROM personnel
-        WHERE corps IS NOT NULL AND corps != ''
-        ORDER BY corps
-    """)
+    # Données pour les filtres : valeurs et effectifs pour la sélection courante
+    _, facettes = facettes_personnel({
+        'corps': corps_filter,
+        'grade': grade_filter,
+        'genre': genre_filter,
+        'etablissement_id': etablissement_filter
+    })
     
-    grades_list = execute_query("""
-        SELECT DISTINCT grade
-        FROM personnel
-        WHERE grade IS NOT NULL AND grade != ''
-        ORDER BY grade
-    """)
-    
-    etablissements_list = execute_query("""
-        SELECT id, nom
-        FROM etablissements
-        ORDER BY nom
-    """)
+    # Établissement sélectionné (les autres sont proposés par /api/autocomplete)
+    etablissement_selectionne = None
+    if etablissement_filter:
+        etablissement_selectionne = execute_query_single(
+            "SELECT id, nom FROM etablissements WHERE id = ?", [etablissement_filter]
+        )
     
     return render_template('personnel/index.html',
                          stats=stats,
                          personnel=personnel,
                          repartition_personnel=repartition_personnel,
-                         corps_list=corps_list,
-                         grades_list=grades_list,
-                         etablissements_list=etablissements_list,
+                         facettes=facettes,
+                         etablissement_selectionne=etablissement_selectionne,
                          pagination=pagination,
                          filters={
                              'search': search,
@@ -197,13 +169,8 @@ def par_corps(corps):
     """Personnel par corps"""
     
     personnel = execute_query("""
-        SELECT 
-            p.*,
-            e.nom as etablissement_nom,
-            c.nom as commune_nom
-        FROM personnel p
-        LEFT JOIN etablissements e ON p.etablissement_id = e.id
-        LEFT JOIN communes c ON e.commune_id = c.id
+        SELECT p.*
+        FROM personnel_read p
         WHERE p.corps = ?
         ORDER BY p.nom, p.prenom
     """, [corps])
@@ -212,8 +179,8 @@ def par_corps(corps):
     stats = execute_query_single("""
         SELECT 
             COUNT(*) as total,
-            COUNT(CASE WHEN genre IN ('M', 'H') THEN 1 END) as hommes,
-            COUNT(CASE WHEN genre = 'F' THEN 1 END) as femmes,
+            COUNT(CASE WHEN genre_code = 1 THEN 1 END) as hommes,
+            COUNT(CASE WHEN genre_code = 2 THEN 1 END) as femmes,
             COUNT(CASE WHEN etablissement_id IS NOT NULL THEN 1 END) as affectes,
             COUNT(DISTINCT grade) as nombre_grades
         FROM personnel
@@ -252,8 +219,8 @@ def non_affectes():
     stats = execute_query_single("""
         SELECT 
             COUNT(*) as total,
-            COUNT(CASE WHEN genre IN ('M', 'H') THEN 1 END) as hommes,
-            COUNT(CASE WHEN genre = 'F' THEN 1 END) as femmes,
+            COUNT(CASE WHEN genre_code = 1 THEN 1 END) as hommes,
+            COUNT(CASE WHEN genre_code = 2 THEN 1 END) as femmes,
             COUNT(DISTINCT corps) as nombre_corps,
             COUNT(DISTINCT grade) as nombre_grades
         FROM personnel
@@ -279,8 +246,8 @@ def ief():
     stats = execute_query_single("""
         SELECT 
             COUNT(*) as total,
-            COUNT(CASE WHEN genre IN ('M', 'H') THEN 1 END) as hommes,
-            COUNT(CASE WHEN genre = 'F' THEN 1 END) as femmes,
+            COUNT(CASE WHEN genre_code = 1 THEN 1 END) as hommes,
+            COUNT(CASE WHEN genre_code = 2 THEN 1 END) as femmes,
             COUNT(DISTINCT fonction) as nombre_fonctions
         FROM personnel
         WHERE service IS NOT NULL AND service != ''
@@ -307,16 +274,30 @@ def recherche():
     """Page de recherche avancée"""
     
     # Options de filtres
-    corps_list = execute_query("SELECT DISTINCT corps FROM personnel WHERE corps IS NOT NULL ORDER BY corps")
-    grades_list = execute_query("SELECT DISTINCT grade FROM personnel WHERE grade IS NOT NULL ORDER BY grade")
-    fonctions_list = execute_query("SELECT DISTINCT fonction FROM personnel WHERE fonction IS NOT NULL ORDER BY fonction")
-    etablissements_list = execute_query("SELECT id, nom FROM etablissements ORDER BY nom")
+    corps_list = execute_query("""
+        SELECT d.libelle as corps
+        FROM dim_corps d
+        WHERE d.id IN (SELECT corps_id FROM personnel)
+        ORDER BY d.libelle
+    """)
+    grades_list = execute_query("""
+        SELECT d.libelle as grade
+        FROM dim_grades d
+        WHERE d.id IN (SELECT grade_id FROM personnel)
+        ORDER BY d.libelle
+    """)
+    fonctions_list = execute_query("""
+        SELECT d.libelle as fonction
+        FROM dim_fonctions d
+        WHERE d.id IN (SELECT fonction_id FROM personnel)
+        ORDER BY d.libelle
+    """)
     
+    # Les établissements sont proposés par /api/autocomplete?kind=etablissement
     return render_template('personnel/recherche.html',
                          corps_list=[c['corps'] for c in corps_list],
                          grades_list=[g['grade'] for g in grades_list],
-                         fonctions_list=[f['fonction'] for f in fonctions_list],
-                         etablissements_list=etablissements_list)
+                         fonctions_list=[f['fonction'] for f in fonctions_list])
 
 def get_personnel_stats():
     """Statistiques générales du personnel"""
@@ -325,8 +306,8 @@ def get_personnel_stats():
     totaux = execute_query_single("""
         SELECT 
             COUNT(*) as total,
-            COUNT(CASE WHEN genre IN ('M', 'H') THEN 1 END) as hommes,
-            COUNT(CASE WHEN genre = 'F' THEN 1 END) as femmes,
+            COUNT(CASE WHEN genre_code = 1 THEN 1 END) as hommes,
+            COUNT(CASE WHEN genre_code = 2 THEN 1 END) as femmes,
             COUNT(CASE WHEN etablissement_id IS NOT NULL THEN 1 END) as affectes_etablissement,
             COUNT(CASE WHEN service IS NOT NULL AND service != '' THEN 1 END) as affectes_service,
             COUNT(CASE WHEN etablissement_id IS NULL AND (service IS NULL OR service = '') THEN 1 END) as non_affectes
@@ -336,13 +317,13 @@ def get_personnel_stats():
     # Par corps (top 8)
     par_corps = execute_query("""
         SELECT 
-            corps,
+            d.libelle as corps,
             COUNT(*) as count,
-            COUNT(CASE WHEN genre IN ('M', 'H') THEN 1 END) as hommes,
-            COUNT(CASE WHEN genre = 'F' THEN 1 END) as femmes
-        FROM personnel
-        WHERE corps IS NOT NULL AND corps != ''
-        GROUP BY corps
+            COUNT(CASE WHEN p.genre_code = 1 THEN 1 END) as hommes,
+            COUNT(CASE WHEN p.genre_code = 2 THEN 1 END) as femmes
+        FROM personnel p
+        JOIN dim_corps d ON d.id = p.corps_id
+        GROUP BY p.corps_id
         ORDER BY count DESC
         LIMIT 8
     """)
@@ -350,11 +331,11 @@ def get_personnel_stats():
     # Par grade (top 10)
     par_grade = execute_query("""
         SELECT 
-            grade,
+            d.libelle as grade,
             COUNT(*) as count
-        FROM personnel
-        WHERE grade IS NOT NULL AND grade != ''
-        GROUP BY grade
+        FROM personnel p
+        JOIN dim_grades d ON d.id = p.grade_id
+        GROUP BY p.grade_id
         ORDER BY count DESC
         LIMIT 10
     """)
@@ -362,11 +343,11 @@ def get_personnel_stats():
     # Par fonction (top 8)
     par_fonction = execute_query("""
         SELECT 
-            fonction,
+            d.libelle as fonction,
             COUNT(*) as count
-        FROM personnel
-        WHERE fonction IS NOT NULL AND fonction != ''
-        GROUP BY fonction
+        FROM personnel p
+        JOIN dim_fonctions d ON d.id = p.fonction_id
+        GROUP BY p.fonction_id
         ORDER BY count DESC
         LIMIT 8
     """)
@@ -403,8 +384,8 @@ def api_export():
                 p.nom as 'Nom',
                 p.prenom as 'Prénom',
                 CASE 
-                    WHEN p.genre IN ('M', 'H') THEN 'Homme'
-                    WHEN p.genre = 'F' THEN 'Femme'
+                    WHEN p.genre_code = 1 THEN 'Homme'
+                    WHEN p.genre_code = 2 THEN 'Femme'
                     ELSE p.genre
                 END as 'Genre',
                 p.corps as 'Corps',
@@ -413,8 +394,8 @@ def api_export():
                 p.diplome_academique as 'Diplôme Académique',
                 p.diplome_professionnel as 'Diplôme Professionnel',
                 p.service as 'Service',
-                e.nom as 'Établissement',
-                c.nom as 'Commune',
+                p.etablissement_nom as 'Établissement',
+                p.commune_nom as 'Commune',
                 p.contact as 'Contact',
                 p.date_entree_enseignement as 'Date Entrée Enseignement',
                 CASE 
@@ -422,17 +403,16 @@ def api_export():
                     WHEN p.service IS NOT NULL AND p.service != '' THEN 'Affecté Service'
                     ELSE 'Non Affecté'
                 END as 'Statut Affectation'
-            FROM personnel p
-            LEFT JOIN etablissements e ON p.etablissement_id = e.id
-            LEFT JOIN communes c ON e.commune_id = c.id
+            FROM personnel_read p
         """
         
         conditions = []
         params = []
         
         if search:
-            conditions.append("(p.nom LIKE ? OR p.prenom LIKE ?)")
-            params.extend([f'%{search}%', f'%{search}%'])
+            condition, condition_params = condition_recherche(search)
+            conditions.append(condition)
+            params.extend(condition_params)
         
         if corps_filter:
             conditions.append("p.corps = ?")
@@ -444,9 +424,9 @@ def api_export():
         
         if sexe_filter:
             if sexe_filter == 'M':
-                conditions.append("p.genre IN ('M', 'H')")
+                conditions.append("p.genre_code = 1")
             elif sexe_filter == 'F':
-                conditions.append("p.genre = 'F'")
+                conditions.append("p.genre_code = 2")
         
         if statut_filter:
             if statut_filter == 'affecte':
@@ -476,6 +456,8 @@ def api_export():
         
         return response
         
+    except RequeteTropCouteuse:
+        raise
     except Exception as e:
         return jsonify({'error': f'Erreur lors de l\'export: {str(e)}'}), 500
 
@@ -483,13 +465,21 @@ def api_export():
 def analytics():
     """Page d'analyses détaillées du personnel"""
     
+    # Moteur en colonnes (cache par génération) ou agrégats SQL
+    analyses = analyses_personnel() or get_personnel_analyses()
+    
+    return render_template('personnel/analytics.html', **analyses)
+
+def get_personnel_analyses():
+    """Agrégats de la page d'analyses, calculés en SQL"""
+    
     # Analyses par corps
     analyses_corps = execute_query("""
         SELECT 
             corps,
             COUNT(*) as total,
-            COUNT(CASE WHEN genre IN ('M', 'H') THEN 1 END) as hommes,
-            COUNT(CASE WHEN genre = 'F' THEN 1 END) as femmes,
+            COUNT(CASE WHEN genre_code = 1 THEN 1 END) as hommes,
+            COUNT(CASE WHEN genre_code = 2 THEN 1 END) as femmes,
             COUNT(CASE WHEN etablissement_id IS NOT NULL THEN 1 END) as affectes_etablissement,
             COUNT(CASE WHEN service IS NOT NULL AND service != '' THEN 1 END) as affectes_service,
             COUNT(DISTINCT etablissement_id) as etablissements_differents,
@@ -507,8 +497,8 @@ def analytics():
         SELECT 
             fonction,
             COUNT(*) as total,
-            COUNT(CASE WHEN genre IN ('M', 'H') THEN 1 END) as hommes,
-            COUNT(CASE WHEN genre = 'F' THEN 1 END) as femmes,
+            COUNT(CASE WHEN genre_code = 1 THEN 1 END) as hommes,
+            COUNT(CASE WHEN genre_code = 2 THEN 1 END) as femmes,
             COUNT(CASE WHEN etablissement_id IS NOT NULL THEN 1 END) as affectes
         FROM personnel
         WHERE fonction IS NOT NULL AND fonction != ''
@@ -534,8 +524,8 @@ def analytics():
         SELECT 
             diplome_academique,
             COUNT(*) as total,
-            COUNT(CASE WHEN genre IN ('M', 'H') THEN 1 END) as hommes,
-            COUNT(CASE WHEN genre = 'F' THEN 1 END) as femmes
+            COUNT(CASE WHEN genre_code = 1 THEN 1 END) as hommes,
+            COUNT(CASE WHEN genre_code = 2 THEN 1 END) as femmes
         FROM personnel
         WHERE diplome_academique IS NOT NULL AND diplome_academique != ''
         GROUP BY diplome_academique
@@ -543,28 +533,39 @@ def analytics():
         LIMIT 15
     """)
     
-    # Analyses géographiques
-    repartition_geo = execute_query("""
-        SELECT 
-            c.arrondissement,
-            COUNT(p.id) as total_personnel,
-            COUNT(DISTINCT e.id) as etablissements_avec_personnel,
-            COUNT(DISTINCT p.corps) as corps_differents,
-            ROUND(CAST(COUNT(p.id) AS FLOAT) / NULLIF(COUNT(DISTINCT e.id), 0), 1) as personnel_par_etablissement
-        FROM communes c
-        LEFT JOIN etablissements e ON c.id = e.commune_id
-        LEFT JOIN personnel p ON e.id = p.etablissement_id
-        GROUP BY c.arrondissement
-        HAVING total_personnel > 0
-        ORDER BY total_personnel DESC
-    """)
-    
-    return render_template('personnel/analytics.html',
-                         analyses_corps=analyses_corps,
-                         analyses_fonction=analyses_fonction,
-                         analyses_grade=analyses_grade,
-                         qualifications=qualifications,
-                         repartition_geo=repartition_geo)
+    return {
+        'analyses_corps': analyses_corps,
+        'analyses_fonction': analyses_fonction,
+        'analyses_grade': analyses_grade,
+        'qualifications': qualifications,
+        'repartition_geo': get_repartition_geo()
+    }
+
+def get_repartition_geo():
+    """Analyses géographiques par arrondissement, agrégées depuis le cube des effectifs"""
+    
+    # Établissements et personnel rattachés à une commune
+    etablissements = defaultdict(int)
+    for ligne in cube(('arrondissement', 'commune')):
+        if ligne['commune'] is not None:
+            etablissements[ligne['arrondissement']] += ligne['etablissements']
+    
+    personnel = defaultdict(int)
+    corps = defaultdict(set)
+    for ligne in cube(('arrondissement', 'commune', 'corps')):
+        if ligne['commune'] is not None and ligne['effectif']:
+            personnel[ligne['arrondissement']] += ligne['effectif']
+            if ligne['corps']:
+                corps[ligne['arrondissement']].add(ligne['corps'])
+    
+    repartition_geo = [{
+        'arrondissement': arrondissement,
+        'total_personnel': total,
+        'etablissements_avec_personnel': etablissements[arrondissement],
+        'corps_differents': len(corps[arrondissement]),
+        'personnel_par_etablissement': arrondi(total / etablissements[arrondissement]) if etablissements[arrondissement] else None
+    } for arrondissement, total in personnel.items()]
+    return sorted(repartition_geo, key=lambda ligne: ligne['total_personnel'], reverse=True)
 
 @personnel_bp.route('/<int:agent_id>')
 def detail(agent_id):
@@ -572,15 +573,8 @@ def detail(agent_id):
     
     # Informations de l'agent
     agent = execute_query_single("""
-        SELECT 
-            p.*,
-            e.nom as etablissement_nom,
-            e.type_etablissement,
-            c.nom as commune_nom,
-            c.arrondissement
-        FROM personnel p
-        LEFT JOIN etablissements e ON p.etablissement_id = e.id
-        LEFT JOIN communes c ON e.commune_id = c.id
+        SELECT p.*
+        FROM personnel_read p
         WHERE p.id = ?
     """, [agent_id])
     
@@ -601,26 +595,37 @@ def edit(agent_id):
     if not agent:
         return render_template('errors/404.html'), 404
     
-    # Données pour les formulaires
-    etablissements = execute_query("""
-        SELECT id, nom FROM etablissements ORDER BY nom
-    """)
+    # Données pour les formulaires (les autres établissements via /api/autocomplete)
+    etablissement_actuel = None
+    if agent['etablissement_id']:
+        etablissement_actuel = execute_query_single("""
+            SELECT id, nom FROM etablissements WHERE id = ?
+        """, [agent['etablissement_id']])
     
     corps_liste = execute_query("""
-        SELECT DISTINCT corps FROM personnel WHERE corps IS NOT NULL ORDER BY corps
+        SELECT d.libelle as corps
+        FROM dim_corps d
+        WHERE d.id IN (SELECT corps_id FROM personnel)
+        ORDER BY d.libelle
     """)
     
     grades_liste = execute_query("""
-        SELECT DISTINCT grade FROM personnel WHERE grade IS NOT NULL ORDER BY grade
+        SELECT d.libelle as grade
+        FROM dim_grades d
+        WHERE d.id IN (SELECT grade_id FROM personnel)
+        ORDER BY d.libelle
     """)
     
     fonctions_liste = execute_query("""
-        SELECT DISTINCT fonction FROM personnel WHERE fonction IS NOT NULL ORDER BY fonction
+        SELECT d.libelle as fonction
+        FROM dim_fonctions d
+        WHERE d.id IN (SELECT fonction_id FROM personnel)
+        ORDER BY d.libelle
     """)
     
     return render_template('personnel/edit.html',
                          agent=agent,
-                         etablissements=etablissements,
+                         etablissement_actuel=etablissement_actuel,
                          corps_liste=corps_liste,
                          grades_liste=grades_liste,
                          fonctions_liste=fonctions_liste)
@@ -633,14 +638,9 @@ def fiche(agent_id):
     agent = execute_query_single("""
         SELECT 
             p.*,
-            e.nom as etablissement_nom,
-            e.type_etablissement,
-            e.statut as etablissement_statut,
-            c.nom as commune_nom,
-            c.arrondissement
-        FROM personnel p
+            e.statut as etablissement_statut
+        FROM personnel_read p
         LEFT JOIN etablissements e ON p.etablissement_id = e.id
-        LEFT JOIN communes c ON e.commune_id = c.id
         WHERE p.id = ?
     """, [agent_id])
     
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Blueprint Profilage - Consultation des profils enregistrés
+Enregistré uniquement lorsque PROFILING_TOKEN est défini ; chaque page exige le jeton
+"""
+
+from flask import Blueprint, render_template, request, current_app, abort, send_from_directory
+import io
+import os
+import pstats
+import re
+
+from app.profilage import jeton_valide
+
+profilage_bp = Blueprint('profilage', __name__)
+
+_NOM_FICHIER = re.compile(r'^[\w.\-]+$')
+
+def verifier_acces():
+    """404 sans le jeton, pour ne pas révéler la page"""
+    if not jeton_valide(current_app):
+        abort(404)
+
+def lister_profils(dossier):
+    """Profils enregistrés, du plus récent au plus ancien"""
+    if not os.path.isdir(dossier):
+        return []
+    profils = []
+    for nom in sorted(os.listdir(dossier), reverse=True):
+        if nom.endswith('.pstats'):
+            base = nom[:-len('.pstats')]
+            profils.append({
+                'base': base,
+                'endpoint': base.split('_', 1)[-1],
+                'taille_ko': round(os.path.getsize(os.path.join(dossier, nom)) / 1024, 1),
+            })
+    return profils
+
+@profilage_bp.route('/')
+def index():
+    """Liste des profils enregistrés"""
+    verifier_acces()
+    return render_template('debug/profils.html',
+                         profils=lister_profils(current_app.config['PROFILING_DIR']),
+                         jeton=request.args.get('_profile', ''))
+
+@profilage_bp.route('/<base>')
+def detail(base):
+    """Fonctions les plus coûteuses d'un profil"""
+    verifier_acces()
+    dossier = current_app.config['PROFILING_DIR']
+    chemin = os.path.join(dossier, base + '.pstats')
+    if not _NOM_FICHIER.match(base) or not os.path.exists(chemin):
+        abort(404)
+
+    tri = request.args.get('tri', 'cumulative')
+    if tri not in ('cumulative', 'tottime', 'ncalls'):
+        tri = 'cumulative'
+    sortie = io.StringIO()
+    pstats.Stats(chemin, stream=sortie).strip_dirs().sort_stats(tri).print_stats(60)
+
+    return render_template('debug/profil.html',
+                         base=base,
+                         tri=tri,
+                         statistiques=sortie.getvalue(),
+                         jeton=request.args.get('_profile', ''))
+
+@profilage_bp.route('/<base>/<any(pstats, folded):extension>')
+def telecharger(base, extension):
+    """Fichier brut (pstats pour snakeviz, folded pour flamegraph.pl / speedscope)"""
+    verifier_acces()
+    if not _NOM_FICHIER.match(base):
+        abort(404)
+    return send_from_directory(os.path.abspath(current_app.config['PROFILING_DIR']),
+                               f"{base}.{extension}", as_attachment=True)
@@ -4,49 +4,26 @@
 Blueprint Rapports - Génération de rapports et analyses
 """
 
-from flask import Blueprint, render_template, jsonify, send_file, make_response
-import sqlite3
+from flask import (Blueprint, render_template, jsonify, send_file, make_response, request, Response,
+                   stream_template, stream_with_context)
 import json
 import io
 import os
 import csv
+from collections import defaultdict
+from itertools import chain
 from datetime import datetime
 
+from app.analytique import arrondi
+from app.constructeur import (DIMENSIONS, MAX_COLONNES_DENSES, MAX_DIMENSIONS, MESURES, RapportInvalide,
+                               RapportTropCouteux, pivot, rapport_sur_mesure)
+from app.cube import CUBE, cube
+from app.database import execute_query, execute_query_single, RequeteTropCouteuse
+
 rapports_bp = Blueprint('rapports', __name__)
 
-def get_db_connection():
-    """Obtient une connexion à la base de données SQLite"""
-    conn = sqlite3.connect('ief_louga.db')
-    conn.row_factory = sqlite3.Row  # Pour avoir des résultats sous forme de dictionnaire
-    return conn
-
-def execute_query(query, params=None):
-    """Exécute une requête et retourne les résultats"""
-    conn = get_db_connection()
-    try:
-        if params:
-            cursor = conn.execute(query, params)
-        else:
-            cursor = conn.execute(query)
-        
-        results = cursor.fetchall()
-        return [dict(row) for row in results]
-    finally:
-        conn.close()
-
-def execute_query_single(query, params=None):
-    """Exécute une requête et retourne un seul résultat"""
-    conn = get_db_connection()
-    try:
-        if params:
-            cursor = conn.execute(query, params)
-        else:
-            cursor = conn.execute(query)
-        
-        result = cursor.fetchone()
-        return dict(result) if result else None
-    finally:
-        conn.close()
+# Paramètres acceptés par toutes les routes en plus des leurs (profilage à la demande)
+PARAMETRES_OUTILS = {'_profile'}
 
 @rapports_bp.route('/')
 def index():
@@ -58,9 +35,9 @@ def index():
             (SELECT COUNT(*) FROM etablissements) as total_etablissements,
             (SELECT COUNT(*) FROM personnel) as total_personnel,
             (SELECT COUNT(*) FROM communes) as total_communes,
-            (SELECT COUNT(*) FROM etablissements WHERE statut LIKE '%Public%') as etablissements_publics,
-            (SELECT COUNT(*) FROM etablissements WHERE statut LIKE '%Privé%') as etablissements_prives,
-            (SELECT COUNT(*) FROM etablissements WHERE statut LIKE '%Com_Ass%' OR statut LIKE '%Communautaire%') as etablissements_communautaires,
+            (SELECT COUNT(*) FROM etablissements WHERE statut_code = 1) as etablissements_publics,
+            (SELECT COUNT(*) FROM etablissements WHERE statut_code = 2) as etablissements_prives,
+            (SELECT COUNT(*) FROM etablissements WHERE statut_code = 3) as etablissements_communautaires,
             (SELECT COUNT(*) FROM personnel WHERE etablissement_id IS NOT NULL OR service IS NOT NULL) as personnel_affecte,
             (SELECT COUNT(*) FROM personnel WHERE etablissement_id IS NULL AND (service IS NULL OR service = '')) as personnel_non_affecte
     """)
@@ -187,9 +164,8 @@ def export_complete_excel():
                 p.corps,
                 p.grade,
                 p.service,
-                e.nom as etablissement
-            FROM personnel p
-            LEFT JOIN etablissements e ON p.etablissement_id = e.id
+                p.etablissement_nom as etablissement
+            FROM personnel_read p
             ORDER BY p.nom, p.prenom
         """)
         
@@ -229,6 +205,8 @@ def export_complete_excel():
         
         return response
         
+    except RequeteTropCouteuse:
+        raise
     except Exception as e:
         return jsonify({'error': f'Erreur lors de l\'export: {str(e)}'}), 500
 
@@ -309,9 +287,162 @@ def export_executive_pdf():
         
         return response
         
+    except RequeteTropCouteuse:
+        raise
     except Exception as e:
         return jsonify({'error': f'Erreur lors de l\'export PDF: {str(e)}'}), 500
 
+# Constructeur de rapports
+@rapports_bp.route('/api/constructeur/champs')
+def api_constructeur_champs():
+    """Dimensions et mesures autorisées du constructeur de rapports"""
+    return jsonify({
+        'dimensions': {nom: libelle for nom, (libelle, _, _) in DIMENSIONS.items()},
+        'mesures': {nom: libelle for nom, (libelle, _) in MESURES.items()},
+        'max_dimensions': MAX_DIMENSIONS
+    })
+
+@rapports_bp.route('/api/constructeur')
+def api_constructeur():
+    """Tableau croisé à la demande : ?dimensions=grade,diplome_academique&mesures=effectif,femmes&filtres=corps:I"""
+    try:
+        resultat = rapport_sur_mesure(*parametres_constructeur())
+    except RapportInvalide as e:
+        return erreur_constructeur(e)
+    return jsonify({
+        'colonnes': resultat['colonnes'],
+        'cout_estime': resultat['cout_estime'],
+        'lignes': [dict(zip(resultat['colonnes'], ligne)) for ligne in resultat['lignes']]
+    })
+
+@rapports_bp.route('/api/constructeur/export')
+def api_constructeur_export():
+    """Même tableau croisé que /api/constructeur, en CSV transmis au fil de l'eau"""
+    try:
+        resultat = rapport_sur_mesure(*parametres_constructeur())
+    except RapportInvalide as e:
+        return erreur_constructeur(e)
+    
+    rangees = [[libelle_champ(c) for c in resultat['colonnes']], *resultat['lignes']]
+    return reponse_csv(rangees, f'rapport_{"_".join(resultat["colonnes"])}')
+
+@rapports_bp.route('/pivot')
+def pivot_html():
+    """Pivot lignes × colonne : ?lignes=corps,grade&colonne=commune&mesure=effectif&forme=auto"""
+    try:
+        demande = parametres_pivot()
+        colonnes, totaux, total, lignes = pivot(*demande['pivot'])
+    except RapportInvalide as e:
+        return erreur_constructeur(e)
+    
+    # Le tableau est rendu au fil de la lecture des lignes
+    return stream_template('rapports/pivot.html',
+                           demande=demande,
+                           colonnes=colonnes,
+                           totaux=totaux,
+                           total=total,
+                           lignes=lignes,
+                           creuse=forme_creuse(demande['forme'], colonnes),
+                           libelle_champ=libelle_champ)
+
+@rapports_bp.route('/api/pivot/export')
+def api_pivot_export():
+    """Pivot en CSV transmis au fil de l'eau ; forme creuse : une ligne par cellule non vide"""
+    try:
+        demande = parametres_pivot()
+        colonnes, totaux, total, lignes = pivot(*demande['pivot'])
+    except RapportInvalide as e:
+        return erreur_constructeur(e)
+    
+    dimensions, colonne, mesure, _ = demande['pivot']
+    entete = [libelle_champ(d) for d in dimensions]
+    if forme_creuse(demande['forme'], colonnes):
+        rangees = chain([entete + [libelle_champ(colonne), libelle_champ(mesure)]],
+                        (list(cle) + [valeur, n] for cle, cellules, _ in lignes for valeur, n in cellules.items()))
+    else:
+        pied = ['Total'] + [''] * (len(dimensions) - 1) + [totaux.get(v, '') for v in colonnes] + [total]
+        rangees = chain([entete + [libelle_valeur(v) for v in colonnes] + ['Total']],
+                        (list(cle) + [cellules.get(v, '') for v in colonnes] + [ligne_total if ligne_total is not None else '']
+                         for cle, cellules, ligne_total in lignes),
+                        [pied])
+    return reponse_csv(stream_with_context(rangees), f'pivot_{"_".join(dimensions)}_par_{colonne}')
+
+def reponse_csv(rangees, nom):
+    """Réponse CSV écrite par blocs de 1000 lignes à mesure que les rangées sont produites"""
+    def blocs():
+        output = io.StringIO()
+        writer = csv.writer(output)
+        for i, rangee in enumerate(rangees, 1):
+            writer.writerow(rangee)
+            if i % 1000 == 0:
+                yield output.getvalue()
+                output.seek(0)
+                output.truncate()
+        yield output.getvalue()
+    
+    response = Response(blocs(), mimetype='text/csv')
+    response.headers['Content-Type'] = 'text/csv; charset=utf-8'
+    response.headers['Content-Disposition'] = f'attachment; filename={nom}_{datetime.now().strftime("%Y%m%d_%H%M")}.csv'
+    return response
+
+def verifier_parametres(attendus):
+    """RapportInvalide si la requête porte un paramètre inconnu (hors outillage)"""
+    inconnus = sorted(set(request.args) - set(attendus) - PARAMETRES_OUTILS)
+    if inconnus:
+        raise RapportInvalide(f"paramètre(s) inconnu(s) : {', '.join(inconnus)} ; "
+                              f"attendus : {', '.join(attendus)}")
+
+def parametres_constructeur():
+    """(dimensions, mesures, filtres) lus dans ?dimensions=&mesures=&filtres=dimension:valeur,..."""
+    verifier_parametres(('dimensions', 'mesures', 'filtres'))
+    dimensions = [d.strip() for d in request.args.get('dimensions', '').split(',') if d.strip()]
+    mesures = [m.strip() for m in request.args.get('mesures', 'effectif').split(',') if m.strip()]
+    return dimensions, mesures, lire_filtres()
+
+def parametres_pivot():
+    """{'pivot': (lignes, colonne, mesure, filtres), 'forme'} lus dans la requête"""
+    verifier_parametres(('lignes', 'colonne', 'mesure', 'forme', 'filtres'))
+    lignes = [d.strip() for d in request.args.get('lignes', '').split(',') if d.strip()]
+    colonne = request.args.get('colonne', '').strip()
+    mesure = request.args.get('mesure', 'effectif').strip()
+    forme = request.args.get('forme', 'auto')
+    if forme not in ('auto', 'dense', 'creuse'):
+        raise RapportInvalide("forme attendue : auto, dense ou creuse")
+    return {'pivot': (lignes, colonne, mesure, lire_filtres()), 'forme': forme}
+
+def forme_creuse(forme, colonnes):
+    """Forme creuse demandée, ou automatique au-delà de MAX_COLONNES_DENSES colonnes"""
+    return forme == 'creuse' or (forme == 'auto' and len(colonnes) > MAX_COLONNES_DENSES)
+
+def lire_filtres():
+    """{dimension: [valeurs]} de ?filtres=dimension:valeur,... (une dimension répétée accepte plusieurs valeurs)"""
+    filtres = defaultdict(list)
+    for clause in request.args.get('filtres', '').split(','):
+        if not clause.strip():
+            continue
+        if ':' not in clause:
+            raise RapportInvalide(f"filtre invalide : « {clause.strip()} », dimension:valeur attendu")
+        dimension, valeur = clause.split(':', 1)
+        filtres[dimension.strip()].append(valeur.strip())
+    return filtres
+
+def erreur_constructeur(erreur):
+    """413 pour un rapport trop coûteux, 400 pour une demande invalide"""
+    if isinstance(erreur, RapportTropCouteux):
+        return jsonify({'error': f'Rapport trop coûteux : {erreur}', 'cout_estime': erreur.cout,
+                        'limite': erreur.limite,
+                        'conseil': "Réduisez le nombre de dimensions ou ajoutez des filtres "
+                                   "(commune, arrondissement, corps...)."}), 413
+    return jsonify({'error': str(erreur), 'dimensions': list(DIMENSIONS), 'mesures': list(MESURES)}), 400
+
+def libelle_champ(nom):
+    """Libellé d'une dimension ou d'une mesure (en-têtes CSV)"""
+    return (DIMENSIONS.get(nom) or MESURES[nom])[0]
+
+def libelle_valeur(valeur):
+    """En-tête d'une valeur de colonne de pivot"""
+    return 'Non renseigné' if valeur is None else valeur
+
 def generer_rapport_synthese():
     """Génère les données du rapport de synthèse"""
     
@@ -321,10 +452,10 @@ def generer_rapport_synthese():
             (SELECT COUNT(*) FROM etablissements) as total_etablissements,
             (SELECT COUNT(*) FROM personnel) as total_personnel,
             (SELECT COUNT(*) FROM communes) as total_communes,
-            (SELECT COUNT(*) FROM etablissements WHERE statut LIKE '%Public%') as etablissements_publics,
-            (SELECT COUNT(*) FROM etablissements WHERE statut LIKE '%Privé%') as etablissements_prives,
-            (SELECT COUNT(*) FROM personnel WHERE genre IN ('M', 'H')) as personnel_hommes,
-            (SELECT COUNT(*) FROM personnel WHERE genre = 'F') as personnel_femmes
+            (SELECT COUNT(*) FROM etablissements WHERE statut_code = 1) as etablissements_publics,
+            (SELECT COUNT(*) FROM etablissements WHERE statut_code = 2) as etablissements_prives,
+            (SELECT COUNT(*) FROM personnel WHERE genre_code = 1) as personnel_hommes,
+            (SELECT COUNT(*) FROM personnel WHERE genre_code = 2) as personnel_femmes
     """)
     
     # Répartition établissements par type
@@ -343,14 +474,11 @@ def generer_rapport_synthese():
         SELECT 
             c.nom as commune,
             c.arrondissement,
-            COUNT(e.id) as nombre_etablissements,
-            COUNT(p.id) as nombre_personnel
+            c.nombre_etablissements,
+            c.nombre_personnel
         FROM communes c
-        LEFT JOIN etablissements e ON c.id = e.commune_id
-        LEFT JOIN personnel p ON e.id = p.etablissement_id
-        GROUP BY c.id, c.nom, c.arrondissement
-        HAVING nombre_etablissements > 0
-        ORDER BY nombre_etablissements DESC
+        WHERE c.nombre_etablissements > 0
+        ORDER BY c.nombre_etablissements DESC
         LIMIT 10
     """)
     
@@ -393,19 +521,15 @@ def generer_rapport_etablissements():
         FROM etablissements
     """)
     
-    # Établissements par commune et type
-    repartition_communale = execute_query("""
-        SELECT 
-            c.nom as commune,
-            c.arrondissement,
-            e.type_etablissement,
-            COUNT(e.id) as count
-        FROM communes c
-        LEFT JOIN etablissements e ON c.id = e.commune_id
-        WHERE e.id IS NOT NULL
-        GROUP BY c.nom, c.arrondissement, e.type_etablissement
-        ORDER BY c.nom, count DESC
-    """)
+    # Établissements par commune et type (cube des effectifs)
+    repartition_communale = sorted(({
+        'commune': ligne['commune'],
+        'arrondissement': ligne['arrondissement'],
+        'type_etablissement': ligne['type_etablissement'],
+        'count': ligne['etablissements']
+    } for ligne in cube(('commune', 'arrondissement', 'type_etablissement'))
+        if ligne['commune'] is not None and ligne['etablissements']),
+        key=lambda ligne: (ligne['commune'], -ligne['count']))
     
     # Directeurs et contacts
     responsables_analyse = execute_query_single("""
@@ -433,8 +557,8 @@ def generer_rapport_personnel():
             corps,
             grade,
             COUNT(*) as count,
-            COUNT(CASE WHEN genre IN ('M', 'H') THEN 1 END) as hommes,
-            COUNT(CASE WHEN genre = 'F' THEN 1 END) as femmes
+            COUNT(CASE WHEN genre_code = 1 THEN 1 END) as hommes,
+            COUNT(CASE WHEN genre_code = 2 THEN 1 END) as femmes
         FROM personnel
         WHERE corps IS NOT NULL AND grade IS NOT NULL
         GROUP BY corps, grade
@@ -497,36 +621,37 @@ def generer_rapport_personnel():
 def generer_rapport_couverture():
     """Génère les données du rapport de couverture territoriale"""
     
-    # Couverture par arrondissement
-    par_arrondissement = execute_query("""
-        SELECT 
-            c.arrondissement,
-            COUNT(DISTINCT c.id) as nombre_communes,
-            COUNT(e.id) as nombre_etablissements,
-            COUNT(p.id) as nombre_personnel,
-            ROUND(AVG(CASE WHEN e.id IS NOT NULL THEN 1.0 ELSE 0.0 END) * 100, 1) as taux_couverture
-        FROM communes c
-        LEFT JOIN etablissements e ON c.id = e.commune_id
-        LEFT JOIN personnel p ON e.id = p.etablissement_id
-        GROUP BY c.arrondissement
-        ORDER BY nombre_etablissements DESC
-    """)
-    
-    # Densité par commune
-    densite_communale = execute_query("""
-        SELECT 
-            c.nom as commune,
-            c.arrondissement,
-            COUNT(e.id) as nombre_etablissements,
-            COUNT(p.id) as nombre_personnel,
-            ROUND(CAST(COUNT(p.id) AS FLOAT) / NULLIF(COUNT(e.id), 0), 1) as ratio_personnel_etablissement
-        FROM communes c
-        LEFT JOIN etablissements e ON c.id = e.commune_id
-        LEFT JOIN personnel p ON e.id = p.etablissement_id
-        GROUP BY c.id, c.nom, c.arrondissement
-        HAVING nombre_etablissements > 0
-        ORDER BY nombre_etablissements DESC
-    """)
+    # Densité par commune (cube des effectifs)
+    densite_communale = sorted(({
+        'commune': ligne['commune'],
+        'arrondissement': ligne['arrondissement'],
+        'nombre_etablissements': ligne['etablissements'],
+        'nombre_personnel': ligne['effectif'],
+        'ratio_personnel_etablissement': arrondi(ligne['effectif'] / ligne['etablissements'])
+    } for ligne in cube(('commune', 'arrondissement'))
+        if ligne['commune'] is not None and ligne['etablissements']),
+        key=lambda ligne: ligne['nombre_etablissements'], reverse=True)
+    
+    # Couverture par arrondissement : part des communes ayant au moins un établissement
+    communes = defaultdict(int)
+    for _, arrondissement in CUBE.obtenir().communes:
+        communes[arrondissement] += 1
+    
+    couverture = defaultdict(lambda: {'couvertes': 0, 'etablissements': 0, 'personnel': 0})
+    for ligne in densite_communale:
+        arrondissement = couverture[ligne['arrondissement']]
+        arrondissement['couvertes'] += 1
+        arrondissement['etablissements'] += ligne['nombre_etablissements']
+        arrondissement['personnel'] += ligne['nombre_personnel']
+    
+    par_arrondissement = sorted(({
+        'arrondissement': arrondissement,
+        'nombre_communes': nombre,
+        'nombre_etablissements': couverture[arrondissement]['etablissements'],
+        'nombre_personnel': couverture[arrondissement]['personnel'],
+        'taux_couverture': arrondi(couverture[arrondissement]['couvertes'] * 100.0 / nombre)
+    } for arrondissement, nombre in communes.items()),
+        key=lambda ligne: ligne['nombre_etablissements'], reverse=True)
     
     # Analyse des zones non couvertes ou sous-couvertes
     zones_critique = execute_query("""
@@ -556,8 +681,8 @@ def generer_rapport_indicateurs():
         SELECT 
             ROUND(CAST((SELECT COUNT(*) FROM personnel) AS FLOAT) / (SELECT COUNT(*) FROM etablissements), 1) as ratio_personnel_etablissement,
             ROUND(CAST((SELECT COUNT(*) FROM etablissements) AS FLOAT) / (SELECT COUNT(*) FROM communes), 1) as ratio_etablissement_commune,
-            ROUND((SELECT COUNT(*) FROM etablissements WHERE statut LIKE '%Public%') * 100.0 / (SELECT COUNT(*) FROM etablissements), 1) as taux_public,
-            ROUND((SELECT COUNT(*) FROM personnel WHERE genre = 'F') * 100.0 / (SELECT COUNT(*) FROM personnel WHERE genre IS NOT NULL), 1) as taux_feminisation,
+            ROUND((SELECT COUNT(*) FROM etablissements WHERE statut_code = 1) * 100.0 / (SELECT COUNT(*) FROM etablissements), 1) as taux_public,
+            ROUND((SELECT COUNT(*) FROM personnel WHERE genre_code = 2) * 100.0 / (SELECT COUNT(*) FROM personnel WHERE genre IS NOT NULL), 1) as taux_feminisation,
             ROUND((SELECT COUNT(*) FROM etablissements WHERE coordonnees_x IS NOT NULL) * 100.0 / (SELECT COUNT(*) FROM etablissements), 1) as taux_geolocalisation,
             ROUND((SELECT COUNT(*) FROM personnel WHERE etablissement_id IS NOT NULL OR service IS NOT NULL) * 100.0 / (SELECT COUNT(*) FROM personnel), 1) as taux_affectation
     """)
@@ -577,12 +702,7 @@ def generer_rapport_indicateurs():
             COUNT(*) as nombre,
             ROUND(AVG(nombre_personnel), 1) as personnel_moyen,
             ROUND(COUNT(*) * 100.0 / (SELECT COUNT(*) FROM etablissements), 1) as pourcentage_total
-        FROM (
-            SELECT 
-                e.type_etablissement,
-                (SELECT COUNT(*) FROM personnel p WHERE p.etablissement_id = e.id) as nombre_personnel
-            FROM etablissements e
-        ) as subq
+        FROM etablissements
         GROUP BY type_etablissement
         ORDER BY nombre DESC
     """)
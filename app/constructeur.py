@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Constructeur de rapports : tableaux croisés du personnel à la demande
+Les dimensions et mesures autorisées sont déclarées ici ; une demande est
+compilée en une requête SQL paramétrée sur personnel_read. Avant exécution, le
+coût est estimé depuis EXPLAIN QUERY PLAN et les statistiques d'ANALYZE
+(sqlite_stat1) : les combinaisons trop coûteuses sont refusées. Les résultats
+sont conservés par génération des données. Les tableaux croisés larges
+(pivots) sont produits ligne à ligne depuis une seule requête triée.
+"""
+
+import math
+import re
+import threading
+from collections import OrderedDict
+from itertools import groupby
+
+from flask import current_app
+
+from app import get_db_connection
+from app.analytique import ANNEE_REFERENCE
+from app.database import execute_query, iterer_requete
+from app.generation import CacheGeneration
+
+STATUT = "CASE {alias}statut_code WHEN 1 THEN 'Public' WHEN 2 THEN 'Privé' WHEN 3 THEN 'Com_Ass' END"
+
+# Dimension -> (libellé, expression SQL, filtre SQL sur {marques})
+# Les filtres géographiques passent par les index de communes et d'établissements
+DIMENSIONS = {
+    'corps': ("Corps", "p.corps", None),
+    'grade': ("Grade", "p.grade", None),
+    'fonction': ("Fonction", "p.fonction", None),
+    'specialite': ("Spécialité", "p.specialite", None),
+    'genre': ("Genre", "CASE p.genre_code WHEN 1 THEN 'M' WHEN 2 THEN 'F' END", None),
+    'diplome_academique': ("Diplôme académique", "p.diplome_academique", None),
+    'diplome_professionnel': ("Diplôme professionnel", "p.diplome_professionnel", None),
+    'situation_matrimoniale': ("Situation matrimoniale", "p.situation_matrimoniale", None),
+    'anciennete': ("Ancienneté", f"""CASE
+        WHEN p.date_entree_enseignement IS NULL THEN 'Non renseigné'
+        WHEN CAST(SUBSTR(p.date_entree_enseignement, 1, 4) AS INTEGER) >= {ANNEE_REFERENCE - 9} THEN 'Moins de 10 ans'
+        WHEN CAST(SUBSTR(p.date_entree_enseignement, 1, 4) AS INTEGER) >= {ANNEE_REFERENCE - 19} THEN '10-20 ans'
+        WHEN CAST(SUBSTR(p.date_entree_enseignement, 1, 4) AS INTEGER) >= {ANNEE_REFERENCE - 29} THEN '20-30 ans'
+        ELSE 'Plus de 30 ans' END""", None),
+    'arrondissement': ("Arrondissement", "p.arrondissement",
+                       "p.commune_id IN (SELECT id FROM communes WHERE arrondissement IN ({marques}))"),
+    'commune': ("Commune", "p.commune_nom",
+                "p.commune_id IN (SELECT id FROM communes WHERE nom IN ({marques}))"),
+    'type_etablissement': ("Type d'établissement", "p.type_etablissement",
+                           "p.etablissement_id IN (SELECT id FROM etablissements WHERE type_etablissement IN ({marques}))"),
+    'etablissement': ("Établissement", "p.etablissement_nom",
+                      "p.etablissement_id IN (SELECT id FROM etablissements WHERE nom IN ({marques}))"),
+    'statut': ("Statut", STATUT.format(alias='e.'),
+               "p.etablissement_id IN (SELECT id FROM etablissements WHERE " + STATUT.format(alias='') + " IN ({marques}))"),
+}
+
+# Dimensions lues sur l'établissement (jointure)
+DIMENSIONS_JOINTURE = {'statut'}
+
+MESURES = {
+    'effectif': ("Effectif", "COUNT(*)"),
+    'hommes': ("Hommes", "COUNT(CASE WHEN p.genre_code = 1 THEN 1 END)"),
+    'femmes': ("Femmes", "COUNT(CASE WHEN p.genre_code = 2 THEN 1 END)"),
+    'etablissements': ("Établissements", "COUNT(DISTINCT p.etablissement_id)"),
+    'anciennete_moyenne': ("Ancienneté moyenne",
+                           f"ROUND(AVG({ANNEE_REFERENCE} - CAST(SUBSTR(p.date_entree_enseignement, 1, 4) AS INTEGER)), 1)"),
+    'age_moyen': ("Âge moyen", f"ROUND(AVG({ANNEE_REFERENCE} - CAST(SUBSTR(p.date_naissance, 1, 4) AS INTEGER)), 1)"),
+}
+
+# Mesures dont le total d'une ligne de pivot est la somme de ses cellules
+MESURES_ADDITIVES = {'effectif', 'hommes', 'femmes'}
+
+MAX_DIMENSIONS = 4
+
+# Au-delà, un pivot en forme 'auto' est produit en forme creuse (cellules non vides)
+MAX_COLONNES_DENSES = 200
+
+# Rapports conservés par génération
+TAILLE_MEMO = 128
+
+# Alias des tables dans les requêtes compilées
+ALIAS = {'p': 'personnel_read', 'e': 'etablissements'}
+
+_ACCES = re.compile(r'^(SCAN|SEARCH) (\S+)(?: AS (\S+))?(?: USING (?:COVERING )?INDEX (\S+)(?: \((.*)\))?)?')
+
+
+class RapportInvalide(ValueError):
+    pass
+
+
+class RapportTropCouteux(RapportInvalide):
+    """Coût estimé au-delà de REPORT_COST_LIMIT"""
+
+    def __init__(self, cout, limite):
+        super().__init__(f"coût estimé {cout:_} lignes, limite {limite:_}".replace('_', ' '))
+        self.cout = cout
+        self.limite = limite
+
+
+def compiler(dimensions, mesures, filtres):
+    """(sql, paramètres) du tableau croisé ; filtres : {dimension: valeurs acceptées}"""
+    inconnues = [d for d in (*dimensions, *filtres) if d not in DIMENSIONS]
+    inconnues += [m for m in mesures if m not in MESURES]
+    if inconnues:
+        raise RapportInvalide(f"champ(s) inconnu(s) : {', '.join(inconnues)}")
+    if len(dimensions) > MAX_DIMENSIONS:
+        raise RapportInvalide(f"au plus {MAX_DIMENSIONS} dimensions")
+    if len(set(dimensions)) != len(dimensions) or len(set(mesures)) != len(mesures):
+        raise RapportInvalide("champ demandé plusieurs fois")
+    if not mesures:
+        raise RapportInvalide("aucune mesure demandée")
+
+    colonnes = [f"{DIMENSIONS[d][1]} AS {d}" for d in dimensions]
+    colonnes += [f"{MESURES[m][1]} AS {m}" for m in mesures]
+    sql = f"SELECT {', '.join(colonnes)} FROM personnel_read p"
+    if DIMENSIONS_JOINTURE.intersection(dimensions):
+        sql += " LEFT JOIN etablissements e ON e.id = p.etablissement_id"
+
+    conditions, parametres = [], []
+    for d, valeurs in sorted(filtres.items()):
+        valeurs = sorted(valeurs)
+        marques = ', '.join('?' * len(valeurs))
+        filtre = DIMENSIONS[d][2] or f"{DIMENSIONS[d][1]} IN ({{marques}})"
+        conditions.append(filtre.format(marques=marques))
+        parametres.extend(valeurs)
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    if dimensions:
+        positions = ', '.join(str(i + 1) for i in range(len(dimensions)))
+        sql += f" GROUP BY {positions} ORDER BY {positions}"
+    return sql, parametres
+
+
+class ConstructeurRapports:
+    """Statistiques des tables et rapports déjà calculés, pour une génération des données"""
+
+    def __init__(self, conn):
+        self.lignes_tables = {}
+        self.lignes_par_cle = {}
+        for table, index, stat in conn.execute("SELECT tbl, idx, stat FROM sqlite_stat1"):
+            nombres = [int(n) for n in stat.split() if n.isdigit()]
+            if not nombres:
+                continue
+            self.lignes_tables[table] = nombres[0]
+            if index:
+                self.lignes_par_cle[index] = nombres[1:]
+        for table in ('personnel_read', 'etablissements', 'communes'):
+            if table not in self.lignes_tables:
+                self.lignes_tables[table] = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        self._memo = OrderedDict()
+        self._verrou = threading.Lock()
+
+    def estimer_cout(self, conn, sql, parametres):
+        """Lignes visitées estimées : boucles imbriquées du plan, sous-requêtes et tris"""
+        plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}", parametres).fetchall()
+        racines = {0}
+        cout, lignes = 0, 1
+        tris = 0
+        for identifiant, parent, _, detail in plan:
+            acces = _ACCES.match(detail)
+            if parent in racines and not acces and 'SUBQUERY' not in detail:
+                racines.add(identifiant)
+            if detail.startswith('USE TEMP B-TREE'):
+                tris += 1
+            elif acces:
+                estimation = self._lignes_acces(*acces.groups())
+                if parent in racines:
+                    lignes *= estimation
+                    cout += lignes
+                else:
+                    cout += estimation
+        if tris:
+            cout += tris * int(lignes * math.log2(lignes + 1))
+        return int(cout)
+
+    def _lignes_acces(self, operation, nom, alias, index, contraintes):
+        table = ALIAS.get(alias or nom, nom)
+        total = self.lignes_tables.get(table, 1)
+        if operation == 'SCAN':
+            return total
+        if index is None:
+            # Clé primaire (rowid=?)
+            return 1
+        egalites = (contraintes or '').count('=?')
+        moyennes = self.lignes_par_cle.get(index, [])
+        if 0 < egalites <= len(moyennes):
+            return moyennes[egalites - 1]
+        return max(total // 10, 1)
+
+    def rapport(self, dimensions, mesures, filtres):
+        """{'colonnes', 'lignes', 'cout_estime'} ; RapportTropCouteux si le coût dépasse la limite"""
+        filtres = {d: frozenset(v) for d, v in filtres.items() if v}
+        sql, parametres = compiler(dimensions, mesures, filtres)
+
+        cle_memo = (tuple(dimensions), tuple(mesures), frozenset(filtres.items()))
+        with self._verrou:
+            if cle_memo in self._memo:
+                self._memo.move_to_end(cle_memo)
+                return self._memo[cle_memo]
+
+        conn = get_db_connection()
+        try:
+            cout = self.estimer_cout(conn, sql, parametres)
+        finally:
+            conn.close()
+        limite = current_app.config.get('REPORT_COST_LIMIT')
+        if limite and cout > limite:
+            raise RapportTropCouteux(cout, limite)
+
+        colonnes = [*dimensions, *mesures]
+        resultat = {
+            'colonnes': colonnes,
+            'lignes': [tuple(ligne[c] for c in colonnes) for ligne in execute_query(sql, parametres)],
+            'cout_estime': cout,
+        }
+        with self._verrou:
+            self._memo[cle_memo] = resultat
+            if len(self._memo) > TAILLE_MEMO:
+                self._memo.popitem(last=False)
+        return resultat
+
+    def pivot(self, lignes, colonne, mesure, filtres):
+        """(colonnes, totaux par colonne, total général, lignes) d'un pivot lignes × valeurs de la colonne
+
+        Les lignes sont produites au fil d'un seul parcours de la requête agrégée,
+        triée sur les dimensions de ligne puis la colonne : (clé, {valeur: mesure}, total).
+        """
+        if not lignes or not colonne:
+            raise RapportInvalide("au moins une dimension de ligne et une colonne")
+        if colonne in lignes:
+            raise RapportInvalide("champ demandé plusieurs fois")
+        filtres = {d: frozenset(v) for d, v in filtres.items() if v}
+        sql, parametres = compiler([*lignes, colonne], [mesure], filtres)
+
+        conn = get_db_connection()
+        try:
+            cout = self.estimer_cout(conn, sql, parametres)
+        finally:
+            conn.close()
+        limite = current_app.config.get('REPORT_COST_LIMIT')
+        if limite and cout > limite:
+            raise RapportTropCouteux(cout, limite)
+
+        # En-tête et totaux de colonne : même agrégat sur la seule colonne (mémorisé)
+        totaux = self.rapport([colonne], [mesure], filtres)['lignes']
+        total = self.rapport([], [mesure], filtres)['lignes'][0][0]
+        return [v for v, _ in totaux], dict(totaux), total, self._lignes_pivot(sql, parametres, len(lignes), mesure)
+
+    @staticmethod
+    def _lignes_pivot(sql, parametres, nb_dimensions, mesure):
+        for cle, cellules in groupby(iterer_requete(sql, parametres), key=lambda ligne: tuple(ligne[:nb_dimensions])):
+            valeurs = {cellule[nb_dimensions]: cellule[nb_dimensions + 1] for cellule in cellules}
+            total = sum(v or 0 for v in valeurs.values()) if mesure in MESURES_ADDITIVES else None
+            yield cle, valeurs, total
+
+
+def construire_constructeur():
+    conn = get_db_connection()
+    try:
+        return ConstructeurRapports(conn)
+    finally:
+        conn.close()
+
+
+CONSTRUCTEUR = CacheGeneration(construire_constructeur, nom='constructeur_rapports')
+
+
+def rapport_sur_mesure(dimensions, mesures, filtres=None):
+    """Tableau croisé du personnel sur les dimensions et mesures demandées"""
+    return CONSTRUCTEUR.obtenir().rapport(dimensions, mesures, filtres or {})
+
+
+def pivot(lignes, colonne, mesure, filtres=None):
+    """Pivot lignes × valeurs de la colonne, lignes produites au fil de l'eau"""
+    return CONSTRUCTEUR.obtenir().pivot(lignes, colonne, mesure, filtres or {})
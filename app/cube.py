@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cube des effectifs : communes × établissements × personnel
+Les comptages au niveau le plus fin (commune, type et statut d'établissement,
+corps, grade, fonction et genre de l'agent) sont lus une fois par génération des
+données ; tout tableau croisé sur un sous-ensemble de ces dimensions s'en
+déduit par agrégation en mémoire, sans jointure ni GROUP BY en SQL.
+Avec NumPy, le filtrage croisé du dashboard travaille sur les cellules codées
+en entiers (masques et bincount) ; sinon il les parcourt en Python.
+"""
+
+import threading
+from collections import OrderedDict, defaultdict
+from operator import itemgetter
+
+from app import get_db_connection
+from app.analytique import moteur_disponible
+from app.generation import CacheGeneration
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+DIMENSIONS_ETABLISSEMENT = ('arrondissement', 'commune', 'type_etablissement', 'statut')
+DIMENSIONS_PERSONNEL = ('corps', 'grade', 'fonction', 'genre')
+DIMENSIONS = DIMENSIONS_ETABLISSEMENT + DIMENSIONS_PERSONNEL
+
+# Tableaux croisés conservés par génération
+TAILLE_MEMO = 256
+
+
+class DimensionInconnue(ValueError):
+    pass
+
+
+class CubeEffectifs:
+    """Nombre d'établissements et effectif par cellule, agrégeables sur toute dimension"""
+
+    def __init__(self, communes, etablissements, personnel):
+        """communes : (nom, arrondissement) ; etablissements : (valeurs des 4 dimensions
+        d'établissement, nombre) ; personnel : (valeurs des 8 dimensions, effectif)"""
+        self.communes = list(communes)
+        self._etablissements = [(tuple(ligne[:-1]), ligne[-1]) for ligne in etablissements]
+        self._personnel = [(tuple(ligne[:-1]), ligne[-1]) for ligne in personnel]
+        self._memo = OrderedDict()
+        self._verrou = threading.Lock()
+        # Cellules codées en entiers pour le filtrage croisé vectorisé
+        self._colonnes = None
+        if np is not None:
+            self._colonnes = {'personnel': coder(self._personnel, DIMENSIONS),
+                              'etablissements': coder(self._etablissements, DIMENSIONS_ETABLISSEMENT)}
+
+    def __len__(self):
+        return len(self._etablissements) + len(self._personnel)
+
+    def agreger(self, dimensions, filtres=None):
+        """Lignes {dimension: valeur, ..., 'etablissements', 'effectif'}
+
+        filtres : {dimension: valeurs acceptées}. Le nombre d'établissements
+        n'est donné que si aucune dimension du personnel n'est demandée ni filtrée.
+        """
+        filtres = {d: frozenset(v) for d, v in (filtres or {}).items() if v}
+        inconnues = [d for d in (*dimensions, *filtres) if d not in DIMENSIONS]
+        if inconnues:
+            raise DimensionInconnue(', '.join(inconnues))
+
+        cle_memo = (tuple(dimensions), frozenset(filtres.items()))
+        with self._verrou:
+            if cle_memo in self._memo:
+                self._memo.move_to_end(cle_memo)
+                return self._memo[cle_memo]
+
+        avec_etablissements = not any(d in DIMENSIONS_PERSONNEL for d in (*dimensions, *filtres))
+        cle = projection([DIMENSIONS.index(d) for d in dimensions])
+        criteres = [(DIMENSIONS.index(d), valeurs) for d, valeurs in filtres.items()]
+
+        effectifs = self._sommer(self._personnel, cle, criteres)
+        etablissements = self._sommer(self._etablissements, cle, criteres) if avec_etablissements else {}
+
+        lignes = []
+        for groupe in sorted(effectifs.keys() | etablissements.keys(),
+                             key=lambda groupe: [(v is None, v or '') for v in groupe]):
+            ligne = dict(zip(dimensions, groupe))
+            if avec_etablissements:
+                ligne['etablissements'] = etablissements.get(groupe, 0)
+            ligne['effectif'] = effectifs.get(groupe, 0)
+            lignes.append(ligne)
+
+        with self._verrou:
+            self._memo[cle_memo] = lignes
+            if len(self._memo) > TAILLE_MEMO:
+                self._memo.popitem(last=False)
+        return lignes
+
+    def croiser(self, selection, dimensions, vectoriser=False):
+        """Filtrage croisé en une passe : pour chaque dimension, (établissements, effectif)
+        par valeur sous les filtres de la sélection posés sur les autres dimensions
+
+        Renvoie (totaux, {dimension: {valeur: [établissements, effectif]}}) ; le
+        nombre d'établissements vaut None dès qu'un filtre porte sur le personnel.
+        """
+        selection = {d: frozenset(v) for d, v in selection.items() if v}
+        inconnues = [d for d in (*dimensions, *selection) if d not in DIMENSIONS]
+        if inconnues:
+            raise DimensionInconnue(', '.join(inconnues))
+
+        cle_memo = ('croiser', tuple(dimensions), frozenset(selection.items()))
+        with self._verrou:
+            if cle_memo in self._memo:
+                self._memo.move_to_end(cle_memo)
+                return self._memo[cle_memo]
+
+        avec_etablissements = not any(d in DIMENSIONS_PERSONNEL for d in selection)
+        if vectoriser and self._colonnes is not None:
+            resultat = self._croiser_colonnes(selection, dimensions, avec_etablissements)
+        else:
+            resultat = self._croiser_cellules(selection, dimensions, avec_etablissements)
+
+        with self._verrou:
+            self._memo[cle_memo] = resultat
+            if len(self._memo) > TAILLE_MEMO:
+                self._memo.popitem(last=False)
+        return resultat
+
+    def _croiser_cellules(self, selection, dimensions, avec_etablissements):
+        graphiques = {}
+        for d in dimensions:
+            etablissements = 0 if avec_etablissements and d in DIMENSIONS_ETABLISSEMENT else None
+            graphiques[d] = defaultdict(lambda etablissements=etablissements: [etablissements, 0])
+        totaux = [0 if avec_etablissements else None, 0]
+
+        passes = [(1, self._personnel, DIMENSIONS)]
+        if avec_etablissements:
+            passes.append((0, self._etablissements, DIMENSIONS_ETABLISSEMENT))
+        for mesure, cellules, dimensions_cellule in passes:
+            positions = [(d, dimensions_cellule.index(d)) for d in dimensions if d in dimensions_cellule]
+            criteres = [(dimensions_cellule.index(d), d, acceptees) for d, acceptees in selection.items()]
+            for valeurs, n in cellules:
+                ecarts = [d for i, d, acceptees in criteres if valeurs[i] not in acceptees]
+                if not ecarts:
+                    totaux[mesure] += n
+                    for d, i in positions:
+                        graphiques[d][valeurs[i]][mesure] += n
+                elif len(ecarts) == 1 and ecarts[0] in graphiques:
+                    d = ecarts[0]
+                    graphiques[d][valeurs[dimensions_cellule.index(d)]][mesure] += n
+
+        return ({'etablissements': totaux[0], 'effectif': totaux[1]},
+                {d: dict(valeurs) for d, valeurs in graphiques.items()})
+
+    def _croiser_colonnes(self, selection, dimensions, avec_etablissements):
+        graphiques = {d: defaultdict(lambda d=d: [0 if avec_etablissements and d in DIMENSIONS_ETABLISSEMENT
+                                                  else None, 0])
+                      for d in dimensions}
+        totaux = [0 if avec_etablissements else None, 0]
+
+        passes = [(1, 'personnel', DIMENSIONS)]
+        if avec_etablissements:
+            passes.append((0, 'etablissements', DIMENSIONS_ETABLISSEMENT))
+        for mesure, nom, dimensions_cellule in passes:
+            colonnes, libelles, nombres = self._colonnes[nom]
+            # Filtres non satisfaits par chaque cellule
+            rejets = {d: ~np.isin(colonnes[d], [code for code, libelle in enumerate(libelles[d])
+                                                 if libelle in acceptees])
+                      for d, acceptees in selection.items()}
+            ecarts = sum((rejet.astype(np.int8) for rejet in rejets.values()), np.zeros(len(nombres), np.int8))
+            retenues = ecarts == 0
+            totaux[mesure] += int(nombres[retenues].sum())
+            for d in dimensions:
+                if d not in dimensions_cellule:
+                    continue
+                masque = retenues | ((ecarts == 1) & rejets[d]) if d in rejets else retenues
+                sommes = np.bincount(colonnes[d][masque], weights=nombres[masque], minlength=len(libelles[d]))
+                for code in np.flatnonzero(sommes).tolist():
+                    graphiques[d][libelles[d][code]][mesure] += int(sommes[code])
+
+        return ({'etablissements': totaux[0], 'effectif': totaux[1]},
+                {d: dict(valeurs) for d, valeurs in graphiques.items()})
+
+    @staticmethod
+    def _sommer(cellules, cle, criteres):
+        if criteres:
+            cellules = [(valeurs, n) for valeurs, n in cellules
+                        if all(valeurs[i] in acceptees for i, acceptees in criteres)]
+        sommes = defaultdict(int)
+        for valeurs, n in cellules:
+            sommes[cle(valeurs)] += n
+        return sommes
+
+
+def projection(positions):
+    """Fonction valeurs -> tuple des valeurs aux positions données"""
+    if not positions:
+        return lambda valeurs: ()
+    if len(positions) == 1:
+        position = positions[0]
+        return lambda valeurs: (valeurs[position],)
+    return itemgetter(*positions)
+
+
+def coder(cellules, dimensions):
+    """({dimension: codes}, {dimension: libellés}, nombres) des cellules ; None est un libellé"""
+    colonnes, libelles = {}, {}
+    for i, d in enumerate(dimensions):
+        codes = {}
+        colonnes[d] = np.array([codes.setdefault(valeurs[i], len(codes)) for valeurs, _ in cellules], dtype=np.int64)
+        libelles[d] = list(codes)
+    return colonnes, libelles, np.array([n for _, n in cellules], dtype=np.int64)
+
+
+# Statut canonique : mêmes valeurs que le filtre des listes (statut_code)
+STATUT = "CASE e.statut_code WHEN 1 THEN 'Public' WHEN 2 THEN 'Privé' WHEN 3 THEN 'Com_Ass' END"
+GENRE = "CASE p.genre_code WHEN 1 THEN 'M' WHEN 2 THEN 'F' END"
+
+
+def construire_cube():
+    conn = get_db_connection()
+    try:
+        communes = conn.execute("SELECT nom, arrondissement FROM communes ORDER BY nom").fetchall()
+        etablissements = conn.execute(f"""
+            SELECT c.arrondissement, c.nom, e.type_etablissement, {STATUT}, COUNT(*)
+            FROM etablissements e
+            LEFT JOIN communes c ON e.commune_id = c.id
+            GROUP BY e.commune_id, e.type_etablissement, e.statut_code
+        """).fetchall()
+        personnel = conn.execute(f"""
+            SELECT c.arrondissement, c.nom, e.type_etablissement, {STATUT}, p.corps, p.grade, p.fonction, {GENRE}, COUNT(*)
+            FROM personnel p
+            LEFT JOIN etablissements e ON p.etablissement_id = e.id
+            LEFT JOIN communes c ON e.commune_id = c.id
+            GROUP BY e.commune_id, e.type_etablissement, e.statut_code, p.corps, p.grade, p.fonction, p.genre_code
+        """).fetchall()
+        return CubeEffectifs(communes, etablissements, personnel)
+    finally:
+        conn.close()
+
+
+CUBE = CacheGeneration(construire_cube, nom='cube_effectifs')
+
+
+def cube(dimensions, filtres=None):
+    """Tableau croisé des effectifs sur les dimensions demandées"""
+    return CUBE.obtenir().agreger(dimensions, filtres)
+
+
+def croiser(selection, dimensions):
+    """Filtrage croisé du dashboard, vectorisé si le moteur NumPy est disponible"""
+    return CUBE.obtenir().croiser(selection, dimensions, vectoriser=moteur_disponible())
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Accès aux données SQLite partagé par les blueprints
+Chaque requête exécutée pendant une requête HTTP est chronométrée et
+rattachée à celle-ci ; les requêtes lentes sont journalisées avec leur plan.
+Avec QUERY_AUDIT, chaque requête relève aussi ses instructions VM et son plan.
+Un garde-fou interrompt les requêtes qui dépassent le budget de leur route.
+Les listes servies en JSON peuvent être sérialisées par SQLite lui-même
+(json_group_array) et renvoyées telles quelles, sans objet Python par ligne
+"""
+
+import json
+import logging
+import os
+import re
+import sqlite3
+import time
+
+from flask import Response, current_app, g, has_request_context, request
+
+from app.metriques import DUREE_REQUETES_SQL, LIGNES_SQL
+
+DB_PATH = os.environ.get('IEF_DB_PATH', 'ief_louga.db')
+
+logger_requetes_lentes = logging.getLogger('ief.requetes_lentes')
+
+_ESPACES = re.compile(r'\s+')
+
+# Colonnes des tables, lues une fois par base : {(base, table): [colonnes]}
+_COLONNES_TABLES = {}
+
+# Granularité du compteur d'instructions VM : garde-fou seul / mode audit
+PAS_GARDE_VM = 10000
+PAS_AUDIT_VM = 100
+
+
+def get_db_connection():
+    """Obtient une connexion à la base de données SQLite"""
+    conn = sqlite3.connect(DB_PATH)
+    conn.row_factory = sqlite3.Row  # Pour avoir des résultats sous forme de dictionnaire
+    return conn
+
+
+def forme_parametres(params):
+    """Types des paramètres, sans leurs valeurs ('int, str, str')"""
+    if not params:
+        return ''
+    return ', '.join(type(p).__name__ for p in params)
+
+
+def plan_requete(conn, query, params):
+    """Lignes de EXPLAIN QUERY PLAN d'une requête"""
+    try:
+        cursor = conn.execute(f"EXPLAIN QUERY PLAN {query}", params or [])
+        return [row[3] for row in cursor.fetchall()]
+    except sqlite3.Error as e:
+        return [f"plan indisponible : {e}"]
+
+
+class RequeteTropCouteuse(Exception):
+    """Requête SQL interrompue : budget de temps ou d'instructions VM de la route dépassé"""
+
+    def __init__(self, motif, endpoint):
+        budget = 'de temps' if motif == 'temps' else "d'instructions VM"
+        super().__init__(f"{endpoint} : budget {budget} dépassé")
+        self.motif = motif
+        self.endpoint = endpoint
+        # 503 : réessayer plus tard ; 413 : la demande elle-même est trop large
+        self.code = 503 if motif == 'temps' else 413
+
+
+def budget_route(endpoint):
+    """(temps en ms, instructions VM) autorisés pour une requête HTTP sur cet endpoint"""
+    config = current_app.config
+    return config.get('QUERY_BUDGETS', {}).get(
+        endpoint, (config.get('QUERY_TIME_BUDGET_MS'), config.get('QUERY_STEP_BUDGET')))
+
+
+def surveiller_connexion(conn):
+    """Installe le garde-fou de la route (et le compteur d'audit) sur la connexion
+
+    Le budget est partagé par toutes les requêtes SQL d'une même requête HTTP.
+    Renvoie l'état suivi {'etapes', 'motif'} ou None hors requête HTTP.
+    """
+    if not has_request_context():
+        return None
+    audit = current_app.config.get('QUERY_AUDIT')
+    if 'garde_sql' not in g:
+        temps_ms, etapes_max = budget_route(g.get('endpoint'))
+        g.garde_sql = {
+            'echeance': g.get('debut_requete', time.perf_counter()) + temps_ms / 1000 if temps_ms else None,
+            'etapes_max': etapes_max or None,
+            'etapes': 0,
+        }
+    garde = g.garde_sql
+    if garde['echeance'] is None and garde['etapes_max'] is None and not audit:
+        return None
+
+    pas = PAS_AUDIT_VM if audit else PAS_GARDE_VM
+    etat = {'etapes': 0, 'motif': None}
+
+    def surveiller():
+        etat['etapes'] += pas
+        garde['etapes'] += pas
+        if garde['etapes_max'] is not None and garde['etapes'] > garde['etapes_max']:
+            etat['motif'] = 'etapes'
+            return 1
+        if garde['echeance'] is not None and time.perf_counter() > garde['echeance']:
+            etat['motif'] = 'temps'
+            return 1
+        return 0
+
+    conn.set_progress_handler(surveiller, pas)
+    return etat
+
+
+def requete_interrompue(etat, query, params):
+    """Journalise la requête abandonnée par le garde-fou et renvoie l'exception à lever"""
+    endpoint = g.get('endpoint') or '?'
+    logger_requetes_lentes.warning(
+        "ABANDON (%s) | %s | %s %s | %s | params(%s) | %d instructions VM",
+        etat['motif'], endpoint, request.method, request.full_path.rstrip('?'),
+        _ESPACES.sub(' ', query).strip(), forme_parametres(params), g.garde_sql['etapes']
+    )
+    return RequeteTropCouteuse(etat['motif'], endpoint)
+
+
+def enregistrer_requete(conn, query, params, nb_lignes, debut, etat=None):
+    """Rattache la mesure d'une requête SQL à la requête HTTP en cours"""
+    duree = time.perf_counter() - debut
+    if not has_request_context():
+        DUREE_REQUETES_SQL.observer(duree, 'hors_requete')
+        LIGNES_SQL.inc('hors_requete', valeur=nb_lignes)
+        return
+
+    endpoint = g.get('endpoint') or '?'
+    DUREE_REQUETES_SQL.observer(duree, endpoint)
+    LIGNES_SQL.inc(endpoint, valeur=nb_lignes)
+
+    duree_ms = duree * 1000
+    mesure = {
+        'sql': _ESPACES.sub(' ', query).strip(),
+        'parametres': forme_parametres(params),
+        'lignes': nb_lignes,
+        'debut_ms': round((debut - g.get('debut_requete', debut)) * 1000, 3),
+        'duree_ms': round(duree_ms, 3),
+    }
+    g.setdefault('requetes_sql', []).append(mesure)
+
+    if etat is not None:
+        conn.set_progress_handler(None, 0)
+        mesure['etapes_vm'] = etat['etapes']
+        if current_app.config.get('QUERY_AUDIT'):
+            mesure['plan'] = plan_requete(conn, query, params)
+
+    if duree_ms >= current_app.config.get('SLOW_QUERY_MS', float('inf')):
+        mesure.setdefault('plan', plan_requete(conn, query, params))
+        logger_requetes_lentes.warning(
+            "%.1f ms | %s | %s | params(%s) | %d lignes | plan: %s",
+            duree_ms, endpoint, mesure['sql'], mesure['parametres'],
+            nb_lignes, ' / '.join(mesure['plan'])
+        )
+
+
+def execute_query(query, params=None):
+    """Exécute une requête et retourne les résultats"""
+    conn = get_db_connection()
+    etat = surveiller_connexion(conn)
+    try:
+        debut = time.perf_counter()
+        try:
+            if params:
+                cursor = conn.execute(query, params)
+            else:
+                cursor = conn.execute(query)
+            results = cursor.fetchall()
+        except sqlite3.OperationalError:
+            if etat and etat['motif']:
+                raise requete_interrompue(etat, query, params) from None
+            raise
+
+        enregistrer_requete(conn, query, params, len(results), debut, etat)
+        return [dict(row) for row in results]
+    finally:
+        conn.close()
+
+
+def iterer_requete(query, params=None, taille_lot=500):
+    """Exécute une requête et produit ses lignes au fil de la lecture, sans tout charger
+
+    La mesure est enregistrée après la dernière ligne (durée de lecture comprise).
+    """
+    conn = get_db_connection()
+    etat = surveiller_connexion(conn)
+    try:
+        debut = time.perf_counter()
+        nb_lignes = 0
+        try:
+            cursor = conn.execute(query, params or [])
+            while True:
+                lot = cursor.fetchmany(taille_lot)
+                if not lot:
+                    break
+                nb_lignes += len(lot)
+                yield from lot
+        except sqlite3.OperationalError:
+            if etat and etat['motif']:
+                raise requete_interrompue(etat, query, params) from None
+            raise
+
+        enregistrer_requete(conn, query, params, nb_lignes, debut, etat)
+    finally:
+        conn.close()
+
+
+def execute_query_json(query, params=None):
+    """Exécute une requête dont la seule valeur est un document JSON construit par SQLite
+    (json_group_array...) et retourne ce texte tel quel"""
+    conn = get_db_connection()
+    etat = surveiller_connexion(conn)
+    try:
+        debut = time.perf_counter()
+        try:
+            result = conn.execute(query, params or []).fetchone()
+        except sqlite3.OperationalError:
+            if etat and etat['motif']:
+                raise requete_interrompue(etat, query, params) from None
+            raise
+
+        enregistrer_requete(conn, query, params, 1 if result else 0, debut, etat)
+        return result[0] if result and result[0] is not None else 'null'
+    finally:
+        conn.close()
+
+
+def colonnes_table(table):
+    """Colonnes d'une table dans l'ordre de SELECT *"""
+    cle = (DB_PATH, table)
+    if cle not in _COLONNES_TABLES:
+        conn = get_db_connection()
+        try:
+            # table_xinfo : colonnes générées comprises (hidden 2 ou 3), comme dans SELECT *
+            _COLONNES_TABLES[cle] = [ligne[1] for ligne in conn.execute(f"PRAGMA table_xinfo({table})")
+                                     if ligne[6] != 1]
+        finally:
+            conn.close()
+    return _COLONNES_TABLES[cle]
+
+
+def objet_json(champs):
+    """Expression json_object('nom', expression, ...) ; champs : [(nom, expression SQL)]"""
+    return "json_object(" + ", ".join(f"'{nom}', {expression}" for nom, expression in champs) + ")"
+
+
+def champs_table(alias, table):
+    """[(colonne, alias.colonne)] de toutes les colonnes de la table (équivalent JSON de alias.*)"""
+    return [(colonne, f"{alias}.{colonne}") for colonne in colonnes_table(table)]
+
+
+def tableau_json(champs, source):
+    """Requête renvoyant en un seul texte le tableau JSON des lignes
+    « SELECT champs {source} », dans l'ordre de source (FROM ... WHERE ... ORDER BY ...)"""
+    return f"SELECT json_group_array(json(ligne_json)) FROM (SELECT {objet_json(champs)} AS ligne_json {source})"
+
+
+def json_sql():
+    """Listes sérialisées en JSON par SQLite (JSON_SQL), sinon dict par ligne et jsonify"""
+    return current_app.config.get('JSON_SQL', True)
+
+
+def reponse_json(fragments):
+    """Réponse JSON {clé: fragment} assemblée à partir de fragments déjà sérialisés"""
+    corps = '{' + ','.join(f'{json.dumps(cle)}:{fragment}' for cle, fragment in fragments.items()) + '}'
+    return Response(corps, mimetype='application/json')
+
+
+def execute_query_single(query, params=None):
+    """Exécute une requête et retourne un seul résultat"""
+    conn = get_db_connection()
+    etat = surveiller_connexion(conn)
+    try:
+        debut = time.perf_counter()
+        try:
+            if params:
+                cursor = conn.execute(query, params)
+            else:
+                cursor = conn.execute(query)
+            result = cursor.fetchone()
+        except sqlite3.OperationalError:
+            if etat and etat['motif']:
+                raise requete_interrompue(etat, query, params) from None
+            raise
+
+        enregistrer_requete(conn, query, params, 1 if result else 0, debut, etat)
+        return dict(result) if result else None
+    finally:
+        conn.close()
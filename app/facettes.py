@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Facettes des filtres du personnel et des établissements
+Les combinaisons distinctes de valeurs filtrables et leur effectif sont lues
+une fois par génération des données, avec pour chaque valeur le bitmap des
+combinaisons qui la portent (bit n levé = n-ième combinaison). Pour une
+sélection, seules les combinaisons retenues par les filtres des autres
+facettes sont parcourues ; sans filtre, les effectifs sont précalculés
+"""
+
+from collections import defaultdict
+
+from app import get_db_connection
+from app.generation import CacheGeneration
+
+FACETTES_PERSONNEL = ('corps', 'grade', 'fonction', 'genre')
+FACETTES_ETABLISSEMENTS = ('type_etablissement', 'statut', 'commune_id')
+
+
+class Combinaisons:
+    """Combinaisons de valeurs d'un périmètre, leur effectif et un bitmap par valeur"""
+
+    def __init__(self, facettes, cumul):
+        """cumul : {(valeur_1, ..., valeur_n): effectif}"""
+        self.effectifs = list(cumul.values())
+        self.tous = (1 << len(self.effectifs)) - 1
+        self.bitmaps = {facette: defaultdict(int) for facette in facettes}
+        self.totaux = {facette: defaultdict(int) for facette in facettes}
+        for rang, (valeurs, effectif) in enumerate(cumul.items()):
+            for facette, valeur in zip(facettes, valeurs):
+                if valeur is not None:
+                    self.bitmaps[facette][valeur] |= 1 << rang
+                    self.totaux[facette][valeur] += effectif
+
+    def filtrer(self, criteres):
+        """Bitmap des combinaisons portant chaque valeur de criteres {facette: valeur}"""
+        resultat = self.tous
+        for facette, valeur in criteres.items():
+            resultat &= self.bitmaps[facette].get(valeur, 0)
+            if not resultat:
+                break
+        return resultat
+
+    def effectif(self, bitmap):
+        """Somme des effectifs des combinaisons du bitmap"""
+        if bitmap == self.tous:
+            return sum(self.effectifs)
+        total = 0
+        while bitmap:
+            bit_bas = bitmap & -bitmap
+            bitmap ^= bit_bas
+            total += self.effectifs[bit_bas.bit_length() - 1]
+        return total
+
+    def compter(self, facette, masque):
+        """{valeur: effectif} des combinaisons du masque, pour chaque valeur de la facette"""
+        if masque == self.tous:
+            return self.totaux[facette]
+        return {valeur: self.effectif(bitmap & masque) for valeur, bitmap in self.bitmaps[facette].items()
+                if bitmap & masque}
+
+
+class IndexFacettes:
+    """Combinaisons de valeurs, globales et par partition (établissement)"""
+
+    def __init__(self, facettes, lignes):
+        """lignes : itérable de (partition, valeur_1, ..., valeur_n, effectif)"""
+        self.facettes = facettes
+        partitions = defaultdict(lambda: defaultdict(int))
+        cumul = defaultdict(int)
+        for ligne in lignes:
+            partition, valeurs, effectif = ligne[0], tuple(v or None for v in ligne[1:-1]), ligne[-1]
+            if partition is not None:
+                partitions[partition][valeurs] += effectif
+            cumul[valeurs] += effectif
+        self._combinaisons = Combinaisons(facettes, cumul)
+        # Bitmaps d'une partition construits à sa première sélection
+        self._partitions = dict(partitions)
+        self._bitmaps_partitions = {}
+        self.valeurs = {facette: sorted(self._combinaisons.bitmaps[facette]) for facette in facettes}
+
+    def __len__(self):
+        return len(self._combinaisons.effectifs)
+
+    def _perimetre(self, partition):
+        if partition is None:
+            return self._combinaisons
+        if partition not in self._partitions:
+            return Combinaisons(self.facettes, {})
+        perimetre = self._bitmaps_partitions.get(partition)
+        if perimetre is None:
+            perimetre = Combinaisons(self.facettes, self._partitions[partition])
+            self._bitmaps_partitions[partition] = perimetre
+        return perimetre
+
+    def compter(self, selection, partition=None):
+        """(total, {facette: {valeur: effectif}}) pour la sélection {facette: valeur}
+
+        L'effectif d'une valeur tient compte des filtres posés sur les autres
+        facettes : c'est le total obtenu si l'on choisissait cette valeur.
+        """
+        combinaisons = self._perimetre(partition)
+        criteres = {f: selection[f] for f in self.facettes if selection.get(f)}
+        retenues = combinaisons.filtrer(criteres)
+        comptes = {}
+        for facette in self.facettes:
+            masque = retenues
+            if facette in criteres:
+                masque = combinaisons.filtrer({f: v for f, v in criteres.items() if f != facette})
+            comptes[facette] = combinaisons.compter(facette, masque)
+        return combinaisons.effectif(retenues), {
+            facette: {valeur: comptes[facette].get(valeur, 0) for valeur in self.valeurs[facette]}
+            for facette in self.facettes
+        }
+
+
+def construire_facettes_personnel():
+    conn = get_db_connection()
+    try:
+        cursor = conn.execute("""
+            SELECT etablissement_id, corps, grade, fonction, genre, COUNT(*)
+            FROM personnel
+            GROUP BY etablissement_id, corps, grade, fonction, genre
+        """)
+        return IndexFacettes(FACETTES_PERSONNEL, cursor)
+    finally:
+        conn.close()
+
+
+def construire_facettes_etablissements():
+    # Statut canonique (statut_code) : mêmes valeurs que le filtre de la liste
+    # Commune en texte : les valeurs sont comparées aux paramètres de la requête
+    conn = get_db_connection()
+    try:
+        cursor = conn.execute("""
+            SELECT
+                NULL,
+                type_etablissement,
+                CASE statut_code WHEN 1 THEN 'Public' WHEN 2 THEN 'Privé' WHEN 3 THEN 'Com_Ass' END,
+                CAST(commune_id AS TEXT),
+                COUNT(*)
+            FROM etablissements
+            GROUP BY type_etablissement, statut_code, commune_id
+        """)
+        return IndexFacettes(FACETTES_ETABLISSEMENTS, cursor)
+    finally:
+        conn.close()
+
+
+INDEX_FACETTES = {
+    'personnel': CacheGeneration(construire_facettes_personnel, nom='facettes_personnel'),
+    'etablissements': CacheGeneration(construire_facettes_etablissements, nom='facettes_etablissements'),
+}
+
+
+def facettes_personnel(selection):
+    """(total, effectifs par facette) ; selection peut contenir etablissement_id"""
+    etablissement = selection.get('etablissement_id')
+    partition = None
+    if etablissement:
+        partition = int(etablissement) if str(etablissement).isdigit() else -1
+    return INDEX_FACETTES['personnel'].obtenir().compter(selection, partition)
+
+
+def facettes_etablissements(selection):
+    """(total, effectifs par facette)"""
+    return INDEX_FACETTES['etablissements'].obtenir().compter(selection)
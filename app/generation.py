@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Génération des données et caches en mémoire invalidés à chaque modification
+"""
+
+import threading
+import time
+
+from app import get_db_connection
+from app.metriques import ACCES_CACHE
+
+# Délai minimal entre deux lectures de la génération (secondes)
+INTERVALLE_VERIFICATION = 1.0
+
+
+def generation_courante():
+    """Compteur incrémenté par les triggers à chaque modification des données"""
+    conn = get_db_connection()
+    try:
+        return conn.execute("SELECT valeur FROM generation_donnees WHERE id = 1").fetchone()[0]
+    finally:
+        conn.close()
+
+
+class CacheGeneration:
+    """Valeur construite une fois par génération des données, partagée entre threads"""
+
+    def __init__(self, construire, intervalle=INTERVALLE_VERIFICATION, nom=None):
+        self._construire = construire
+        self.nom = nom or construire.__name__
+        self._intervalle = intervalle
+        self._verrou = threading.Lock()
+        self._generation = None
+        self._valeur = None
+        self._verifie_le = 0.0
+
+    @property
+    def generation(self):
+        return self._generation
+
+    def obtenir(self):
+        """Valeur en cache, reconstruite si la génération a changé"""
+        valeur = self._valeur
+        if valeur is not None and time.monotonic() - self._verifie_le < self._intervalle:
+            ACCES_CACHE.inc(self.nom, 'hit')
+            return valeur
+
+        with self._verrou:
+            generation = generation_courante()
+            if self._valeur is None or generation != self._generation:
+                ACCES_CACHE.inc(self.nom, 'miss')
+                self._valeur = self._construire()
+                self._generation = generation
+            else:
+                ACCES_CACHE.inc(self.nom, 'hit')
+            self._verifie_le = time.monotonic()
+            return self._valeur
+
+    def invalider(self):
+        with self._verrou:
+            self._valeur = None
+            self._generation = None
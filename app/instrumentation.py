@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Instrumentation des requêtes HTTP : chronologie des requêtes SQL par page
+et journal des requêtes lentes
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+
+from flask import g, request
+
+from app.database import logger_requetes_lentes
+from app.metriques import DUREE_ROUTES, REQUETES_SQL_PAR_PAGE, OCTETS_EXPORTES
+
+# Dernières requêtes HTTP instrumentées, affichées par /debug/queries
+historique_requetes = deque(maxlen=50)
+_verrou_historique = threading.Lock()
+
+
+def configurer_journal_lent(app):
+    """Écrit les requêtes lentes dans SLOW_QUERY_LOG (une ligne par requête)"""
+    chemin = app.config.get('SLOW_QUERY_LOG')
+    if not chemin or logger_requetes_lentes.handlers:
+        return
+    handler = logging.FileHandler(chemin, encoding='utf-8')
+    handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+    logger_requetes_lentes.addHandler(handler)
+    logger_requetes_lentes.setLevel(logging.WARNING)
+    logger_requetes_lentes.propagate = False
+
+
+def init_instrumentation(app):
+    """Installe les hooks de mesure sur l'application"""
+    global historique_requetes
+    configurer_journal_lent(app)
+    historique_requetes = deque(maxlen=app.config.get('DEBUG_QUERIES_HISTORY', 50))
+
+    @app.before_request
+    def debut_requete():
+        g.debut_requete = time.perf_counter()
+        g.endpoint = request.endpoint
+        g.requetes_sql = []
+
+    @app.after_request
+    def fin_requete(response):
+        duree = time.perf_counter() - g.get('debut_requete', time.perf_counter())
+        endpoint = request.endpoint or 'inconnu'
+        requetes_sql = g.get('requetes_sql', [])
+        DUREE_ROUTES.observer(duree, endpoint, request.method, str(response.status_code))
+        REQUETES_SQL_PAR_PAGE.observer(len(requetes_sql), endpoint)
+        if 'attachment' in response.headers.get('Content-Disposition', ''):
+            compter_octets_exportes(response, endpoint)
+
+        if not app.config.get('DEBUG_QUERIES') or request.endpoint == 'debug.queries':
+            return response
+
+        entree = {
+            'methode': request.method,
+            'chemin': request.full_path.rstrip('?'),
+            'endpoint': request.endpoint,
+            'statut': response.status_code,
+            'duree_ms': round(duree * 1000, 3),
+            'duree_sql_ms': round(sum(r['duree_ms'] for r in requetes_sql), 3),
+            'requetes': requetes_sql,
+            'horodatage': time.strftime('%d/%m/%Y %H:%M:%S'),
+        }
+        with _verrou_historique:
+            historique_requetes.append(entree)
+        return response
+
+
+def compter_octets_exportes(response, endpoint):
+    """Ajoute la taille d'un export au compteur, au fil de l'eau s'il est streamé"""
+    if not response.is_streamed:
+        OCTETS_EXPORTES.inc(endpoint, valeur=response.calculate_content_length() or 0)
+        return
+
+    morceaux = response.response
+
+    def compter():
+        for morceau in morceaux:
+            if isinstance(morceau, str):
+                morceau = morceau.encode('utf-8')
+            OCTETS_EXPORTES.inc(endpoint, valeur=len(morceau))
+            yield morceau
+
+    response.response = compter()
+
+
+def dernieres_requetes():
+    """Copie de l'historique, de la plus récente à la plus ancienne"""
+    with _verrou_historique:
+        return list(reversed(historique_requetes))
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Registre de métriques en mémoire exposé au format texte Prometheus
+Compteurs et histogrammes étiquetés, sûrs pour un serveur multi-threads
+"""
+
+import threading
+from bisect import bisect_left
+
+# Bornes par défaut des histogrammes de durée (secondes)
+BORNES_DUREE = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _echapper(valeur):
+    return str(valeur).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_etiquettes(noms, valeurs, supplement=None):
+    paires = [f'{nom}="{_echapper(valeur)}"' for nom, valeur in zip(noms, valeurs)]
+    if supplement:
+        paires.append(supplement)
+    return '{' + ','.join(paires) + '}' if paires else ''
+
+
+def _format_nombre(valeur):
+    if valeur == float('inf'):
+        return '+Inf'
+    if isinstance(valeur, float) and valeur.is_integer():
+        return str(int(valeur))
+    return repr(valeur)
+
+
+class Compteur:
+    """Compteur monotone, une valeur par combinaison d'étiquettes"""
+
+    type_prometheus = 'counter'
+
+    def __init__(self, nom, aide, etiquettes=()):
+        self.nom = nom
+        self.aide = aide
+        self.etiquettes = tuple(etiquettes)
+        self._verrou = threading.Lock()
+        self._valeurs = {}
+
+    def inc(self, *valeurs_etiquettes, valeur=1):
+        with self._verrou:
+            self._valeurs[valeurs_etiquettes] = self._valeurs.get(valeurs_etiquettes, 0) + valeur
+
+    def valeur(self, *valeurs_etiquettes):
+        with self._verrou:
+            return self._valeurs.get(valeurs_etiquettes, 0)
+
+    def lignes(self):
+        with self._verrou:
+            valeurs = sorted(self._valeurs.items())
+        for cle, total in valeurs:
+            yield f"{self.nom}{_format_etiquettes(self.etiquettes, cle)} {_format_nombre(total)}"
+
+
+class Histogramme:
+    """Histogramme à bornes fixes ; les compteurs par case sont cumulés à l'exposition"""
+
+    type_prometheus = 'histogram'
+
+    def __init__(self, nom, aide, etiquettes=(), bornes=BORNES_DUREE):
+        self.nom = nom
+        self.aide = aide
+        self.etiquettes = tuple(etiquettes)
+        self.bornes = tuple(sorted(bornes))
+        self._verrou = threading.Lock()
+        self._series = {}
+
+    def observer(self, valeur, *valeurs_etiquettes):
+        case = bisect_left(self.bornes, valeur)
+        with self._verrou:
+            serie = self._series.get(valeurs_etiquettes)
+            if serie is None:
+                # [compteurs par case (+Inf en dernier), somme, nombre]
+                serie = self._series[valeurs_etiquettes] = [[0] * (len(self.bornes) + 1), 0.0, 0]
+            serie[0][case] += 1
+            serie[1] += valeur
+            serie[2] += 1
+
+    def lignes(self):
+        with self._verrou:
+            series = sorted((cle, (list(cases), somme, nombre))
+                            for cle, (cases, somme, nombre) in self._series.items())
+        for cle, (cases, somme, nombre) in series:
+            cumul = 0
+            for borne, compte in zip(self.bornes + (float('inf'),), cases):
+                cumul += compte
+                le = f'le="{_format_nombre(float(borne))}"'
+                yield f"{self.nom}_bucket{_format_etiquettes(self.etiquettes, cle, le)} {cumul}"
+            etiquettes = _format_etiquettes(self.etiquettes, cle)
+            yield f"{self.nom}_sum{etiquettes} {_format_nombre(somme)}"
+            yield f"{self.nom}_count{etiquettes} {nombre}"
+
+
+class Registre:
+    """Ensemble des métriques de l'application"""
+
+    def __init__(self):
+        self._verrou = threading.Lock()
+        self._metriques = {}
+
+    def _enregistrer(self, metrique):
+        with self._verrou:
+            existante = self._metriques.get(metrique.nom)
+            if existante is not None:
+                return existante
+            self._metriques[metrique.nom] = metrique
+            return metrique
+
+    def compteur(self, nom, aide, etiquettes=()):
+        return self._enregistrer(Compteur(nom, aide, etiquettes))
+
+    def histogramme(self, nom, aide, etiquettes=(), bornes=BORNES_DUREE):
+        return self._enregistrer(Histogramme(nom, aide, etiquettes, bornes))
+
+    def exposer(self):
+        """Texte au format d'exposition Prometheus 0.0.4"""
+        with self._verrou:
+            metriques = list(self._metriques.values())
+        lignes = []
+        for metrique in metriques:
+            lignes.append(f"# HELP {metrique.nom} {metrique.aide}")
+            lignes.append(f"# TYPE {metrique.nom} {metrique.type_prometheus}")
+            lignes.extend(metrique.lignes())
+        return '\n'.join(lignes) + '\n'
+
+
+REGISTRE = Registre()
+
+DUREE_ROUTES = REGISTRE.histogramme(
+    'ief_http_request_duration_seconds', "Durée des requêtes HTTP par endpoint",
+    ('endpoint', 'method', 'status'))
+DUREE_REQUETES_SQL = REGISTRE.histogramme(
+    'ief_sql_query_duration_seconds', "Durée des requêtes SQLite par endpoint",
+    ('endpoint',))
+REQUETES_SQL_PAR_PAGE = REGISTRE.histogramme(
+    'ief_sql_queries_per_request', "Nombre de requêtes SQLite par requête HTTP",
+    ('endpoint',), bornes=(0, 1, 2, 5, 10, 20, 50, 100, 250))
+LIGNES_SQL = REGISTRE.compteur(
+    'ief_sql_rows_total', "Lignes renvoyées par SQLite", ('endpoint',))
+OCTETS_EXPORTES = REGISTRE.compteur(
+    'ief_export_bytes_total', "Octets envoyés par les exports (pièces jointes)", ('endpoint',))
+ACCES_CACHE = REGISTRE.compteur(
+    'ief_cache_requests_total', "Accès aux caches en mémoire (hit / miss)", ('cache', 'resultat'))
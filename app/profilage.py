@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Profilage à la demande d'une requête HTTP
+Activé seulement si PROFILING_TOKEN est défini : la requête portant l'en-tête
+X-Profile (ou le paramètre _profile) égal au jeton est exécutée sous cProfile
+et échantillonnée pour produire un fichier pstats et des piles repliées
+(format flamegraph.pl / speedscope)
+"""
+
+import cProfile
+import hmac
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+from flask import g, request
+
+
+class EchantillonneurPiles(threading.Thread):
+    """Relève périodiquement la pile d'un thread et compte les piles repliées"""
+
+    def __init__(self, thread_id, intervalle):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.intervalle = intervalle
+        self.piles = Counter()
+        self._arret = threading.Event()
+
+    def run(self):
+        while not self._arret.wait(self.intervalle):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            pile = []
+            while frame is not None:
+                code = frame.f_code
+                pile.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.piles[';'.join(reversed(pile))] += 1
+
+    def arreter(self):
+        self._arret.set()
+        self.join()
+
+
+def jeton_valide(app):
+    """Vrai si la requête porte le jeton de profilage"""
+    jeton = request.headers.get('X-Profile') or request.args.get('_profile')
+    return bool(jeton) and hmac.compare_digest(jeton, app.config['PROFILING_TOKEN'])
+
+
+def enregistrer_profil(dossier, endpoint, profil, piles):
+    """Écrit <horodatage>_<endpoint>.pstats et .folded ; renvoie le nom de base"""
+    os.makedirs(dossier, exist_ok=True)
+    base = f"{time.strftime('%Y%m%d-%H%M%S')}-{int(time.time() * 1000) % 1000:03d}_{endpoint}"
+    profil.dump_stats(os.path.join(dossier, base + '.pstats'))
+    with open(os.path.join(dossier, base + '.folded'), 'w', encoding='utf-8') as f:
+        for pile, nombre in piles.most_common():
+            f.write(f"{pile} {nombre}\n")
+    return base
+
+
+def init_profilage(app):
+    """Installe les hooks de profilage ; aucun coût si PROFILING_TOKEN est vide"""
+    if not app.config.get('PROFILING_TOKEN'):
+        return
+
+    @app.before_request
+    def demarrer_profil():
+        if request.blueprint == 'profilage' or not jeton_valide(app):
+            return
+        g.echantillonneur = EchantillonneurPiles(threading.get_ident(), app.config['PROFILING_INTERVAL'])
+        g.profil = cProfile.Profile()
+        g.echantillonneur.start()
+        g.profil.enable()
+
+    @app.teardown_request
+    def terminer_profil(exc):
+        profil = g.pop('profil', None)
+        if profil is None:
+            return
+        profil.disable()
+        echantillonneur = g.pop('echantillonneur')
+        echantillonneur.arreter()
+        base = enregistrer_profil(app.config['PROFILING_DIR'], request.endpoint or 'inconnu',
+                                  profil, echantillonneur.piles)
+        app.logger.info("Profil enregistré : %s", base)
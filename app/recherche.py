@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Recherche des agents par nom ou matricule
+Les clés phonétiques des agents ajoutés ou renommés depuis la dernière
+recherche (inscrits en attente par les triggers) sont calculées une fois
+par génération des données, avant de construire la condition
+"""
+
+from app import get_db_connection
+from app.generation import CacheGeneration
+from phonetique import condition_recherche_agent, indexer_agents
+
+
+def calculer_cles_en_attente():
+    conn = get_db_connection()
+    try:
+        return indexer_agents(conn)
+    finally:
+        conn.close()
+
+
+CLES_PHONETIQUES = CacheGeneration(calculer_cles_en_attente, nom='cles_phonetiques')
+
+
+def condition_recherche(recherche, alias='p'):
+    """Condition SQL et paramètres de la recherche, clés phonétiques à jour"""
+    CLES_PHONETIQUES.obtenir()
+    return condition_recherche_agent(recherche, alias)
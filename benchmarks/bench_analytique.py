@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Moteur d'analyses en colonnes (NumPy) contre agrégats SQL
+Pour personnel.analytics et etablissements.analytics : durée des requêtes
+SQL, durée de chargement des colonnes (une fois par génération) et durée du
+calcul vectorisé, avec vérification que les deux chemins donnent les mêmes
+lignes. À 1000× l'échelle de Louga, la base compte plus d'un million d'agents.
+
+Usage : python benchmarks/bench_analytique.py --echelle 1000 --repetitions 3
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+from commun import DOSSIER_RESULTATS, creer_app, preparer_base, revision_git
+from generer_donnees import ECHELLES
+
+
+def chronometrer(fonction, repetitions):
+    """(résultat, durée médiane en ms)"""
+    durees = []
+    for _ in range(repetitions):
+        debut = time.perf_counter()
+        resultat = fonction()
+        durees.append((time.perf_counter() - debut) * 1000)
+    return resultat, round(statistics.median(durees), 3)
+
+
+def memes_lignes(a, b):
+    """Mêmes lignes à l'ordre près des ex æquo (non déterminé en SQL)"""
+    def cle(ligne):
+        return json.dumps(ligne, sort_keys=True, default=str)
+    return a.keys() == b.keys() and all(sorted(map(cle, a[k])) == sorted(map(cle, b[k])) for k in a)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Moteur NumPy contre agrégats SQL")
+    parser.add_argument('--echelle', type=int, default=1000, choices=ECHELLES)
+    parser.add_argument('--repetitions', type=int, default=3)
+    parser.add_argument('--regenerer', action='store_true')
+    args = parser.parse_args()
+
+    from app import analytique
+    if analytique.np is None:
+        sys.exit("NumPy n'est pas installé : seul le chemin SQL est disponible")
+
+    db_path, duree_etl = preparer_base(args.echelle, args.regenerer)
+    if duree_etl is not None:
+        print(f"✓ ETL {args.echelle}× en {duree_etl:.1f}s")
+    application = creer_app(db_path)
+    # Agrégats complets sans garde-fou : on mesure, on n'interrompt pas
+    application.config['QUERY_TIME_BUDGET_MS'] = 0
+    application.config['QUERY_STEP_BUDGET'] = 0
+
+    from app.blueprints.etablissements import get_etablissements_analyses
+    from app.blueprints.personnel import get_personnel_analyses
+
+    with application.test_request_context('/'):
+        colonnes, duree_chargement = chronometrer(analytique.construire_colonnes, 1)
+        nb_agents = len(colonnes.corps)
+        print(f"📏 {nb_agents} agents, {len(colonnes.etab_ids)} établissements")
+        print(f"   chargement des colonnes : {duree_chargement:>10.1f} ms (une fois par génération)")
+
+        pages = {}
+        ecarts = 0
+        for page, sql, moteur in (
+            ('personnel.analytics', get_personnel_analyses, colonnes.analyses_personnel),
+            ('etablissements.analytics', get_etablissements_analyses, colonnes.analyses_etablissements),
+        ):
+            resultat_sql, duree_sql = chronometrer(sql, args.repetitions)
+            resultat_moteur, duree_moteur = chronometrer(moteur, args.repetitions)
+            identiques = memes_lignes(resultat_sql, resultat_moteur)
+            ecarts += not identiques
+            pages[page] = {
+                'sql_ms': duree_sql,
+                'numpy_ms': duree_moteur,
+                'acceleration': round(duree_sql / duree_moteur, 1) if duree_moteur else None,
+                'identiques': identiques,
+            }
+            print(f"{'✅' if identiques else '❌'} {page:<26} SQL {duree_sql:>10.1f} ms   "
+                  f"NumPy {duree_moteur:>8.1f} ms   x{pages[page]['acceleration']}")
+
+    os.makedirs(DOSSIER_RESULTATS, exist_ok=True)
+    chemin = os.path.join(DOSSIER_RESULTATS, f"analytique_{revision_git()}_x{args.echelle}.json")
+    with open(chemin, 'w', encoding='utf-8') as f:
+        json.dump({'revision': revision_git(), 'echelle': args.echelle, 'agents': nb_agents,
+                   'chargement_ms': duree_chargement, 'pages': pages}, f, indent=2)
+    print(f"\n✓ Résultats écrits dans {chemin}")
+    sys.exit(1 if ecarts else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cube des effectifs contre GROUP BY en SQL
+Pour une série de tableaux croisés : durée de la requête SQL équivalente
+(jointure communes × établissements × personnel), durée de construction du
+cube (une fois par génération) et durée de l'agrégation depuis le cube, avec
+vérification que les effectifs sont identiques ; puis durée du filtrage croisé
+du dashboard (/api/dashboard/graphiques), en Python et avec NumPy.
+
+Usage : python benchmarks/bench_cube.py --echelle 100
+"""
+
+import argparse
+import json
+import os
+import sys
+
+from bench_analytique import chronometrer
+from commun import DOSSIER_RESULTATS, creer_app, preparer_base, revision_git
+from generer_donnees import ECHELLES
+
+# Expression SQL de chaque dimension du cube
+COLONNES = {
+    'arrondissement': 'c.arrondissement',
+    'commune': 'c.nom',
+    'type_etablissement': 'e.type_etablissement',
+    'statut': "CASE e.statut_code WHEN 1 THEN 'Public' WHEN 2 THEN 'Privé' WHEN 3 THEN 'Com_Ass' END",
+    'corps': 'p.corps',
+    'grade': 'p.grade',
+    'fonction': 'p.fonction',
+    'genre': "CASE p.genre_code WHEN 1 THEN 'M' WHEN 2 THEN 'F' END",
+}
+
+TABLEAUX = (
+    ('arrondissement',),
+    ('commune', 'type_etablissement'),
+    ('corps', 'grade'),
+    ('arrondissement', 'corps', 'genre'),
+    ('commune', 'statut', 'grade', 'genre'),
+)
+
+
+def selections_dashboard(cube):
+    """Sélections types du dashboard : aucune, une commune, plusieurs filtres croisés
+
+    Communes par effectif décroissant : la première est la plus chargée (Louga)
+    """
+    communes = [l['commune'] for l in sorted(cube.agreger(['commune']), key=lambda l: -l['effectif'])
+                if l['commune']]
+    types = [l['type_etablissement'] for l in cube.agreger(['type_etablissement'])]
+    corps = [l['corps'] for l in cube.agreger(['corps'])]
+    return (
+        {},
+        {'commune': communes[:1]},
+        {'genre': ['F']},
+        {'commune': communes[:3], 'statut': ['Public'], 'type_etablissement': types[:2]},
+        {'commune': communes[:1], 'corps': corps[:1], 'genre': ['M']},
+    )
+
+
+def effectifs_sql(dimensions):
+    colonnes = [COLONNES[d] for d in dimensions] or ['NULL']
+    from app.database import execute_query
+    lignes = execute_query(f"""
+        SELECT {', '.join(colonnes)}, COUNT(*) as effectif
+        FROM personnel p
+        LEFT JOIN etablissements e ON p.etablissement_id = e.id
+        LEFT JOIN communes c ON e.commune_id = c.id
+        GROUP BY {', '.join(str(i + 1) for i in range(len(colonnes)))}
+    """)
+    return {tuple(ligne.values())[:len(dimensions)]: ligne['effectif'] for ligne in lignes}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cube des effectifs contre GROUP BY en SQL")
+    parser.add_argument('--echelle', type=int, default=100, choices=ECHELLES)
+    parser.add_argument('--repetitions', type=int, default=3)
+    parser.add_argument('--regenerer', action='store_true')
+    args = parser.parse_args()
+
+    db_path, duree_etl = preparer_base(args.echelle, args.regenerer)
+    if duree_etl is not None:
+        print(f"✓ ETL {args.echelle}× en {duree_etl:.1f}s")
+    application = creer_app(db_path)
+    application.config['QUERY_TIME_BUDGET_MS'] = 0
+    application.config['QUERY_STEP_BUDGET'] = 0
+
+    from app.blueprints.main import GRAPHIQUES_DASHBOARD
+    from app.cube import construire_cube, np
+
+    resultats = []
+    ecarts = 0
+    with application.test_request_context('/'):
+        cube, duree_construction = chronometrer(construire_cube, 1)
+        print(f"📦 {len(cube)} cellules, construites en {duree_construction:.1f} ms (une fois par génération)")
+
+        for dimensions in TABLEAUX:
+            sql, duree_sql = chronometrer(lambda: effectifs_sql(dimensions), args.repetitions)
+            # Première agrégation (hors mémo), puis lecture mémorisée
+            _, duree_cube = chronometrer(lambda: cube._memo.clear() or cube.agreger(dimensions), args.repetitions)
+            lignes, duree_memo = chronometrer(lambda: cube.agreger(dimensions), args.repetitions)
+            identiques = sql == {tuple(l[d] for d in dimensions): l['effectif'] for l in lignes if l['effectif']}
+            ecarts += not identiques
+            nom = ' × '.join(dimensions)
+            resultats.append({'dimensions': dimensions, 'sql_ms': duree_sql, 'cube_ms': duree_cube,
+                              'memo_ms': duree_memo, 'identiques': identiques})
+            print(f"{'✅' if identiques else '❌'} {nom:<38} SQL {duree_sql:>9.1f} ms   "
+                  f"cube {duree_cube:>7.2f} ms   mémo {duree_memo:.3f} ms")
+
+        print("\n🎛️  Filtrage croisé du dashboard (hors mémo)")
+        dashboard = []
+        for selection in selections_dashboard(cube):
+            croiser = lambda vectoriser: cube._memo.clear() or cube.croiser(selection, GRAPHIQUES_DASHBOARD, vectoriser)
+            attendu, duree_python = chronometrer(lambda: croiser(False), args.repetitions)
+            duree_numpy = None
+            if np is not None:
+                obtenu, duree_numpy = chronometrer(lambda: croiser(True), args.repetitions)
+                ecarts += obtenu != attendu
+            nom = '&'.join(f"{d}={'|'.join(map(str, v))}" for d, v in selection.items()) or '(aucune sélection)'
+            dashboard.append({'selection': selection, 'python_ms': duree_python, 'numpy_ms': duree_numpy})
+            print(f"   {nom[:60]:<60} Python {duree_python:>7.1f} ms" +
+                  (f"   NumPy {duree_numpy:>6.1f} ms" if duree_numpy is not None else ''))
+
+    os.makedirs(DOSSIER_RESULTATS, exist_ok=True)
+    chemin = os.path.join(DOSSIER_RESULTATS, f"cube_{revision_git()}_x{args.echelle}.json")
+    with open(chemin, 'w', encoding='utf-8') as f:
+        json.dump({'revision': revision_git(), 'echelle': args.echelle, 'cellules': len(cube),
+                   'construction_ms': duree_construction, 'tableaux': resultats,
+                   'dashboard': dashboard}, f, indent=2)
+    print(f"\n✓ Résultats écrits dans {chemin}")
+    sys.exit(1 if ecarts else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+JSON sérialisé par SQLite contre dict par ligne et jsonify
+Pour les listes JSON volumineuses (/api/personnel avec un grand per_page,
+/api/communes, /etablissements/api/carte) : durée de la requête HTTP complète
+et taille de la réponse avec JSON_SQL=1 (json_group_array) puis JSON_SQL=0,
+avec vérification que les deux chemins renvoient le même document.
+
+Usage : python benchmarks/bench_json.py --echelle 100 --repetitions 5
+"""
+
+import argparse
+import json
+import os
+import sys
+
+from bench_analytique import chronometrer
+from commun import DOSSIER_RESULTATS, creer_app, preparer_base, revision_git
+from generer_donnees import ECHELLES
+
+URLS = (
+    '/api/personnel?per_page=25',
+    '/api/personnel?per_page=1000',
+    '/api/personnel?per_page=5000&page=2',
+    '/api/personnel?per_page=5000&genre=F',
+    '/api/personnel?per_page=1000&search=diop',
+    '/api/communes',
+    '/etablissements/api/carte',
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JSON sérialisé par SQLite contre jsonify")
+    parser.add_argument('--echelle', type=int, default=100, choices=ECHELLES)
+    parser.add_argument('--repetitions', type=int, default=5)
+    parser.add_argument('--regenerer', action='store_true')
+    args = parser.parse_args()
+
+    db_path, duree_etl = preparer_base(args.echelle, args.regenerer)
+    if duree_etl is not None:
+        print(f"✓ ETL {args.echelle}× en {duree_etl:.1f}s")
+    application = creer_app(db_path)
+    application.config['QUERY_TIME_BUDGET_MS'] = 0
+    application.config['QUERY_STEP_BUDGET'] = 0
+    client = application.test_client()
+
+    def appeler(url, json_sql):
+        application.config['JSON_SQL'] = json_sql
+        reponse = client.get(url)
+        return reponse.status_code, reponse.get_data()
+
+    resultats = []
+    ecarts = 0
+    for url in URLS:
+        # Premier appel hors mesure : caches par génération (index bitmap)
+        appeler(url, True)
+        (statut_sql, corps_sql), duree_sql = chronometrer(lambda: appeler(url, True), args.repetitions)
+        (statut_py, corps_py), duree_py = chronometrer(lambda: appeler(url, False), args.repetitions)
+        identiques = statut_sql == statut_py == 200 and json.loads(corps_sql) == json.loads(corps_py)
+        ecarts += not identiques
+        resultats.append({'url': url, 'json_sql_ms': duree_sql, 'jsonify_ms': duree_py,
+                          'octets_json_sql': len(corps_sql), 'octets_jsonify': len(corps_py),
+                          'identiques': identiques})
+        print(f"{'✅' if identiques else '❌'} {url:<42} SQLite {duree_sql:>8.1f} ms   jsonify {duree_py:>8.1f} ms"
+              f"   ×{duree_py / duree_sql if duree_sql else 0:>4.1f}   {len(corps_sql) / 1000:>7.0f} ko")
+
+    os.makedirs(DOSSIER_RESULTATS, exist_ok=True)
+    chemin = os.path.join(DOSSIER_RESULTATS, f"json_{revision_git()}_x{args.echelle}.json")
+    with open(chemin, 'w', encoding='utf-8') as f:
+        json.dump({'revision': revision_git(), 'echelle': args.echelle, 'routes': resultats}, f, indent=2)
+    print(f"\n✓ Résultats écrits dans {chemin}")
+    sys.exit(1 if ecarts else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark des routes et de l'ETL
+Pour chaque échelle : génération des données, ETL chronométré, puis chaque
+route GET appelée via le client de test Flask (1 appel de chauffe + N mesures).
+Les résultats sont écrits en JSON dans benchmarks/resultats/ pour comparer
+les commits (voir comparer.py).
+
+Usage : python benchmarks/bench_routes.py --echelle 1 10 --repetitions 5
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+from commun import (DOSSIER_RESULTATS, creer_app, preparer_base, revision_git,
+                    routes_get)
+from generer_donnees import ECHELLES
+
+
+def percentile(valeurs, p):
+    """Percentile par rang le plus proche (valeurs triées)"""
+    if not valeurs:
+        return None
+    rang = max(0, min(len(valeurs) - 1, round(p / 100 * len(valeurs) + 0.5) - 1))
+    return valeurs[rang]
+
+
+def mesurer_route(client, url, repetitions):
+    """Durées (ms) de repetitions appels après un appel de chauffe"""
+    reponse = client.get(url)
+    durees = []
+    for _ in range(repetitions):
+        debut = time.perf_counter()
+        reponse = client.get(url)
+        durees.append((time.perf_counter() - debut) * 1000)
+    durees.sort()
+    return {
+        'statut': reponse.status_code,
+        'octets': len(reponse.get_data()),
+        'min_ms': round(durees[0], 3),
+        'mediane_ms': round(statistics.median(durees), 3),
+        'p95_ms': round(percentile(durees, 95), 3),
+        'moyenne_ms': round(statistics.fmean(durees), 3),
+        'max_ms': round(durees[-1], 3),
+    }
+
+
+def bench_echelle(echelle, repetitions, regenerer, filtre):
+    print(f"\n📏 ÉCHELLE {echelle}×")
+    print("-" * 35)
+    db_path, duree_etl = preparer_base(echelle, regenerer)
+    if duree_etl is not None:
+        print(f"   ✓ ETL en {duree_etl:.2f}s")
+    else:
+        print(f"   ✓ Base existante réutilisée ({db_path}), ETL non mesuré (--regenerer)")
+
+    application = creer_app(db_path)
+    client = application.test_client()
+    resultats = {}
+    for endpoint, url in routes_get(application, db_path):
+        if filtre and filtre not in endpoint:
+            continue
+        mesure = mesurer_route(client, url, repetitions)
+        mesure['url'] = url
+        resultats[endpoint] = mesure
+        alerte = '' if mesure['statut'] < 400 else f"  ⚠️ HTTP {mesure['statut']}"
+        print(f"   {endpoint:<42} {mesure['mediane_ms']:>10.2f} ms  p95 {mesure['p95_ms']:>10.2f} ms{alerte}")
+
+    return {
+        'echelle': echelle,
+        'base': os.path.relpath(db_path),
+        'taille_base_octets': os.path.getsize(db_path),
+        'etl_s': round(duree_etl, 3) if duree_etl is not None else None,
+        'routes': resultats,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark des routes et de l'ETL")
+    parser.add_argument('--echelle', type=int, nargs='+', default=[1], choices=ECHELLES)
+    parser.add_argument('--repetitions', type=int, default=5)
+    parser.add_argument('--regenerer', action='store_true',
+                        help="regénère données et base même si elles existent (mesure l'ETL)")
+    parser.add_argument('--route', help="ne mesure que les endpoints contenant ce texte")
+    parser.add_argument('--sortie', help="fichier JSON (défaut : resultats/<commit>_<date>.json)")
+    args = parser.parse_args()
+
+    revision = revision_git()
+    rapport = {
+        'revision': revision,
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'repetitions': args.repetitions,
+        'echelles': [bench_echelle(e, args.repetitions, args.regenerer, args.route) for e in args.echelle],
+    }
+
+    sortie = args.sortie or os.path.join(DOSSIER_RESULTATS, f"{revision}_{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(sortie)), exist_ok=True)
+    with open(sortie, 'w', encoding='utf-8') as f:
+        json.dump(rapport, f, indent=2, ensure_ascii=False)
+    print(f"\n✅ Résultats écrits dans {sortie}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
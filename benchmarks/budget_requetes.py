@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Budget de requêtes SQL par route (garde-fou contre les N+1 et les
+sous-requêtes corrélées)
+Chaque route GET est appelée une fois avec QUERY_AUDIT : on relève le nombre
+de requêtes, les instructions de la VM SQLite (compteur de progression) et
+les plans. Échec (code 1) si une route dépasse son budget déclaré dans
+budgets_requetes.json ou n'en a pas.
+
+Usage : python benchmarks/budget_requetes.py             # vérification
+        python benchmarks/budget_requetes.py --ecrire    # (re)calcule les budgets
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+
+from commun import capturer_requetes, creer_app, preparer_base, routes_get
+
+FICHIER_BUDGETS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'budgets_requetes.json')
+
+# Marge appliquée aux mesures lors de l'écriture des budgets
+MARGE_ETAPES = 1.5
+
+# « SCAN personnel » ou « SCAN p » sans index = parcours complet d'une table
+# (« SCAN (subquery-1) » lit une sous-requête déjà comptée, pas une table)
+_SCAN_COMPLET = re.compile(r'^SCAN (?!CONSTANT ROW)(?!\(subquery-)(\S+)$')
+_SOUS_REQUETE_CORRELEE = re.compile(r'^CORRELATED ')
+
+
+def analyser_plans(requetes):
+    """Tables parcourues entièrement et sous-requêtes corrélées dans les plans"""
+    scans, correlees = [], 0
+    for requete in requetes:
+        for ligne in requete.get('plan', []):
+            correspondance = _SCAN_COMPLET.match(ligne)
+            if correspondance:
+                scans.append(correspondance.group(1))
+            if _SOUS_REQUETE_CORRELEE.match(ligne):
+                correlees += 1
+    return scans, correlees
+
+
+def auditer_routes(application, db_path):
+    """{endpoint: mesures} pour chaque route GET"""
+    application.config['QUERY_AUDIT'] = True
+    capture = capturer_requetes(application)
+    client = application.test_client()
+    resultats = {}
+    for endpoint, url in routes_get(application, db_path):
+        capture.clear()
+        reponse = client.get(url)
+        requetes = capture.get('requetes', [])
+        scans, correlees = analyser_plans(requetes)
+        resultats[endpoint] = {
+            'url': url,
+            'statut': reponse.status_code,
+            'requetes': len(requetes),
+            'etapes_vm': sum(r.get('etapes_vm', 0) for r in requetes),
+            'scans_complets': len(scans),
+            'sous_requetes_correlees': correlees,
+            'tables_scannees': sorted(set(scans)),
+        }
+    return resultats
+
+
+def budget_depuis_mesure(mesure):
+    return {
+        'requetes': mesure['requetes'],
+        'etapes_vm': int(mesure['etapes_vm'] * MARGE_ETAPES) + 1000,
+        'scans_complets': mesure['scans_complets'],
+        'sous_requetes_correlees': mesure['sous_requetes_correlees'],
+    }
+
+
+def verifier(resultats, budgets):
+    """Liste des dépassements [(endpoint, critère, mesuré, budget)]"""
+    depassements = []
+    for endpoint, mesure in resultats.items():
+        budget = budgets.get(endpoint)
+        if budget is None:
+            depassements.append((endpoint, 'budget absent', None, None))
+            continue
+        for critere, limite in budget.items():
+            if mesure[critere] > limite:
+                depassements.append((endpoint, critere, mesure[critere], limite))
+    return depassements
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Budget de requêtes SQL par route")
+    parser.add_argument('--echelle', type=int, default=1)
+    parser.add_argument('--ecrire', action='store_true',
+                        help="enregistre les mesures (avec marge) comme nouveaux budgets")
+    args = parser.parse_args()
+
+    db_path, _ = preparer_base(args.echelle)
+    resultats = auditer_routes(creer_app(db_path), db_path)
+
+    print(f"{'endpoint':<42} {'req':>5} {'étapes VM':>12} {'scans':>6} {'corr.':>6}")
+    for endpoint, m in resultats.items():
+        tables = f"  ({', '.join(m['tables_scannees'])})" if m['tables_scannees'] else ''
+        print(f"{endpoint:<42} {m['requetes']:>5} {m['etapes_vm']:>12} "
+              f"{m['scans_complets']:>6} {m['sous_requetes_correlees']:>6}{tables}")
+
+    if args.ecrire:
+        budgets = {endpoint: budget_depuis_mesure(m) for endpoint, m in resultats.items()}
+        with open(FICHIER_BUDGETS, 'w', encoding='utf-8') as f:
+            json.dump({'echelle': args.echelle, 'routes': budgets}, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"\n✓ {len(budgets)} budgets écrits dans {FICHIER_BUDGETS}")
+        return
+
+    with open(FICHIER_BUDGETS, encoding='utf-8') as f:
+        budgets = json.load(f)
+    if budgets['echelle'] != args.echelle:
+        sys.exit(f"Les budgets sont déclarés pour l'échelle {budgets['echelle']}×")
+
+    depassements = verifier(resultats, budgets['routes'])
+    if not depassements:
+        print(f"\n✅ {len(resultats)} routes dans leur budget")
+        return
+
+    print(f"\n❌ {len(depassements)} dépassement(s) :")
+    for endpoint, critere, mesure, limite in depassements:
+        if mesure is None:
+            print(f"   {endpoint} : aucun budget déclaré (ajouter une entrée ou relancer avec --ecrire)")
+        else:
+            print(f"   {endpoint} : {critere} = {mesure} > {limite}")
+    sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Générateur de charge en boucle fermée (asyncio, sans dépendance)
+N clients concurrents rejouent un mélange pondéré des routes réelles :
+chaque client envoie une requête, attend la réponse complète, puis enchaîne.
+Rapport par route : nombre, erreurs, p50/p95/p99 et requêtes/seconde.
+
+Usage : python benchmarks/charge.py --url http://127.0.0.1:5000 --concurrence 8 --duree 30
+        python benchmarks/charge.py --demarrer --echelle 10   # serveur local lancé par le script
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import sqlite3
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+from commun import RACINE, preparer_base
+
+GRAINE = 20250906
+
+# (nom, poids, fabrique d'URL à partir du tirage et des valeurs de la base)
+MELANGE = (
+    ('tableau_de_bord', 15, lambda rng, v: '/'),
+    ('stats_dashboard', 10, lambda rng, v: '/api/dashboard/stats'),
+    ('personnel_page', 20, lambda rng, v: f"/personnel/?page={rng.randint(1, v['pages_personnel'])}"),
+    ('personnel_filtre', 10, lambda rng, v: f"/personnel/?genre={rng.choice(['F', 'M'])}"
+                                            f"&grade={rng.choice(v['grades'])}"),
+    ('api_personnel', 8, lambda rng, v: f"/api/personnel?page={rng.randint(1, 20)}"
+                                        f"&search={rng.choice(v['noms'])}"),
+    ('etablissement_detail', 12, lambda rng, v: f"/api/etablissement/{rng.choice(v['etablissements'])}"),
+    ('etablissements_liste', 8, lambda rng, v: '/etablissements/'),
+    ('rapport_synthese', 6, lambda rng, v: '/rapports/synthese'),
+    ('rapport_couverture', 4, lambda rng, v: '/rapports/couverture'),
+    ('rapport_indicateurs', 4, lambda rng, v: '/rapports/indicateurs'),
+    ('export_personnel', 2, lambda rng, v: '/personnel/api/export'),
+    ('export_rapport', 1, lambda rng, v: '/rapports/api/export/complete-excel'),
+)
+
+
+def valeurs_tirage(db_path):
+    """Identifiants et libellés réels utilisés pour varier les URL"""
+    conn = sqlite3.connect(db_path)
+    try:
+        nb_personnel = conn.execute("SELECT COUNT(*) FROM personnel").fetchone()[0]
+        return {
+            'pages_personnel': max(1, nb_personnel // 50),
+            'grades': [r[0] for r in conn.execute(
+                "SELECT grade FROM personnel WHERE grade IS NOT NULL GROUP BY grade ORDER BY COUNT(*) DESC LIMIT 10")] or [''],
+            'noms': [r[0] for r in conn.execute(
+                "SELECT nom FROM personnel GROUP BY nom ORDER BY COUNT(*) DESC LIMIT 50")] or [''],
+            'etablissements': [r[0] for r in conn.execute("SELECT id FROM etablissements")] or [1],
+        }
+    finally:
+        conn.close()
+
+
+def percentile(valeurs, p):
+    if not valeurs:
+        return None
+    rang = max(0, min(len(valeurs) - 1, round(p / 100 * len(valeurs) + 0.5) - 1))
+    return valeurs[rang]
+
+
+async def requete_http(hote, port, chemin, delai):
+    """GET HTTP/1.1 (Connection: close) ; renvoie (statut, octets du corps)"""
+    lecteur, ecrivain = await asyncio.wait_for(asyncio.open_connection(hote, port), delai)
+    try:
+        ecrivain.write(f"GET {chemin} HTTP/1.1\r\nHost: {hote}:{port}\r\n"
+                       f"Connection: close\r\nUser-Agent: ief-charge\r\n\r\n".encode('ascii'))
+        await ecrivain.drain()
+        donnees = await asyncio.wait_for(lecteur.read(), delai)
+    finally:
+        ecrivain.close()
+    entete, _, corps = donnees.partition(b'\r\n\r\n')
+    statut = int(entete.split(b' ', 2)[1]) if entete.startswith(b'HTTP/') else 0
+    return statut, len(corps)
+
+
+async def client(hote, port, rng, valeurs, fin, delai, mesures):
+    noms = [nom for nom, _, _ in MELANGE]
+    poids = [p for _, p, _ in MELANGE]
+    fabriques = {nom: fabrique for nom, _, fabrique in MELANGE}
+    while time.perf_counter() < fin:
+        nom = rng.choices(noms, poids)[0]
+        chemin = fabriques[nom](rng, valeurs)
+        debut = time.perf_counter()
+        try:
+            statut, _ = await requete_http(hote, port, chemin, delai)
+        except (OSError, asyncio.TimeoutError):
+            statut = 0
+        mesures[nom].append((time.perf_counter() - debut, statut))
+
+
+async def lancer_charge(url, concurrence, duree, delai, valeurs, graine):
+    morceaux = urlsplit(url)
+    hote, port = morceaux.hostname, morceaux.port or 80
+    mesures = defaultdict(list)
+    debut = time.perf_counter()
+    fin = debut + duree
+    await asyncio.gather(*(
+        client(hote, port, random.Random(graine + i), valeurs, fin, delai, mesures)
+        for i in range(concurrence)
+    ))
+    return mesures, time.perf_counter() - debut
+
+
+def synthese(mesures, duree_totale):
+    """Statistiques par route et globales"""
+    lignes = {}
+    toutes = []
+    for nom, valeurs in sorted(mesures.items()):
+        durees = sorted(d * 1000 for d, _ in valeurs)
+        toutes.extend(durees)
+        lignes[nom] = {
+            'requetes': len(valeurs),
+            'erreurs': sum(1 for _, statut in valeurs if not 200 <= statut < 400),
+            'p50_ms': round(percentile(durees, 50), 2),
+            'p95_ms': round(percentile(durees, 95), 2),
+            'p99_ms': round(percentile(durees, 99), 2),
+            'rps': round(len(valeurs) / duree_totale, 2),
+        }
+    toutes.sort()
+    total = {
+        'requetes': len(toutes),
+        'erreurs': sum(l['erreurs'] for l in lignes.values()),
+        'p50_ms': round(percentile(toutes, 50), 2) if toutes else None,
+        'p95_ms': round(percentile(toutes, 95), 2) if toutes else None,
+        'p99_ms': round(percentile(toutes, 99), 2) if toutes else None,
+        'rps': round(len(toutes) / duree_totale, 2),
+    }
+    return lignes, total
+
+
+def demarrer_serveur(db_path, port):
+    """Serveur WSGI multi-threads dans un processus séparé, prêt à l'emploi"""
+    code = (
+        "import sys, logging; sys.path.insert(0, 'benchmarks');"
+        "from commun import creer_app;"
+        "from werkzeug.serving import make_server;"
+        "logging.getLogger('werkzeug').setLevel(logging.ERROR);"
+        f"make_server('127.0.0.1', {port}, creer_app({db_path!r}), threaded=True).serve_forever()"
+    )
+    processus = subprocess.Popen([sys.executable, '-c', code], cwd=RACINE)
+    for _ in range(100):
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.2):
+                return processus
+        except OSError:
+            time.sleep(0.1)
+    processus.kill()
+    sys.exit("Le serveur local n'a pas démarré")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Charge en boucle fermée sur un mélange de routes")
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--concurrence', type=int, default=8)
+    parser.add_argument('--duree', type=float, default=20.0, help="secondes")
+    parser.add_argument('--delai', type=float, default=30.0, help="délai maximal par requête (s)")
+    parser.add_argument('--demarrer', action='store_true', help="démarre un serveur local sur --url")
+    parser.add_argument('--echelle', type=int, default=1, help="base synthétique utilisée avec --demarrer")
+    parser.add_argument('--base', help="base utilisée pour tirer les identifiants (défaut : ief_louga.db)")
+    parser.add_argument('--graine', type=int, default=GRAINE)
+    parser.add_argument('--sortie', help="fichier JSON des résultats")
+    args = parser.parse_args()
+
+    serveur = None
+    db_path = args.base or os.path.join(RACINE, 'ief_louga.db')
+    if args.demarrer:
+        db_path, _ = preparer_base(args.echelle)
+        serveur = demarrer_serveur(db_path, urlsplit(args.url).port or 80)
+
+    try:
+        valeurs = valeurs_tirage(db_path)
+        print(f"🔥 {args.concurrence} clients pendant {args.duree:.0f}s sur {args.url}")
+        mesures, duree_totale = asyncio.run(
+            lancer_charge(args.url, args.concurrence, args.duree, args.delai, valeurs, args.graine))
+    finally:
+        if serveur is not None:
+            serveur.terminate()
+            serveur.wait()
+
+    lignes, total = synthese(mesures, duree_totale)
+    print(f"\n{'route':<24} {'req':>6} {'err':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>8}")
+    for nom, l in list(lignes.items()) + [('TOTAL', total)]:
+        print(f"{nom:<24} {l['requetes']:>6} {l['erreurs']:>5} {l['p50_ms']:>9} "
+              f"{l['p95_ms']:>9} {l['p99_ms']:>9} {l['rps']:>8}")
+
+    if args.sortie:
+        with open(args.sortie, 'w', encoding='utf-8') as f:
+            json.dump({'url': args.url, 'concurrence': args.concurrence, 'duree_s': round(duree_totale, 2),
+                       'routes': lignes, 'total': total}, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == '__main__':
+    main()
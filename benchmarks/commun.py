@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Outils communs aux benchmarks : préparation d'une base à une échelle donnée,
+application Flask pointant sur cette base, URL concrètes de chaque route GET
+"""
+
+import contextlib
+import io
+import logging
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+
+RACINE = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+DOSSIER_DONNEES = os.path.join(RACINE, 'benchmarks', 'donnees')
+DOSSIER_RESULTATS = os.path.join(RACINE, 'benchmarks', 'resultats')
+
+# L'ETL et l'application lisent schema_bd_ief.sql et les modules à la racine
+os.chdir(RACINE)
+if RACINE not in sys.path:
+    sys.path.insert(0, RACINE)
+
+# Endpoints exclus des mesures (outillage, fichiers statiques)
+ENDPOINTS_EXCLUS = {'static', 'metriques.metrics'}
+PREFIXES_EXCLUS = ('debug.', 'profilage.')
+
+# Paramètres de requête pour les routes qui en exigent
+PARAMETRES_ROUTES = {
+    'api.api_autocomplete': 'kind=agent&q=fa',
+    'personnel.recherche': 'q=diop',
+    'rapports.api_constructeur': 'dimensions=grade,arrondissement&mesures=effectif,femmes&filtres=corps:I',
+    'rapports.api_constructeur_export': 'dimensions=corps,grade&mesures=effectif,femmes',
+    'rapports.api_pivot_export': 'lignes=corps,grade&colonne=commune',
+    'rapports.pivot_html': 'lignes=corps,grade&colonne=genre',
+}
+
+
+def revision_git():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=RACINE,
+                                       text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'inconnue'
+
+
+def executer_etl(dossier_csv, db_path):
+    """ETL complet en silence ; renvoie sa durée en secondes"""
+    from etl_simple import ETL_Simple
+
+    debut = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        ETL_Simple(db_path=db_path, data_dir=dossier_csv).run_etl()
+    return time.perf_counter() - debut
+
+
+def mettre_a_jour_schema(db_path):
+    """Applique à une base déjà générée les migrations apparues depuis"""
+    from migrations import appliquer_migrations
+    from phonetique import indexer_agents
+
+    conn = sqlite3.connect(db_path)
+    try:
+        if appliquer_migrations(conn):
+            conn.execute("ANALYZE")
+            conn.commit()
+        indexer_agents(conn)
+    finally:
+        conn.close()
+
+
+def preparer_base(echelle, regenerer=False):
+    """Génère les CSV et la base pour l'échelle (réutilisés s'ils existent)
+
+    Renvoie (chemin de la base, durée de l'ETL ou None si la base existait)
+    """
+    from generer_donnees import generer
+
+    dossier = os.path.join(DOSSIER_DONNEES, f"x{echelle}")
+    db_path = os.path.join(dossier, 'ief_louga.db')
+    if os.path.exists(db_path) and not regenerer:
+        mettre_a_jour_schema(db_path)
+        return db_path, None
+
+    generer(echelle, dossier)
+    return db_path, executer_etl(dossier, db_path)
+
+
+def creer_app(db_path):
+    """Application Flask dont toutes les connexions visent db_path"""
+    os.environ['IEF_DB_PATH'] = db_path
+    import app.database
+    app.database.DB_PATH = db_path
+
+    from app import create_app
+    application = create_app()
+    # Les routes en erreur sont mesurées avec leur statut 500, sans trace dans la sortie
+    application.logger.setLevel(logging.CRITICAL)
+    return application
+
+
+def capturer_requetes(application):
+    """Conserve les requêtes SQL de la dernière requête HTTP dans le dict renvoyé"""
+    capture = {}
+
+    @application.after_request
+    def capturer(response):
+        from flask import g
+        capture['requetes'] = list(g.get('requetes_sql', []))
+        return response
+
+    return capture
+
+
+def valeurs_exemple(db_path):
+    """Valeurs réelles pour remplir les arguments des routes"""
+    conn = sqlite3.connect(db_path)
+    try:
+        def premier(requete, defaut):
+            ligne = conn.execute(requete).fetchone()
+            return ligne[0] if ligne and ligne[0] is not None else defaut
+
+        return {
+            'etablissement_id': premier("""
+                SELECT etablissement_id FROM personnel WHERE etablissement_id IS NOT NULL
+                GROUP BY etablissement_id ORDER BY COUNT(*) DESC LIMIT 1""", 1),
+            'personnel_id': premier("SELECT personnel_id_1 FROM doublons_personnel ORDER BY score DESC LIMIT 1", 1),
+            'agent_id': premier("SELECT MIN(id) FROM personnel WHERE etablissement_id IS NOT NULL", 1),
+            'table_source': 'personnel',
+            'regle': premier("""
+                SELECT regle FROM anomalies_qualite WHERE table_source = 'personnel'
+                GROUP BY regle ORDER BY COUNT(*) DESC LIMIT 1""", 'cni_invalide'),
+            'type_etablissement': premier("""
+                SELECT type_etablissement FROM etablissements
+                GROUP BY type_etablissement ORDER BY COUNT(*) DESC LIMIT 1""", 'ELEMENTAIRE'),
+            'corps': premier("""
+                SELECT corps FROM personnel WHERE corps IS NOT NULL
+                GROUP BY corps ORDER BY COUNT(*) DESC LIMIT 1""", 'I'),
+        }
+    finally:
+        conn.close()
+
+
+def routes_get(application, db_path):
+    """[(endpoint, url)] pour chaque route GET mesurable, arguments remplis"""
+    valeurs = valeurs_exemple(db_path)
+    routes = []
+    with application.test_request_context():
+        from flask import url_for
+        for regle in sorted(application.url_map.iter_rules(), key=lambda r: r.endpoint):
+            if 'GET' not in regle.methods or regle.endpoint in ENDPOINTS_EXCLUS:
+                continue
+            if regle.endpoint.startswith(PREFIXES_EXCLUS):
+                continue
+            if not regle.arguments <= valeurs.keys():
+                print(f"⚠️ {regle.endpoint} ignorée : argument(s) {regle.arguments - valeurs.keys()} "
+                      f"sans valeur d'exemple", file=sys.stderr)
+                continue
+            arguments = {nom: valeurs[nom] for nom in regle.arguments}
+            url = url_for(regle.endpoint, **arguments)
+            if regle.endpoint in PARAMETRES_ROUTES:
+                url += '?' + PARAMETRES_ROUTES[regle.endpoint]
+            routes.append((regle.endpoint, url))
+    return routes
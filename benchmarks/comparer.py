@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Comparaison de deux résultats de bench_routes.py
+Code de sortie 1 si une route (ou l'ETL) ralentit au-delà du seuil.
+
+Usage : python benchmarks/comparer.py ancien.json nouveau.json --seuil 1.25
+"""
+
+import argparse
+import json
+import sys
+
+# En dessous de ce temps, les écarts relèvent du bruit de mesure
+PLANCHER_MS = 2.0
+
+
+def charger(chemin):
+    with open(chemin, encoding='utf-8') as f:
+        rapport = json.load(f)
+    return rapport, {e['echelle']: e for e in rapport['echelles']}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Détection des régressions de performance")
+    parser.add_argument('ancien')
+    parser.add_argument('nouveau')
+    parser.add_argument('--seuil', type=float, default=1.25, help="ratio nouveau/ancien toléré")
+    parser.add_argument('--mesure', default='mediane_ms', choices=('min_ms', 'mediane_ms', 'p95_ms'))
+    args = parser.parse_args()
+
+    rapport_ancien, ancien = charger(args.ancien)
+    rapport_nouveau, nouveau = charger(args.nouveau)
+    print(f"Comparaison {rapport_ancien['revision']} -> {rapport_nouveau['revision']} ({args.mesure})")
+
+    regressions = 0
+    for echelle in sorted(ancien.keys() & nouveau.keys()):
+        print(f"\n📏 ÉCHELLE {echelle}×")
+        a, n = ancien[echelle], nouveau[echelle]
+        if a.get('etl_s') and n.get('etl_s'):
+            ratio = n['etl_s'] / a['etl_s']
+            marque = '❌' if ratio > args.seuil else '  '
+            regressions += ratio > args.seuil
+            print(f"{marque} {'ETL':<42} {a['etl_s'] * 1000:>10.1f} -> {n['etl_s'] * 1000:>10.1f} ms  x{ratio:.2f}")
+
+        for endpoint in sorted(a['routes'].keys() & n['routes'].keys()):
+            avant = a['routes'][endpoint][args.mesure]
+            apres = n['routes'][endpoint][args.mesure]
+            ratio = apres / avant if avant else float('inf')
+            regression = ratio > args.seuil and apres > PLANCHER_MS
+            regressions += regression
+            marque = '❌' if regression else ('✅' if ratio < 1 / args.seuil and avant > PLANCHER_MS else '  ')
+            print(f"{marque} {endpoint:<42} {avant:>10.2f} -> {apres:>10.2f} ms  x{ratio:.2f}")
+
+        for endpoint in sorted(n['routes'].keys() - a['routes'].keys()):
+            print(f"   {endpoint:<42} {'nouvelle':>10}    {n['routes'][endpoint][args.mesure]:>10.2f} ms")
+
+    print(f"\n{regressions} régression(s) au-delà de x{args.seuil}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Générateur déterministe de données synthétiques pour les benchmarks
+Produit etablissements.csv et personnels.csv au format de bd/ (latin-1, ';',
+valeurs entre guillemets, NULL) à l'échelle N × Louga :
+- chaque copie k de la région reprend les établissements réels, avec des
+  communes suffixées (« Louga-0003 ») pour k > 0 ;
+- chaque agent est tiré d'une ligne réelle (corps, grade, fonction,
+  rattachement...) mais reçoit une identité synthétique (nom, prénom,
+  matricule, CNI, contact, date de naissance).
+Même graine et même échelle => fichiers identiques octet pour octet.
+
+Usage : python benchmarks/generer_donnees.py --echelle 10 --sortie benchmarks/donnees/x10
+"""
+
+import argparse
+import csv
+import os
+import random
+import sys
+import time
+
+DOSSIER_SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'bd')
+ECHELLES = (1, 10, 100, 1000)
+GRAINE = 20250906
+LETTRES_MATRICULE = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+
+def lire_csv(chemin):
+    with open(chemin, 'r', encoding='latin-1', newline='') as f:
+        reader = csv.DictReader(f, delimiter=';')
+        return reader.fieldnames, list(reader)
+
+
+def ecrire_ligne(f, colonnes, ligne):
+    """Écrit une ligne au format des exports d'origine (NULL sans guillemets)"""
+    valeurs = []
+    for colonne in colonnes:
+        valeur = ligne.get(colonne)
+        if valeur is None or valeur == 'NULL':
+            valeurs.append('NULL')
+        else:
+            valeurs.append('"' + str(valeur).replace('"', '""') + '"')
+    f.write(';'.join(valeurs) + '\n')
+
+
+def suffixe_commune(commune, copie):
+    if copie == 0 or not commune or commune == 'NULL':
+        return commune
+    return f"{commune}-{copie:04d}"
+
+
+def telephone(rng):
+    return f"7{rng.choice('05678')} {rng.randint(100, 999)} {rng.randint(10, 99)} {rng.randint(10, 99)}"
+
+
+def generer_etablissements(rng, colonnes, modeles, echelle, chemin):
+    """Copies des établissements réels ; renvoie le nombre de lignes écrites"""
+    nb = 0
+    with open(chemin, 'w', encoding='latin-1', errors='replace', newline='') as f:
+        f.write(';'.join(f'"{c}"' for c in colonnes) + '\n')
+        for copie in range(echelle):
+            for modele in modeles:
+                nb += 1
+                ligne = dict(modele)
+                ligne['id'] = str(nb)
+                ligne['commune'] = suffixe_commune(modele['commune'], copie)
+                ligne['code'] = str(rng.randint(10 ** 9, 10 ** 10 - 1))
+                if modele.get('geo_ref_x') not in (None, '', 'NULL'):
+                    ligne['geo_ref_x'] = f"{float(modele['geo_ref_x']) + rng.uniform(-500, 500):.2f}"
+                    ligne['geo_ref_y'] = f"{float(modele['geo_ref_y']) + rng.uniform(-500, 500):.2f}"
+                if modele.get('contact_1') not in (None, '', 'NULL'):
+                    ligne['contact_1'] = telephone(rng)
+                ecrire_ligne(f, colonnes, ligne)
+    return nb
+
+
+def generer_personnel(rng, colonnes, modeles, echelle, chemin):
+    """Agents synthétiques tirés des lignes réelles ; renvoie le nombre de lignes écrites"""
+    noms = [m['nom'] for m in modeles if m['nom'] not in ('', 'NULL')]
+    prenoms = [m['prenom'] for m in modeles if m['prenom'] not in ('', 'NULL')]
+    nb = 0
+    with open(chemin, 'w', encoding='latin-1', errors='replace', newline='') as f:
+        f.write(';'.join(f'"{c}"' for c in colonnes) + '\n')
+        for copie in range(echelle):
+            for _ in range(len(modeles)):
+                nb += 1
+                modele = rng.choice(modeles)
+                annee = rng.randint(1962, 2000)
+                ligne = dict(modele)
+                ligne['id'] = str(nb)
+                ligne['matricule'] = f"{500000 + nb}/{LETTRES_MATRICULE[nb % 26]}"
+                ligne['nom'] = rng.choice(noms)
+                ligne['prenom'] = rng.choice(prenoms)
+                ligne['date_naissance'] = f"{annee}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+                ligne['numero_cni'] = f"{rng.randint(1, 2)}{rng.randint(100, 999)}{annee}{rng.randint(0, 99999):05d}"
+                ligne['contact'] = telephone(rng).replace(' ', '')
+                ligne['commune'] = suffixe_commune(modele['commune'], copie)
+                ecrire_ligne(f, colonnes, ligne)
+    return nb
+
+
+def generer(echelle, sortie, graine=GRAINE):
+    """Écrit les deux CSV dans sortie ; renvoie (nb établissements, nb agents)"""
+    os.makedirs(sortie, exist_ok=True)
+    rng = random.Random(graine)
+    colonnes_etab, etablissements = lire_csv(os.path.join(DOSSIER_SOURCE, 'etablissements.csv'))
+    colonnes_pers, personnel = lire_csv(os.path.join(DOSSIER_SOURCE, 'personnels.csv'))
+
+    nb_etab = generer_etablissements(rng, colonnes_etab, etablissements, echelle,
+                                     os.path.join(sortie, 'etablissements.csv'))
+    nb_pers = generer_personnel(rng, colonnes_pers, personnel, echelle,
+                                os.path.join(sortie, 'personnels.csv'))
+    return nb_etab, nb_pers
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Données synthétiques N × Louga")
+    parser.add_argument('--echelle', type=int, default=1, choices=ECHELLES)
+    parser.add_argument('--sortie', help="dossier de sortie (défaut : benchmarks/donnees/x<echelle>)")
+    parser.add_argument('--graine', type=int, default=GRAINE)
+    args = parser.parse_args()
+
+    sortie = args.sortie or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'donnees', f"x{args.echelle}")
+    debut = time.perf_counter()
+    nb_etab, nb_pers = generer(args.echelle, sortie, args.graine)
+    print(f"✓ {nb_etab} établissements et {nb_pers} agents générés dans {sortie} "
+          f"en {time.perf_counter() - debut:.1f}s", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Vérification des plans d'exécution des listes paginées
+Chaque cas appelle une route avec un jeu de filtres (QUERY_AUDIT actif) et
+vérifie que la requête paginée et son comptage utilisent l'index composite
+attendu, sans B-tree temporaire pour le tri. Les listes du personnel filtrées
+sans recherche sont paginées par l'index bitmap : seule la lecture des lignes
+de la page, par clé primaire, est attendue (remises dans l'ordre de la page
+par SQLite quand le JSON est sérialisé en SQL) ; avec une recherche, les
+agents sont trouvés par les index FTS (trigrammes, clés phonétiques), sans
+parcours de personnel_read. Les lectures complètes triées par un index
+composite (exports, agents d'un établissement) sont vérifiées à part. Code
+de sortie 1 en cas d'écart.
+
+Usage : python benchmarks/verifier_plans.py [--echelle 1]
+"""
+
+import argparse
+import sys
+
+from commun import capturer_requetes, creer_app, preparer_base
+
+# Lecture par identifiants des lignes d'une page servie par l'index bitmap
+PAGE_PAR_IDS = 'SEARCH p USING INTEGER PRIMARY KEY'
+
+# Recherche servie par l'index trigram : lecture par clé primaire ou, pour un
+# filtre sélectif, par son index composite ; jamais de parcours de p
+RECHERCHE = 'personnel_recherche VIRTUAL TABLE INDEX 0:M'
+
+# (url, index attendu pour la page, index couvrant(s) acceptés pour le comptage)
+CAS = (
+    ('/personnel/', PAGE_PAR_IDS, None),
+    ('/personnel/?corps=I', PAGE_PAR_IDS, None),
+    ('/personnel/?corps=I&grade=I1/3', PAGE_PAR_IDS, None),
+    ('/personnel/?grade=I1/3', PAGE_PAR_IDS, None),
+    ('/personnel/?genre=F', PAGE_PAR_IDS, None),
+    ('/personnel/?etablissement_id=1', PAGE_PAR_IDS, None),
+    ('/api/personnel', PAGE_PAR_IDS, None),
+    ('/api/personnel?corps=I', PAGE_PAR_IDS, None),
+    ('/api/personnel?corps=I&grade=I1/3', PAGE_PAR_IDS, None),
+    ('/api/personnel?fonction=ENS-ADJOINT', PAGE_PAR_IDS, None),
+    ('/api/personnel?etablissement_id=1', PAGE_PAR_IDS, None),
+    # Recherche : page et comptage lus depuis les index FTS (tri des seuls résultats)
+    ('/personnel/?search=diop', RECHERCHE, None),
+    ('/personnel/?search=diop&corps=I', RECHERCHE, None),
+    ('/personnel/?search=diop&corps=I&grade=I1/3', RECHERCHE, None),
+    ('/api/personnel?search=diop', RECHERCHE, None),
+    ('/api/personnel?search=dio', RECHERCHE, None),
+    ('/api/personnel?search=diop&fonction=ENS-ADJOINT', RECHERCHE, None),
+    ('/api/personnel?search=diop&genre=F', RECHERCHE, None),
+    ('/api/personnel?search=diop&etablissement_id=1', RECHERCHE, None),
+    ('/api/personnel?search=123', RECHERCHE, None),
+    ('/etablissements/', 'idx_etablissements_nom', None),
+    ('/etablissements/?type_etablissement=ELEMENTAIRE', 'idx_etablissements_type_nom', 'idx_etablissements_type_nom'),
+    ('/etablissements/?commune_id=1', 'idx_etablissements_commune_nom', 'idx_etablissements_commune_nom'),
+    ('/api/etablissements', 'idx_etablissements_nom', None),
+    ('/api/etablissements?type=ELEMENTAIRE', 'idx_etablissements_type_nom', 'idx_etablissements_type_nom'),
+    ('/api/etablissements?commune_id=1', 'idx_etablissements_commune_nom', 'idx_etablissements_commune_nom'),
+)
+
+# (url, fragment de la requête, index attendu) : listes complètes lues dans
+# personnel, triées par l'index sans B-tree temporaire
+LECTURES = (
+    ('/personnel/api/export?corps=I', 'WHERE p.corps = ? ORDER BY p.nom, p.prenom', 'idx_personnel_read_corps_nom'),
+    ('/api/etablissement/1', 'WHERE etablissement_id = ? ORDER BY nom, prenom', 'idx_personnel_etablissement_nom'),
+)
+
+
+def verifier_cas(client, capture, url, index_page, index_comptage):
+    """Liste des écarts constatés pour un cas"""
+    capture.clear()
+    statut = client.get(url).status_code
+    requetes = capture.get('requetes', [])
+    if statut != 200:
+        return [f"HTTP {statut}"]
+
+    page = [r for r in requetes if 'LIMIT ? OFFSET ?' in r['sql'] or 'p.id IN (' in r['sql']
+            or 'json_each(?)' in r['sql']]
+    comptage = [r for r in requetes if 'as total' in r['sql']]
+    if not page or (index_comptage and not comptage):
+        return ["requête paginée ou comptage introuvable"]
+
+    ecarts = []
+    plan_page = ' / '.join(page[-1]['plan'])
+    attendu = index_page if index_page in (PAGE_PAR_IDS, RECHERCHE) else f"INDEX {index_page}"
+    if attendu not in plan_page:
+        ecarts.append(f"page sans {index_page} : {plan_page}")
+    if index_page == RECHERCHE and any(etape.split()[:2] == ['SCAN', 'p'] for etape in page[-1]['plan']):
+        ecarts.append(f"parcours de la table : {plan_page}")
+    # Tri des seules lignes de la page lues par identifiant ou trouvées par la recherche : toléré
+    if 'USE TEMP B-TREE FOR ORDER BY' in plan_page and index_page not in (PAGE_PAR_IDS, RECHERCHE):
+        ecarts.append(f"tri par B-tree temporaire : {plan_page}")
+
+    if not index_comptage:
+        return ecarts
+    plan_comptage = ' / '.join(comptage[-1]['plan'])
+    if isinstance(index_comptage, str):
+        index_comptage = (index_comptage,)
+    if not any(f"COVERING INDEX {i}" in plan_comptage for i in index_comptage):
+        ecarts.append(f"comptage non couvert par {' ou '.join(index_comptage)} : {plan_comptage}")
+    return ecarts
+
+
+def verifier_lecture(client, capture, url, fragment, index):
+    """Liste des écarts constatés pour une lecture directe"""
+    capture.clear()
+    statut = client.get(url).status_code
+    if statut != 200:
+        return [f"HTTP {statut}"]
+    lectures = [r for r in capture.get('requetes', []) if fragment in ' '.join(r['sql'].split())]
+    if not lectures:
+        return ["requête introuvable"]
+    plan = ' / '.join(lectures[-1]['plan'])
+    ecarts = []
+    if f"INDEX {index}" not in plan:
+        ecarts.append(f"lecture sans {index} : {plan}")
+    if 'USE TEMP B-TREE FOR ORDER BY' in plan:
+        ecarts.append(f"tri par B-tree temporaire : {plan}")
+    return ecarts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vérification des plans des listes paginées")
+    parser.add_argument('--echelle', type=int, default=1)
+    args = parser.parse_args()
+
+    db_path, _ = preparer_base(args.echelle)
+    application = creer_app(db_path)
+    application.config['QUERY_AUDIT'] = True
+    capture = capturer_requetes(application)
+    client = application.test_client()
+
+    echecs = 0
+    verifications = [(url, verifier_cas, cas) for url, *cas in CAS]
+    verifications += [(url, verifier_lecture, cas) for url, *cas in LECTURES]
+    for url, verifier, cas in verifications:
+        ecarts = verifier(client, capture, url, *cas)
+        echecs += bool(ecarts)
+        print(f"{'❌' if ecarts else '✅'} {url}")
+        for ecart in ecarts:
+            print(f"      {ecart}")
+
+    print(f"\n{len(verifications) - echecs}/{len(verifications)} plans conformes")
+    sys.exit(1 if echecs else 0)
+
+
+if __name__ == '__main__':
+    main()
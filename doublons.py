@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Détection des agents en double dans la table personnel
+Comparaison limitée aux agents partageant une clé de blocage (CNI, matricule,
+nom + prénom + date de naissance, clé phonétique), donc en temps quasi linéaire
+"""
+
+import re
+import sqlite3
+import time
+from collections import defaultdict
+from itertools import combinations
+
+from normalisation import normaliser_texte, trigrammes
+from phonetique import cle_phonetique
+
+SEUIL_DOUBLON = 0.6
+TAILLE_BLOC_MAX = 50  # au-delà, la clé est trop générique pour être utile
+
+_NON_CHIFFRES = re.compile(r'\D')
+_NON_ALPHANUM = re.compile(r'[^0-9A-Z]')
+
+
+def normaliser_cni(numero):
+    """'2 728 1983 00190' -> '2728198300190' ; None si trop court pour être fiable"""
+    chiffres = _NON_CHIFFRES.sub('', numero or '')
+    return chiffres if len(chiffres) >= 8 else None
+
+
+def normaliser_matricule(matricule):
+    """'723 613/z' -> '723613Z'"""
+    return _NON_ALPHANUM.sub('', (matricule or '').upper()) or None
+
+
+class DetecteurDoublons:
+    """Regroupe les agents par clés de blocage puis score les paires candidates"""
+
+    def __init__(self, seuil=SEUIL_DOUBLON, taille_bloc_max=TAILLE_BLOC_MAX):
+        self.seuil = seuil
+        self.taille_bloc_max = taille_bloc_max
+        self.agents = {}
+        self.blocs = defaultdict(list)
+        self.blocs_ignores = 0
+
+    def ajouter(self, agent_id, matricule, nom, prenom, date_naissance, numero_cni):
+        """Enregistre un agent et l'ajoute à chacun de ses blocs"""
+        nom_complet = normaliser_texte(f"{nom or ''} {prenom or ''}")
+        fiche = {
+            'cni': normaliser_cni(numero_cni),
+            'matricule': normaliser_matricule(matricule),
+            'date_naissance': (date_naissance or '')[:10] or None,
+            'nom_complet': nom_complet,
+            'trigrammes': trigrammes(nom_complet),
+            'phonetique': cle_phonetique(f"{nom or ''} {prenom or ''}"),
+        }
+        self.agents[agent_id] = fiche
+
+        for cle in self.cles_blocage(fiche):
+            self.blocs[cle].append(agent_id)
+
+    @staticmethod
+    def cles_blocage(fiche):
+        """Clés de blocage d'un agent : deux agents ne sont comparés que s'ils en partagent une"""
+        cles = []
+        if fiche['cni']:
+            cles.append(('cni', fiche['cni']))
+        if fiche['matricule']:
+            cles.append(('matricule', fiche['matricule']))
+        if fiche['nom_complet'] and fiche['date_naissance']:
+            cles.append(('identite', fiche['nom_complet'], fiche['date_naissance']))
+        if fiche['phonetique']:
+            annee = (fiche['date_naissance'] or '')[:4]
+            cles.append(('phonetique', fiche['phonetique'], annee))
+        return cles
+
+    def scorer(self, id_1, id_2):
+        """Score (0 à 1) et motifs de ressemblance entre deux agents"""
+        a, b = self.agents[id_1], self.agents[id_2]
+        score = 0.0
+        motifs = []
+
+        if a['cni'] and a['cni'] == b['cni']:
+            score += 0.6
+            motifs.append('cni')
+        if a['matricule'] and a['matricule'] == b['matricule']:
+            score += 0.6
+            motifs.append('matricule')
+        if a['date_naissance'] and a['date_naissance'] == b['date_naissance']:
+            score += 0.2
+            motifs.append('date_naissance')
+
+        if a['trigrammes'] and b['trigrammes']:
+            commun = len(a['trigrammes'] & b['trigrammes'])
+            similarite = 2 * commun / (len(a['trigrammes']) + len(b['trigrammes']))
+            score += 0.4 * similarite
+            if a['nom_complet'] == b['nom_complet']:
+                motifs.append('nom')
+            elif a['phonetique'] == b['phonetique']:
+                motifs.append('phonetique')
+
+        return round(min(score, 1.0), 3), ','.join(motifs)
+
+    def detecter(self):
+        """Liste des paires (id_1, id_2, score, motifs) au-dessus du seuil"""
+        vues = set()
+        paires = []
+        for membres in self.blocs.values():
+            if len(membres) < 2:
+                continue
+            if len(membres) > self.taille_bloc_max:
+                self.blocs_ignores += 1
+                continue
+            for id_1, id_2 in combinations(sorted(set(membres)), 2):
+                if (id_1, id_2) in vues:
+                    continue
+                vues.add((id_1, id_2))
+                score, motifs = self.scorer(id_1, id_2)
+                if score >= self.seuil:
+                    paires.append((id_1, id_2, score, motifs))
+        paires.sort(key=lambda p: (-p[2], p[0], p[1]))
+        return paires
+
+
+def detecter_doublons(conn):
+    """Recalcule la table doublons_personnel à partir de la table personnel"""
+    detecteur = DetecteurDoublons()
+    cursor = conn.execute("""
+        SELECT id, matricule, nom, prenom, date_naissance, numero_cni
+        FROM personnel
+    """)
+    for row in cursor:
+        detecteur.ajouter(*row)
+
+    paires = detecteur.detecter()
+    conn.execute("DELETE FROM doublons_personnel")
+    conn.executemany("""
+        INSERT INTO doublons_personnel (personnel_id_1, personnel_id_2, score, motifs)
+        VALUES (?, ?, ?, ?)
+    """, paires)
+    conn.commit()
+    return len(detecteur.agents), paires, detecteur.blocs_ignores
+
+
+if __name__ == '__main__':
+    conn = sqlite3.connect('ief_louga.db')
+    debut = time.perf_counter()
+    nb_agents, paires, blocs_ignores = detecter_doublons(conn)
+    conn.close()
+    print(f"✓ {nb_agents} agents analysés en {time.perf_counter() - debut:.2f}s")
+    print(f"✓ {len(paires)} doublons potentiels enregistrés")
+    if blocs_ignores:
+        print(f"⚠️ {blocs_ignores} blocs trop génériques ignorés")
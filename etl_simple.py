@@ -8,12 +8,44 @@ Sans dépendances externes (seulement csv et sqlite3)
 import csv
 import sqlite3
 import os
+import time
+
+from resolution_etablissements import ResolveurEtablissements, SEUIL_REVUE
+from doublons import detecter_doublons
+from qualite import evaluer_qualite
+from phonetique import indexer_agents
+from migrations import appliquer_migrations, version_schema
+
+RAPPORT_RESOLUTION = "resolution_etablissements_a_verifier.csv"
+
+# (colonne de personnel, table de dimension) — voir migrations/003_dimensions_personnel.sql
+DIMENSIONS_PERSONNEL = (
+    ('corps', 'dim_corps'),
+    ('grade', 'dim_grades'),
+    ('fonction', 'dim_fonctions'),
+    ('specialite', 'dim_specialites'),
+)
 
 class ETL_Simple:
-    def __init__(self, db_path="ief_louga.db"):
+    def __init__(self, db_path="ief_louga.db", data_dir="bd"):
         self.db_path = db_path
+        self.data_dir = data_dir
         self.conn = None
         
+    @staticmethod
+    def valeur(row, colonne):
+        """Valeur nettoyée d'une colonne CSV (None pour '', 'NULL' ou 'nan')"""
+        valeur = (row.get(colonne) or '').strip()
+        return None if valeur in ('', 'NULL', 'nan') else valeur
+    
+    @staticmethod
+    def drapeau(row, colonne, defaut):
+        """Indicateur 0/1 d'une colonne CSV ('1', '1.0'...) ; defaut si vide ou illisible"""
+        try:
+            return int(float(ETL_Simple.valeur(row, colonne)))
+        except (TypeError, ValueError):
+            return defaut
+        
     def connect_db(self):
         """Connexion à la base de données SQLite"""
         # Supprimer l'ancienne base si elle existe
@@ -33,6 +65,10 @@ class ETL_Simple:
         self.conn.commit()
         print("✓ Tables créées avec succès")
         
+        for nom in appliquer_migrations(self.conn):
+            print(f"   ✓ Migration {nom}")
+        print(f"✓ Schéma en version {version_schema(self.conn)}")
+        
     def load_etablissements(self):
         """Chargement et analyse des établissements"""
         print(f"\n🏫 CHARGEMENT DES ÉTABLISSEMENTS")
@@ -42,7 +78,7 @@ class ETL_Simple:
         communes_set = set()
         types_etab = {}
         
-        with open('bd/etablissements.csv', 'r', encoding='latin-1') as f:
+        with open(os.path.join(self.data_dir, 'etablissements.csv'), 'r', encoding='latin-1') as f:
             reader = csv.DictReader(f, delimiter=';')
             
             for row in reader:
@@ -59,12 +95,21 @@ class ETL_Simple:
                     'type': type_etab,
                     'commune': commune,
                     'arrondissement': arrondissement,
-                    'zone': row.get('zone', '').strip() or None,
-                    'statut': row.get('statut', '').strip() or None,
-                    'type_statut': row.get('type_statut', '').strip() or None,
-                    'directeur': row.get('nom_directeur_complet', '').strip() or None,
-                    'contact': row.get('contact_1', '').strip() or None,
-                    'email': row.get('email_etablissement', '').strip() or None
+                    'zone': self.valeur(row, 'zone'),
+                    'statut': self.valeur(row, 'statut'),
+                    'type_statut': self.valeur(row, 'type_statut'),
+                    'directeur': self.valeur(row, 'nom_directeur_complet') or self.valeur(row, 'directeur'),
+                    'contact': self.valeur(row, 'contact_1'),
+                    'contact_2': self.valeur(row, 'contact_2'),
+                    'email': self.valeur(row, 'email_directeur') or self.valeur(row, 'email_etablissement'),
+                    'coordonnees_x': self.valeur(row, 'geo_ref_x'),
+                    'coordonnees_y': self.valeur(row, 'geo_ref_y'),
+                    'date_creation': self.valeur(row, 'date_creation'),
+                    'date_ouverture': self.valeur(row, 'date_ouverture'),
+                    'coordonnees_validees': self.drapeau(row, 'coordonnees_validees', 0),
+                    'directeur_valide': self.drapeau(row, 'directeur_valide', 0),
+                    'dates_coherentes': self.drapeau(row, 'dates_coherentes', 1),
+                    'notes_qualite': self.valeur(row, 'notes_qualite')
                 })
                 
                 if commune and commune != 'nan':
@@ -88,7 +133,7 @@ class ETL_Simple:
         specialites = {}
         etablissements_ref = set()
         
-        with open('bd/personnels.csv', 'r', encoding='latin-1') as f:
+        with open(os.path.join(self.data_dir, 'personnels.csv'), 'r', encoding='latin-1') as f:
             reader = csv.DictReader(f, delimiter=';')
             
             for row in reader:
@@ -100,19 +145,26 @@ class ETL_Simple:
                     continue
                 
                 etablissement = row.get('etablissement', '').strip()
-                specialite = row.get('specialite', '').strip()
+                specialite = self.valeur(row, 'specialite') or ''
                 
                 personnel.append({
                     'matricule': matricule,
                     'nom': nom,
                     'prenom': prenom,
-                    'genre': row.get('genre', '').strip() or None,
+                    'genre': self.valeur(row, 'genre'),
+                    'date_naissance': self.valeur(row, 'date_naissance'),
+                    'date_entree_enseignement': self.valeur(row, 'date_entree_enseignement'),
+                    'date_arrivee_poste': self.valeur(row, 'arrivee_au_poste'),
+                    'lieu_naissance': self.valeur(row, 'lieu_naissance'),
+                    'numero_cni': self.valeur(row, 'numero_cni'),
                     'etablissement': etablissement,
+                    'commune': row.get('commune', '').strip() or None,
                     'specialite': specialite or None,
-                    'grade': row.get('grade', '').strip() or None,
-                    'fonction': row.get('fonction', '').strip() or None,
-                    'contact': row.get('contact', '').strip() or None,
-                    'statut': row.get('statut', '').strip() or None
+                    'corps': self.valeur(row, 'corps'),
+                    'grade': self.valeur(row, 'grade'),
+                    'fonction': self.valeur(row, 'fonction'),
+                    'contact': self.valeur(row, 'contact'),
+                    'statut': self.valeur(row, 'statut')
                 })
                 
                 if etablissement and etablissement != 'nan':
@@ -168,19 +220,28 @@ class ETL_Simple:
                 etab['statut'],
                 etab['type_statut'],
                 None,  # adresse
-                None,  # coordonnees_x
-                None,  # coordonnees_y
+                etab['coordonnees_x'],
+                etab['coordonnees_y'],
                 etab['directeur'],
                 etab['contact'],
-                etab['email']
+                etab['contact_2'],
+                etab['email'],
+                etab['date_creation'],
+                etab['date_ouverture'],
+                etab['coordonnees_validees'],
+                etab['directeur_valide'],
+                etab['dates_coherentes'],
+                etab['notes_qualite']
             ))
         
         cursor = self.conn.cursor()
         cursor.executemany("""
             INSERT INTO etablissements (
                 nom, type_etablissement, commune_id, zone, statut, type_statut,
-                adresse, coordonnees_x, coordonnees_y, directeur, contact_1, email_directeur
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                adresse, coordonnees_x, coordonnees_y, directeur, contact_1, contact_2,
+                email_directeur, date_creation, date_ouverture, coordonnees_validees,
+                directeur_valide, dates_coherentes, notes_qualite
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """, etablissements_list)
         self.conn.commit()
         
@@ -192,39 +253,84 @@ class ETL_Simple:
         
         return etablissements_ids
     
-    def insert_personnel(self, personnel, etablissements_ids):
+    def construire_resolveur(self):
+        """Index de résolution des noms d'établissements (blocage par commune)"""
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            SELECT e.id, e.nom, c.nom
+            FROM etablissements e
+            LEFT JOIN communes c ON e.commune_id = c.id
+        """)
+        return ResolveurEtablissements(cursor.fetchall())
+    
+    def insert_dimensions(self, personnel):
+        """Tables de dimension du personnel : {colonne: {libellé: id}}"""
+        print(f"\n🗂️ INSERTION DES DIMENSIONS")
+        print("-" * 35)
+        
+        cursor = self.conn.cursor()
+        dimensions = {}
+        for colonne, table in DIMENSIONS_PERSONNEL:
+            libelles = sorted({pers[colonne] for pers in personnel if pers[colonne]})
+            cursor.executemany(f"INSERT OR IGNORE INTO {table} (libelle) VALUES (?)",
+                               [(libelle,) for libelle in libelles])
+            cursor.execute(f"SELECT libelle, id FROM {table}")
+            dimensions[colonne] = dict(cursor.fetchall())
+            print(f"   ✓ {len(dimensions[colonne])} valeurs dans {table}")
+        self.conn.commit()
+        return dimensions
+    
+    def insert_personnel(self, personnel, resolveur, dimensions):
         """Insertion du personnel"""
         print(f"\n👥 INSERTION DU PERSONNEL")
         print("-" * 35)
         
         personnel_list = []
         personnel_non_trouve = 0
+        personnel_a_verifier = 0
+        liens = {}
+        duree_resolution = 0.0
         
         for pers in personnel:
-            etablissement_id = etablissements_ids.get(pers['etablissement'])
-            if not etablissement_id and pers['etablissement']:
-                personnel_non_trouve += 1
+            etablissement_id = None
+            if pers['etablissement'] and pers['etablissement'] != 'nan':
+                cle = (pers['etablissement'], pers['commune'])
+                if cle not in liens:
+                    debut = time.perf_counter()
+                    liens[cle] = list(resolveur.resoudre(*cle)) + [0]
+                    duree_resolution += time.perf_counter() - debut
+                liens[cle][3] += 1
+                etablissement_id, confiance = liens[cle][0], liens[cle][1]
+                
+                if not etablissement_id:
+                    personnel_non_trouve += 1
+                elif confiance < SEUIL_REVUE:
+                    personnel_a_verifier += 1
             
             personnel_list.append((
                 pers['matricule'],
                 pers['nom'],
                 pers['prenom'],
                 pers['genre'],
-                None,  # date_naissance
-                None,  # lieu_naissance
-                None,  # numero_cni
-                None,  # corps
+                pers['date_naissance'],
+                pers['lieu_naissance'],
+                pers['numero_cni'],
+                pers['corps'],
                 pers['grade'],
                 pers['fonction'],
                 pers['specialite'],
+                dimensions['corps'].get(pers['corps']),
+                dimensions['grade'].get(pers['grade']),
+                dimensions['fonction'].get(pers['fonction']),
+                dimensions['specialite'].get(pers['specialite']),
                 etablissement_id,
                 None,  # service
                 pers['contact'],
                 None,  # email
                 None,  # diplome_academique
                 None,  # diplome_professionnel
-                None,  # date_entree_enseignement
-                None,  # date_arrivee_poste
+                pers['date_entree_enseignement'],
+                pers['date_arrivee_poste'],
                 None,  # situation_matrimoniale
                 None   # nombre_enfants
             ))
@@ -233,17 +339,52 @@ class ETL_Simple:
         cursor.executemany("""
             INSERT INTO personnel (
                 matricule, nom, prenom, genre, date_naissance, lieu_naissance,
-                numero_cni, corps, grade, fonction, specialite, etablissement_id,
+                numero_cni, corps, grade, fonction, specialite,
+                corps_id, grade_id, fonction_id, specialite_id, etablissement_id,
                 service, contact, email, diplome_academique, diplome_professionnel,
                 date_entree_enseignement, date_arrivee_poste, situation_matrimoniale,
                 nombre_enfants
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """, personnel_list)
         self.conn.commit()
         
         print(f"   ✓ {len(personnel_list)} agents insérés")
+        print(f"   ✓ Clés phonétiques de {indexer_agents(self.conn)} agents calculées")
+        print(f"   ✓ {len(liens)} noms d'établissements résolus en {duree_resolution:.3f}s")
         if personnel_non_trouve > 0:
             print(f"   ⚠️ {personnel_non_trouve} agents sans établissement trouvé")
+        if personnel_a_verifier > 0:
+            print(f"   ⚠️ {personnel_a_verifier} agents rattachés avec une confiance faible")
+        if personnel_non_trouve > 0 or personnel_a_verifier > 0:
+            # Noms non résolus et liens de confiance faible
+            rapport = os.path.join(os.path.dirname(self.db_path), RAPPORT_RESOLUTION)
+            nb_lignes = resolveur.ecrire_rapport(liens, rapport)
+            print(f"   ⚠️ {nb_lignes} noms à vérifier dans {rapport}")
+    
+    def detecter_doublons(self):
+        """Détection des agents en double par clés de blocage"""
+        print(f"\n🔎 DÉTECTION DES DOUBLONS")
+        print("-" * 35)
+        
+        debut = time.perf_counter()
+        nb_agents, paires, blocs_ignores = detecter_doublons(self.conn)
+        
+        print(f"   ✓ {nb_agents} agents analysés en {time.perf_counter() - debut:.3f}s")
+        print(f"   ✓ {len(paires)} doublons potentiels enregistrés")
+        if blocs_ignores > 0:
+            print(f"   ⚠️ {blocs_ignores} blocs trop génériques ignorés")
+    
+    def evaluer_qualite(self):
+        """Score de qualité et anomalies par ligne (lots évalués en parallèle)"""
+        print(f"\n🧪 ÉVALUATION DE LA QUALITÉ")
+        print("-" * 35)
+        
+        debut = time.perf_counter()
+        stats = evaluer_qualite(self.conn)
+        
+        for table, nombre in stats.items():
+            print(f"   ✓ {nombre} lignes évaluées dans {table}")
+        print(f"   ✓ Qualité évaluée en {time.perf_counter() - debut:.3f}s")
     
     def print_final_stats(self):
         """Affichage des statistiques finales"""
@@ -295,8 +436,14 @@ class ETL_Simple:
         
         # Insertion en base
         communes_ids = self.insert_communes(communes_set)
-        etablissements_ids = self.insert_etablissements(etablissements, communes_ids)
-        self.insert_personnel(personnel, etablissements_ids)
+        self.insert_etablissements(etablissements, communes_ids)
+        self.insert_personnel(personnel, self.construire_resolveur(), self.insert_dimensions(personnel))
+        self.detecter_doublons()
+        self.evaluer_qualite()
+        
+        # Statistiques de l'optimiseur pour les index composites
+        self.conn.execute("ANALYZE")
+        self.conn.commit()
         
         # Statistiques finales
         self.print_final_stats()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Migrations versionnées du schéma SQLite
+Les fichiers migrations/NNN_description.sql sont appliqués dans l'ordre ;
+la version atteinte est conservée dans PRAGMA user_version, ce qui permet
+de mettre à jour une base existante sans relancer l'ETL
+"""
+
+import os
+import re
+import sqlite3
+import sys
+
+DOSSIER_MIGRATIONS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
+_NOM_MIGRATION = re.compile(r'^(\d{3})_(\w+)\.sql$')
+
+
+def lister_migrations():
+    """[(version, nom, chemin)] triées par version"""
+    migrations = []
+    for nom in os.listdir(DOSSIER_MIGRATIONS):
+        correspondance = _NOM_MIGRATION.match(nom)
+        if correspondance:
+            migrations.append((int(correspondance.group(1)), correspondance.group(2),
+                               os.path.join(DOSSIER_MIGRATIONS, nom)))
+    return sorted(migrations)
+
+
+def version_schema(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def appliquer_migrations(conn):
+    """Applique les migrations plus récentes que la base ; renvoie les noms appliqués"""
+    appliquees = []
+    for version, nom, chemin in lister_migrations():
+        if version <= version_schema(conn):
+            continue
+        with open(chemin, 'r', encoding='utf-8') as f:
+            script = f.read()
+        # executescript valide la transaction en cours : la migration et sa
+        # version sont écrites ensemble dans une transaction explicite
+        try:
+            conn.executescript(f"BEGIN;\n{script}\nPRAGMA user_version = {version};\nCOMMIT;")
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        appliquees.append(f"{version:03d}_{nom}")
+    return appliquees
+
+
+if __name__ == '__main__':
+    chemin = sys.argv[1] if len(sys.argv) > 1 else 'ief_louga.db'
+    conn = sqlite3.connect(chemin)
+    try:
+        from phonetique import indexer_agents
+        avant = version_schema(conn)
+        appliquees = appliquer_migrations(conn)
+        for nom in appliquees:
+            print(f"✓ Migration {nom} appliquée")
+        print(f"✓ Clés phonétiques de {indexer_agents(conn)} agents calculées")
+        print(f"✓ Schéma en version {version_schema(conn)} (était {avant})")
+    finally:
+        conn.close()
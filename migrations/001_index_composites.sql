@@ -0,0 +1,24 @@
+-- Index composites pour les filtres et tris des listes paginées
+-- (personnel.index, api.api_personnel, etablissements.index, api.api_etablissements)
+-- Chaque filtre d'égalité est suivi des colonnes de tri : la page est lue
+-- dans l'ordre de l'index, sans B-tree temporaire, et les COUNT(*) filtrés
+-- sont couverts par l'index
+
+-- Personnel : tri par nom, prénom
+CREATE INDEX IF NOT EXISTS idx_personnel_nom_prenom ON personnel(nom, prenom);
+CREATE INDEX IF NOT EXISTS idx_personnel_corps_nom ON personnel(corps, nom, prenom);
+CREATE INDEX IF NOT EXISTS idx_personnel_corps_grade_nom ON personnel(corps, grade, nom, prenom);
+CREATE INDEX IF NOT EXISTS idx_personnel_grade_nom ON personnel(grade, nom, prenom);
+CREATE INDEX IF NOT EXISTS idx_personnel_fonction_nom ON personnel(fonction, nom, prenom);
+CREATE INDEX IF NOT EXISTS idx_personnel_genre_nom ON personnel(genre, nom, prenom);
+CREATE INDEX IF NOT EXISTS idx_personnel_etablissement_nom ON personnel(etablissement_id, nom, prenom);
+
+-- Établissements : tri par nom
+CREATE INDEX IF NOT EXISTS idx_etablissements_nom ON etablissements(nom);
+CREATE INDEX IF NOT EXISTS idx_etablissements_type_nom ON etablissements(type_etablissement, nom);
+CREATE INDEX IF NOT EXISTS idx_etablissements_commune_nom ON etablissements(commune_id, nom);
+
+-- Index devenus préfixes des précédents
+DROP INDEX IF EXISTS idx_personnel_etablissement;
+DROP INDEX IF EXISTS idx_etablissements_type;
+DROP INDEX IF EXISTS idx_etablissements_commune;
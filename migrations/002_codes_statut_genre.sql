@@ -0,0 +1,31 @@
+-- Codes entiers canoniques pour le statut des établissements et le genre du
+-- personnel : les comptages par statut/genre deviennent des recherches dans
+-- un index au lieu de parcours complets avec LIKE '%...%'
+--
+-- statut_code : 1 public, 2 privé, 3 communautaire, 0 autre
+-- genre_code  : 1 homme (M ou H), 2 femme (F), 0 non renseigné
+--
+-- ALTER TABLE ne peut ajouter que des colonnes générées VIRTUAL : la valeur
+-- est matérialisée dans l'index, calculée à l'insertion par l'ETL comme lors
+-- des modifications. instr(lower(...)) plutôt que LIKE, dont le résultat
+-- dépend de PRAGMA case_sensitive_like
+
+ALTER TABLE etablissements ADD COLUMN statut_code INTEGER GENERATED ALWAYS AS (
+    CASE
+        WHEN instr(lower(statut), 'public') > 0 THEN 1
+        WHEN instr(lower(statut), 'privé') > 0 THEN 2
+        WHEN instr(lower(statut), 'com_ass') > 0 OR instr(lower(statut), 'communautaire') > 0 THEN 3
+        ELSE 0
+    END
+) VIRTUAL;
+
+ALTER TABLE personnel ADD COLUMN genre_code INTEGER GENERATED ALWAYS AS (
+    CASE
+        WHEN genre IN ('M', 'H') THEN 1
+        WHEN genre = 'F' THEN 2
+        ELSE 0
+    END
+) VIRTUAL;
+
+CREATE INDEX IF NOT EXISTS idx_etablissements_statut_code ON etablissements(statut_code);
+CREATE INDEX IF NOT EXISTS idx_personnel_genre_code ON personnel(genre_code);
@@ -0,0 +1,89 @@
+-- Tables de dimension pour le corps, le grade, la fonction et la spécialité
+-- du personnel : chaque libellé distinct est stocké une fois et référencé par
+-- une clé entière. Les listes de filtres sont lues dans ces petites tables et
+-- les regroupements se font sur des entiers au lieu de chaînes répétées.
+--
+-- Les colonnes texte de personnel restent la valeur de référence (formulaires,
+-- exports, filtres existants) ; les clés *_id sont renseignées par l'ETL et
+-- maintenues par les triggers ci-dessous lors des modifications
+
+CREATE TABLE IF NOT EXISTS dim_corps (
+    id INTEGER PRIMARY KEY,
+    libelle VARCHAR(50) NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS dim_grades (
+    id INTEGER PRIMARY KEY,
+    libelle VARCHAR(50) NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS dim_fonctions (
+    id INTEGER PRIMARY KEY,
+    libelle VARCHAR(100) NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS dim_specialites (
+    id INTEGER PRIMARY KEY,
+    libelle VARCHAR(100) NOT NULL UNIQUE
+);
+
+ALTER TABLE personnel ADD COLUMN corps_id INTEGER REFERENCES dim_corps(id);
+ALTER TABLE personnel ADD COLUMN grade_id INTEGER REFERENCES dim_grades(id);
+ALTER TABLE personnel ADD COLUMN fonction_id INTEGER REFERENCES dim_fonctions(id);
+ALTER TABLE personnel ADD COLUMN specialite_id INTEGER REFERENCES dim_specialites(id);
+
+-- Reprise des bases existantes
+INSERT OR IGNORE INTO dim_corps (libelle)
+SELECT corps FROM personnel WHERE corps != '' GROUP BY corps;
+INSERT OR IGNORE INTO dim_grades (libelle)
+SELECT grade FROM personnel WHERE grade != '' GROUP BY grade;
+INSERT OR IGNORE INTO dim_fonctions (libelle)
+SELECT fonction FROM personnel WHERE fonction != '' GROUP BY fonction;
+INSERT OR IGNORE INTO dim_specialites (libelle)
+SELECT specialite FROM personnel WHERE specialite != '' GROUP BY specialite;
+
+UPDATE personnel SET
+    corps_id = (SELECT id FROM dim_corps WHERE libelle = personnel.corps),
+    grade_id = (SELECT id FROM dim_grades WHERE libelle = personnel.grade),
+    fonction_id = (SELECT id FROM dim_fonctions WHERE libelle = personnel.fonction),
+    specialite_id = (SELECT id FROM dim_specialites WHERE libelle = personnel.specialite);
+
+CREATE INDEX IF NOT EXISTS idx_personnel_corps_id ON personnel(corps_id);
+CREATE INDEX IF NOT EXISTS idx_personnel_grade_id ON personnel(grade_id);
+CREATE INDEX IF NOT EXISTS idx_personnel_fonction_id ON personnel(fonction_id);
+CREATE INDEX IF NOT EXISTS idx_personnel_specialite_id ON personnel(specialite_id);
+
+-- Maintien des clés : l'ETL fournit déjà les clés, le trigger d'insertion ne
+-- s'exécute que pour les agents créés depuis l'application
+CREATE TRIGGER IF NOT EXISTS trg_personnel_dimensions_insert AFTER INSERT ON personnel
+WHEN (NEW.corps != '' AND NEW.corps_id IS NULL)
+  OR (NEW.grade != '' AND NEW.grade_id IS NULL)
+  OR (NEW.fonction != '' AND NEW.fonction_id IS NULL)
+  OR (NEW.specialite != '' AND NEW.specialite_id IS NULL)
+BEGIN
+    INSERT OR IGNORE INTO dim_corps (libelle) SELECT NEW.corps WHERE NEW.corps != '';
+    INSERT OR IGNORE INTO dim_grades (libelle) SELECT NEW.grade WHERE NEW.grade != '';
+    INSERT OR IGNORE INTO dim_fonctions (libelle) SELECT NEW.fonction WHERE NEW.fonction != '';
+    INSERT OR IGNORE INTO dim_specialites (libelle) SELECT NEW.specialite WHERE NEW.specialite != '';
+    UPDATE personnel SET
+        corps_id = (SELECT id FROM dim_corps WHERE libelle = NEW.corps),
+        grade_id = (SELECT id FROM dim_grades WHERE libelle = NEW.grade),
+        fonction_id = (SELECT id FROM dim_fonctions WHERE libelle = NEW.fonction),
+        specialite_id = (SELECT id FROM dim_specialites WHERE libelle = NEW.specialite)
+    WHERE id = NEW.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_personnel_dimensions_update
+AFTER UPDATE OF corps, grade, fonction, specialite ON personnel
+BEGIN
+    INSERT OR IGNORE INTO dim_corps (libelle) SELECT NEW.corps WHERE NEW.corps != '';
+    INSERT OR IGNORE INTO dim_grades (libelle) SELECT NEW.grade WHERE NEW.grade != '';
+    INSERT OR IGNORE INTO dim_fonctions (libelle) SELECT NEW.fonction WHERE NEW.fonction != '';
+    INSERT OR IGNORE INTO dim_specialites (libelle) SELECT NEW.specialite WHERE NEW.specialite != '';
+    UPDATE personnel SET
+        corps_id = (SELECT id FROM dim_corps WHERE libelle = NEW.corps),
+        grade_id = (SELECT id FROM dim_grades WHERE libelle = NEW.grade),
+        fonction_id = (SELECT id FROM dim_fonctions WHERE libelle = NEW.fonction),
+        specialite_id = (SELECT id FROM dim_specialites WHERE libelle = NEW.specialite)
+    WHERE id = NEW.id;
+END;
@@ -0,0 +1,126 @@
+-- Table de lecture du personnel : chaque agent avec le nom et le type de son
+-- établissement, sa commune et son arrondissement. Les listes, fiches et
+-- exports lisent une seule table, filtrée et triée par ses propres index
+-- composites, au lieu de joindre personnel → etablissements → communes.
+--
+-- personnel reste la table de référence ; personnel_read en est une copie
+-- (même id) maintenue par les triggers ci-dessous, y compris lorsqu'un
+-- établissement ou une commune change de nom ou de rattachement
+
+CREATE VIEW IF NOT EXISTS vue_personnel_read AS
+SELECT
+    p.id, p.matricule, p.nom, p.prenom, p.genre, p.date_naissance, p.lieu_naissance,
+    p.numero_cni, p.corps, p.grade, p.fonction, p.specialite, p.etablissement_id,
+    p.service, p.contact, p.email, p.diplome_academique, p.diplome_professionnel,
+    p.date_entree_enseignement, p.date_arrivee_poste, p.situation_matrimoniale,
+    p.nombre_enfants, p.qualite_score, p.created_at, p.genre_code,
+    p.corps_id, p.grade_id, p.fonction_id, p.specialite_id,
+    e.nom AS etablissement_nom,
+    e.type_etablissement,
+    e.commune_id,
+    c.nom AS commune_nom,
+    c.arrondissement
+FROM personnel p
+LEFT JOIN etablissements e ON p.etablissement_id = e.id
+LEFT JOIN communes c ON e.commune_id = c.id;
+
+-- Mêmes colonnes, dans le même ordre, que vue_personnel_read
+CREATE TABLE IF NOT EXISTS personnel_read (
+    id INTEGER PRIMARY KEY,
+    matricule VARCHAR(50),
+    nom VARCHAR(100) NOT NULL,
+    prenom VARCHAR(100) NOT NULL,
+    genre VARCHAR(10),
+    date_naissance DATE,
+    lieu_naissance VARCHAR(200),
+    numero_cni VARCHAR(50),
+    corps VARCHAR(50),
+    grade VARCHAR(50),
+    fonction VARCHAR(100),
+    specialite VARCHAR(100),
+    etablissement_id INTEGER,
+    service VARCHAR(100),
+    contact VARCHAR(50),
+    email VARCHAR(200),
+    diplome_academique VARCHAR(100),
+    diplome_professionnel VARCHAR(100),
+    date_entree_enseignement DATE,
+    date_arrivee_poste DATE,
+    situation_matrimoniale VARCHAR(50),
+    nombre_enfants INTEGER,
+    qualite_score INTEGER,
+    created_at TIMESTAMP,
+    genre_code INTEGER,
+    corps_id INTEGER,
+    grade_id INTEGER,
+    fonction_id INTEGER,
+    specialite_id INTEGER,
+    etablissement_nom VARCHAR(200),
+    type_etablissement VARCHAR(50),
+    commune_id INTEGER,
+    commune_nom VARCHAR(100),
+    arrondissement VARCHAR(100)
+);
+
+-- Reprise des bases existantes
+INSERT OR REPLACE INTO personnel_read SELECT * FROM vue_personnel_read;
+
+-- Index des filtres et tris des listes (mêmes clés que 001, plus la commune)
+CREATE INDEX IF NOT EXISTS idx_personnel_read_nom ON personnel_read(nom, prenom);
+CREATE INDEX IF NOT EXISTS idx_personnel_read_corps_nom ON personnel_read(corps, nom, prenom);
+CREATE INDEX IF NOT EXISTS idx_personnel_read_corps_grade_nom ON personnel_read(corps, grade, nom, prenom);
+CREATE INDEX IF NOT EXISTS idx_personnel_read_grade_nom ON personnel_read(grade, nom, prenom);
+CREATE INDEX IF NOT EXISTS idx_personnel_read_fonction_nom ON personnel_read(fonction, nom, prenom);
+CREATE INDEX IF NOT EXISTS idx_personnel_read_genre_nom ON personnel_read(genre, nom, prenom);
+CREATE INDEX IF NOT EXISTS idx_personnel_read_etablissement_nom ON personnel_read(etablissement_id, nom, prenom);
+CREATE INDEX IF NOT EXISTS idx_personnel_read_commune_nom ON personnel_read(commune_id, nom, prenom);
+CREATE INDEX IF NOT EXISTS idx_personnel_read_matricule ON personnel_read(matricule);
+
+-- Maintien de la copie
+CREATE TRIGGER IF NOT EXISTS trg_personnel_read_insert AFTER INSERT ON personnel
+BEGIN
+    INSERT OR REPLACE INTO personnel_read SELECT * FROM vue_personnel_read WHERE id = NEW.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_personnel_read_update AFTER UPDATE ON personnel
+BEGIN
+    DELETE FROM personnel_read WHERE id = OLD.id AND OLD.id != NEW.id;
+    INSERT OR REPLACE INTO personnel_read SELECT * FROM vue_personnel_read WHERE id = NEW.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_personnel_read_delete AFTER DELETE ON personnel
+BEGIN
+    DELETE FROM personnel_read WHERE id = OLD.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_personnel_read_etablissements_insert AFTER INSERT ON etablissements
+BEGIN
+    INSERT OR REPLACE INTO personnel_read
+    SELECT * FROM vue_personnel_read WHERE etablissement_id = NEW.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_personnel_read_etablissements_update
+AFTER UPDATE OF id, nom, type_etablissement, commune_id ON etablissements
+BEGIN
+    INSERT OR REPLACE INTO personnel_read
+    SELECT * FROM vue_personnel_read WHERE etablissement_id IN (OLD.id, NEW.id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_personnel_read_etablissements_delete AFTER DELETE ON etablissements
+BEGIN
+    INSERT OR REPLACE INTO personnel_read
+    SELECT * FROM vue_personnel_read WHERE etablissement_id = OLD.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_personnel_read_communes
+AFTER UPDATE OF id, nom, arrondissement ON communes
+BEGIN
+    INSERT OR REPLACE INTO personnel_read
+    SELECT * FROM vue_personnel_read WHERE commune_id IN (OLD.id, NEW.id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_personnel_read_communes_delete AFTER DELETE ON communes
+BEGIN
+    INSERT OR REPLACE INTO personnel_read
+    SELECT * FROM vue_personnel_read WHERE commune_id = OLD.id;
+END;
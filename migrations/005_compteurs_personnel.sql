@@ -0,0 +1,107 @@
+-- Compteurs stockés : effectif (total, hommes, femmes) de chaque
+-- établissement, nombre d'établissements et effectif de chaque commune.
+-- Les listes et rapports lisent ces colonnes au lieu de compter le personnel
+-- par sous-requête corrélée ou par LEFT JOIN ... GROUP BY.
+--
+-- Les compteurs sont tenus exacts par les triggers ci-dessous à chaque
+-- ajout, suppression ou réaffectation d'agent ou d'établissement ; les
+-- identifiants des établissements et des communes ne sont jamais modifiés
+
+ALTER TABLE etablissements ADD COLUMN nombre_personnel INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE etablissements ADD COLUMN nombre_hommes INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE etablissements ADD COLUMN nombre_femmes INTEGER NOT NULL DEFAULT 0;
+
+ALTER TABLE communes ADD COLUMN nombre_etablissements INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE communes ADD COLUMN nombre_personnel INTEGER NOT NULL DEFAULT 0;
+
+-- Reprise des bases existantes
+UPDATE etablissements SET
+    nombre_personnel = (SELECT COUNT(*) FROM personnel WHERE etablissement_id = etablissements.id),
+    nombre_hommes = (SELECT COUNT(*) FROM personnel WHERE etablissement_id = etablissements.id AND genre_code = 1),
+    nombre_femmes = (SELECT COUNT(*) FROM personnel WHERE etablissement_id = etablissements.id AND genre_code = 2);
+
+UPDATE communes SET
+    nombre_etablissements = (SELECT COUNT(*) FROM etablissements WHERE commune_id = communes.id),
+    nombre_personnel = (SELECT COALESCE(SUM(nombre_personnel), 0) FROM etablissements WHERE commune_id = communes.id);
+
+-- Agents
+CREATE TRIGGER IF NOT EXISTS trg_compteurs_personnel_insert AFTER INSERT ON personnel
+WHEN NEW.etablissement_id IS NOT NULL
+BEGIN
+    UPDATE etablissements SET
+        nombre_personnel = nombre_personnel + 1,
+        nombre_hommes = nombre_hommes + (NEW.genre_code = 1),
+        nombre_femmes = nombre_femmes + (NEW.genre_code = 2)
+    WHERE id = NEW.etablissement_id;
+    UPDATE communes SET nombre_personnel = nombre_personnel + 1
+    WHERE id = (SELECT commune_id FROM etablissements WHERE id = NEW.etablissement_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_compteurs_personnel_delete AFTER DELETE ON personnel
+WHEN OLD.etablissement_id IS NOT NULL
+BEGIN
+    UPDATE etablissements SET
+        nombre_personnel = nombre_personnel - 1,
+        nombre_hommes = nombre_hommes - (OLD.genre_code = 1),
+        nombre_femmes = nombre_femmes - (OLD.genre_code = 2)
+    WHERE id = OLD.etablissement_id;
+    UPDATE communes SET nombre_personnel = nombre_personnel - 1
+    WHERE id = (SELECT commune_id FROM etablissements WHERE id = OLD.etablissement_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_compteurs_personnel_update AFTER UPDATE OF etablissement_id, genre ON personnel
+WHEN OLD.etablissement_id IS NOT NEW.etablissement_id OR OLD.genre_code IS NOT NEW.genre_code
+BEGIN
+    UPDATE etablissements SET
+        nombre_personnel = nombre_personnel - 1,
+        nombre_hommes = nombre_hommes - (OLD.genre_code = 1),
+        nombre_femmes = nombre_femmes - (OLD.genre_code = 2)
+    WHERE id = OLD.etablissement_id;
+    UPDATE communes SET nombre_personnel = nombre_personnel - 1
+    WHERE id = (SELECT commune_id FROM etablissements WHERE id = OLD.etablissement_id);
+    UPDATE etablissements SET
+        nombre_personnel = nombre_personnel + 1,
+        nombre_hommes = nombre_hommes + (NEW.genre_code = 1),
+        nombre_femmes = nombre_femmes + (NEW.genre_code = 2)
+    WHERE id = NEW.etablissement_id;
+    UPDATE communes SET nombre_personnel = nombre_personnel + 1
+    WHERE id = (SELECT commune_id FROM etablissements WHERE id = NEW.etablissement_id);
+END;
+
+-- Établissements : les agents déjà rattachés à l'identifiant sont comptés
+CREATE TRIGGER IF NOT EXISTS trg_compteurs_etablissements_insert AFTER INSERT ON etablissements
+BEGIN
+    UPDATE etablissements SET
+        nombre_personnel = (SELECT COUNT(*) FROM personnel WHERE etablissement_id = NEW.id),
+        nombre_hommes = (SELECT COUNT(*) FROM personnel WHERE etablissement_id = NEW.id AND genre_code = 1),
+        nombre_femmes = (SELECT COUNT(*) FROM personnel WHERE etablissement_id = NEW.id AND genre_code = 2)
+    WHERE id = NEW.id AND EXISTS (SELECT 1 FROM personnel WHERE etablissement_id = NEW.id);
+    UPDATE communes SET
+        nombre_etablissements = nombre_etablissements + 1,
+        nombre_personnel = nombre_personnel + (SELECT nombre_personnel FROM etablissements WHERE id = NEW.id)
+    WHERE id = NEW.commune_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_compteurs_etablissements_delete AFTER DELETE ON etablissements
+BEGIN
+    UPDATE communes SET
+        nombre_etablissements = nombre_etablissements - 1,
+        nombre_personnel = nombre_personnel - OLD.nombre_personnel
+    WHERE id = OLD.commune_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_compteurs_etablissements_commune AFTER UPDATE OF commune_id ON etablissements
+WHEN OLD.commune_id IS NOT NEW.commune_id
+BEGIN
+    UPDATE communes SET
+        nombre_etablissements = nombre_etablissements - 1,
+        nombre_personnel = nombre_personnel - NEW.nombre_personnel
+    WHERE id = OLD.commune_id;
+    UPDATE communes SET
+        nombre_etablissements = nombre_etablissements + 1,
+        nombre_personnel = nombre_personnel + NEW.nombre_personnel
+    WHERE id = NEW.commune_id;
+END;
+
+-- Classement des communes par nombre d'établissements (rapports)
+CREATE INDEX IF NOT EXISTS idx_communes_nombre_etablissements ON communes(nombre_etablissements);
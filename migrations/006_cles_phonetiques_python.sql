@@ -0,0 +1,14 @@
+-- Les clés phonétiques ne sont plus calculées par des triggers : ceux-ci
+-- appelaient la fonction Python cle_phonetique(), absente des connexions qui
+-- ne l'enregistrent pas (client sqlite3, application), où tout ajout d'agent
+-- ou modification de nom échouait. phonetique.indexer_agents() les recalcule
+-- après l'ETL ou une migration ; un agent sans clé reste trouvé par la
+-- recherche partielle sur le nom.
+--
+-- Les clés existantes sont retirées : leur format (sans voyelles pour les
+-- noms courts) a changé
+
+DROP TRIGGER IF EXISTS trg_personnel_phonetique_insert;
+DROP TRIGGER IF EXISTS trg_personnel_phonetique_update;
+
+DELETE FROM personnel_phonetique;
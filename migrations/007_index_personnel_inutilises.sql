@@ -0,0 +1,8 @@
+-- Les listes du personnel lisent personnel_read (004) : les index de tri de
+-- 001 qui n'y ont pas d'autre usage sont retirés de personnel. Restent ceux
+-- des lectures directes de personnel (agents d'un établissement, personnel
+-- IEF par fonction, répartitions par corps et grade, par genre)
+
+DROP INDEX IF EXISTS idx_personnel_nom_prenom;
+DROP INDEX IF EXISTS idx_personnel_corps_nom;
+DROP INDEX IF EXISTS idx_personnel_grade_nom;
@@ -0,0 +1,22 @@
+-- La copie complète d'un agent dans personnel_read (004) n'est refaite que
+-- lorsqu'une colonne recopiée change : les mises à jour de qualite_score
+-- (qualite.py, une par agent) ne modifient que cette colonne de la copie.
+-- genre_code, colonne générée, suit genre ; created_at n'est jamais modifié
+
+DROP TRIGGER IF EXISTS trg_personnel_read_update;
+
+CREATE TRIGGER IF NOT EXISTS trg_personnel_read_update
+AFTER UPDATE OF id, matricule, nom, prenom, genre, date_naissance, lieu_naissance,
+    numero_cni, corps, grade, fonction, specialite, etablissement_id, service, contact,
+    email, diplome_academique, diplome_professionnel, date_entree_enseignement,
+    date_arrivee_poste, situation_matrimoniale, nombre_enfants,
+    corps_id, grade_id, fonction_id, specialite_id ON personnel
+BEGIN
+    DELETE FROM personnel_read WHERE id = OLD.id AND OLD.id != NEW.id;
+    INSERT OR REPLACE INTO personnel_read SELECT * FROM vue_personnel_read WHERE id = NEW.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_personnel_read_qualite AFTER UPDATE OF qualite_score ON personnel
+BEGIN
+    UPDATE personnel_read SET qualite_score = NEW.qualite_score WHERE id = NEW.id;
+END;
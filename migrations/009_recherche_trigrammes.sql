@@ -0,0 +1,35 @@
+-- Recherche partielle des agents par index : table FTS5 à tokenizer trigram
+-- (SQLite 3.34+) sur le nom, le prénom et le matricule. Une phrase MATCH
+-- '"dio"' y trouve les lignes dont une colonne contient 'dio', comme
+-- LIKE '%dio%', par lecture de l'index au lieu d'un parcours de personnel ;
+-- les recherches de moins de trois caractères restent des LIKE.
+--
+-- rowid = personnel.id ; tenue à jour par les triggers ci-dessous (SQL seul)
+
+CREATE VIRTUAL TABLE IF NOT EXISTS personnel_recherche USING fts5(
+    nom, prenom, matricule, tokenize = 'trigram'
+);
+
+-- Reprise des bases existantes
+DELETE FROM personnel_recherche;
+INSERT INTO personnel_recherche (rowid, nom, prenom, matricule)
+SELECT id, nom, prenom, matricule FROM personnel;
+
+CREATE TRIGGER IF NOT EXISTS trg_personnel_recherche_insert AFTER INSERT ON personnel
+BEGIN
+    INSERT INTO personnel_recherche (rowid, nom, prenom, matricule)
+    VALUES (NEW.id, NEW.nom, NEW.prenom, NEW.matricule);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_personnel_recherche_update
+AFTER UPDATE OF id, nom, prenom, matricule ON personnel
+BEGIN
+    DELETE FROM personnel_recherche WHERE rowid = OLD.id;
+    INSERT INTO personnel_recherche (rowid, nom, prenom, matricule)
+    VALUES (NEW.id, NEW.nom, NEW.prenom, NEW.matricule);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_personnel_recherche_delete AFTER DELETE ON personnel
+BEGIN
+    DELETE FROM personnel_recherche WHERE rowid = OLD.id;
+END;
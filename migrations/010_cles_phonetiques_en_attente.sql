@@ -0,0 +1,29 @@
+-- Clés phonétiques incrémentales : tout ajout d'agent ou changement de nom,
+-- quel que soit l'écrivain (ETL, application, client sqlite3), inscrit l'agent
+-- dans personnel_phonetique_en_attente par un trigger SQL seul.
+-- phonetique.indexer_agents() ne calcule que les clés des agents en attente ;
+-- l'application le fait avant une recherche dès que les données ont changé
+
+CREATE TABLE IF NOT EXISTS personnel_phonetique_en_attente (
+    id INTEGER PRIMARY KEY
+);
+
+-- Reprise des bases existantes : agents sans clé (vidées par 006)
+INSERT OR IGNORE INTO personnel_phonetique_en_attente (id)
+SELECT id FROM personnel WHERE id NOT IN (SELECT rowid FROM personnel_phonetique);
+
+CREATE TRIGGER IF NOT EXISTS trg_personnel_phonetique_insert AFTER INSERT ON personnel
+BEGIN
+    INSERT OR IGNORE INTO personnel_phonetique_en_attente (id) VALUES (NEW.id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_personnel_phonetique_update AFTER UPDATE OF id, nom, prenom ON personnel
+BEGIN
+    DELETE FROM personnel_phonetique WHERE rowid = OLD.id AND OLD.id != NEW.id;
+    INSERT OR IGNORE INTO personnel_phonetique_en_attente (id) VALUES (NEW.id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_personnel_phonetique_en_attente_delete AFTER DELETE ON personnel
+BEGIN
+    DELETE FROM personnel_phonetique_en_attente WHERE id = OLD.id;
+END;
@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Normalisation des libellés (noms d'établissements, communes, agents)
+Sans dépendances externes (seulement unicodedata et re)
+"""
+
+import re
+import unicodedata
+
+_NON_ALPHANUM = re.compile(r"[^A-Z0-9]+")
+
+
+def normaliser_texte(valeur):
+    """Met un libellé en majuscules sans accents ni ponctuation ('Gandé' -> 'GANDE')"""
+    if not valeur:
+        return ''
+    decompose = unicodedata.normalize('NFKD', str(valeur))
+    sans_accents = ''.join(ch for ch in decompose if not unicodedata.combining(ch))
+    return _NON_ALPHANUM.sub(' ', sans_accents.upper()).strip()
+
+
+def trigrammes(valeur):
+    """Ensemble des trigrammes d'un texte déjà normalisé (avec bornes de mots)"""
+    if not valeur:
+        return set()
+    texte = f"  {valeur} "
+    return {texte[i:i + 3] for i in range(len(texte) - 2)}
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Clés phonétiques des noms et prénoms des agents
+Règles adaptées aux transcriptions françaises des noms wolof, peul et arabes :
+deux graphies qui se prononcent de la même façon partagent la même clé
+(Diop/Dioup/Djop, Niang/Gnang, Ndiaye/Ndiay/Ndjaye, Mouhamed/Mohamed/Muhammad)
+Les mots courts (deux consonnes au plus) gardent leurs voyelles, sans quoi
+Sow, Sy et Seye ou Diop, Dia et Dieye partageraient une même clé
+Les clés sont calculées en Python (indexer_agents) pour les seuls agents
+inscrits en attente par les triggers d'ajout et de changement de nom :
+aucune fonction SQL n'est requise pour modifier la table personnel
+"""
+
+import re
+import sqlite3
+import sys
+
+from normalisation import normaliser_texte
+
+# Réécritures appliquées dans l'ordre sur le mot normalisé
+REGLES = [
+    (r'PH', 'F'),
+    (r'TCH', 'C'),
+    (r'TH', 'T'),              # Thiam / Tiam
+    (r'KH', 'K'),              # Khady / Kady, x wolof
+    (r'X', 'K'),
+    (r'QU', 'K'),
+    (r'CK', 'K'),
+    (r'C(?=[EIY])', 'S'),
+    (r'C', 'K'),
+    (r'Q', 'K'),
+    (r'DJ', 'J'),              # Djop / Jop
+    (r'DI(?=[AEOU])', 'J'),    # Diop / Jop, Ndiaye / Njaye
+    (r'GN', 'N'),              # Gnang / Nang
+    (r'NI(?=[AEOU])', 'N'),    # Niang / Nang
+    (r'OU', 'U'),              # Dioup / Diup, Mouhamed / Muhamed
+    (r'EU', 'E'),
+    (r'W', 'U'),
+    (r'Y', 'I'),
+    (r'Z', 'S'),
+]
+
+_REGLES = [(re.compile(motif), remplacement) for motif, remplacement in REGLES]
+# H muet sauf entre deux voyelles (Mohamed garde son H, Hawa le perd)
+_H_MUET = re.compile(r'(?<![AEIOU])H|H(?![AEIOU])')
+_VOYELLES = re.compile(r'(?<=.)[AEIOU]+')
+_CONSONNES = re.compile(r'[^AEIOU]')
+_E_FINAL = re.compile(r'(?<=.)E$')
+_DOUBLES = re.compile(r'(.)\1+')
+
+# Au plus ce nombre de consonnes, le mot garde ses voyelles
+CONSONNES_MOT_COURT = 2
+
+# Longueur minimale d'une recherche servie par l'index trigram (personnel_recherche)
+LONGUEUR_TRIGRAMMES = 3
+
+
+def cle_mot(mot):
+    """Clé phonétique d'un mot déjà normalisé"""
+    for motif, remplacement in _REGLES:
+        mot = motif.sub(remplacement, mot)
+    mot = _H_MUET.sub('', mot)
+    # Doublons fusionnés avant la chute des voyelles : Niang (NNG) reste distinct de Ngouye (NG)
+    mot = _DOUBLES.sub(r'\1', mot)
+    if len(_CONSONNES.findall(mot)) <= CONSONNES_MOT_COURT:
+        # E final muet (Ndiaye / Ndiay), O et OU confondus (Diop / Dioup)
+        return _DOUBLES.sub(r'\1', _E_FINAL.sub('', mot).replace('O', 'U'))
+    return _VOYELLES.sub('', mot)
+
+
+def cle_phonetique(valeur):
+    """Clé phonétique d'un nom complet ('Mouhamed Diop' -> 'MHMD JUP')"""
+    return ' '.join(cle_mot(mot) for mot in normaliser_texte(valeur).split() if mot)
+
+
+def requete_phonetique(recherche):
+    """Expression MATCH FTS5 exigeant la clé de chaque mot recherché"""
+    cles = cle_phonetique(recherche).split()
+    return ' AND '.join(f'"{cle}"' for cle in cles)
+
+
+def condition_recherche_agent(recherche, alias='p'):
+    """Condition SQL et paramètres pour chercher un agent par nom ou matricule
+
+    Recherche partielle sur le nom, le prénom et le matricule, complétée par
+    les variantes d'orthographe (même clé phonétique pour chaque mot). Dès
+    LONGUEUR_TRIGRAMMES caractères, les deux index FTS fournissent la liste
+    des identifiants : les agents sont lus par clé primaire, sans parcours
+    """
+    # Un matricule n'a pas de variantes d'orthographe
+    expression = '' if any(ch.isdigit() for ch in recherche) else requete_phonetique(recherche)
+    phonetique = "SELECT rowid FROM personnel_phonetique WHERE personnel_phonetique MATCH ?"
+
+    if len(recherche) < LONGUEUR_TRIGRAMMES:
+        motif = f'%{recherche}%'
+        condition = f"{alias}.nom LIKE ? OR {alias}.prenom LIKE ? OR {alias}.matricule LIKE ?"
+        if not expression:
+            return f"({condition})", [motif, motif, motif]
+        return f"({condition} OR {alias}.id IN ({phonetique}))", [motif, motif, motif, expression]
+
+    partielle = "SELECT rowid FROM personnel_recherche WHERE personnel_recherche MATCH ?"
+    phrase = '"' + recherche.replace('"', '""') + '"'
+    if not expression:
+        return f"{alias}.id IN ({partielle})", [phrase]
+    return f"{alias}.id IN ({partielle} UNION {phonetique})", [phrase, expression]
+
+
+def indexer_agents(conn, ids=None):
+    """Calcule les clés phonétiques des agents en attente (et des ids donnés) ; retourne leur nombre
+
+    Un agent pas encore indexé reste trouvé par la recherche partielle
+    """
+    if ids is not None:
+        conn.executemany("INSERT OR IGNORE INTO personnel_phonetique_en_attente (id) VALUES (?)",
+                         ((agent_id,) for agent_id in ids))
+    elif not conn.execute("SELECT EXISTS (SELECT 1 FROM personnel_phonetique_en_attente)").fetchone()[0]:
+        return 0
+
+    # Première écriture : la file est verrouillée jusqu'au commit
+    conn.execute("DELETE FROM personnel_phonetique "
+                 "WHERE rowid IN (SELECT id FROM personnel_phonetique_en_attente)")
+    agents = conn.execute("""
+        SELECT p.id, p.nom, p.prenom
+        FROM personnel_phonetique_en_attente a
+        JOIN personnel p ON p.id = a.id
+    """).fetchall()
+    conn.executemany(
+        "INSERT INTO personnel_phonetique (rowid, cles) VALUES (?, ?)",
+        ((agent_id, cle_phonetique(f"{nom or ''} {prenom or ''}")) for agent_id, nom, prenom in agents)
+    )
+    conn.execute("DELETE FROM personnel_phonetique_en_attente")
+    conn.commit()
+    return len(agents)
+
+
+if __name__ == '__main__':
+    conn = sqlite3.connect(sys.argv[1] if len(sys.argv) > 1 else 'ief_louga.db')
+    try:
+        print(f"✓ Clés phonétiques de {indexer_agents(conn)} agents calculées")
+    finally:
+        conn.close()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Moteur de règles de qualité des données (établissements et personnel)
+Chaque ligne reçoit un score sur 100 et la liste des règles qu'elle enfreint,
+enregistrées dans anomalies_qualite pour des comptages indexés
+"""
+
+import os
+import re
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+TAILLE_LOT = 5000
+
+# Emprise approximative de la région de Louga en UTM 28N (mètres)
+BORNES_X = (300000, 480000)
+BORNES_Y = (1660000, 1800000)
+
+ANNEE_MIN = 1900
+
+_TELEPHONE = re.compile(r'^(?:\+?221)?(?:7[05678]|3[03])\d{7}$')
+_EMAIL = re.compile(r'^[\w.+-]+@[\w-]+(?:\.[\w-]+)+$')
+_SEPARATEURS_TEL = re.compile(r'[\s.\-()]')
+
+
+def vide(valeur):
+    return valeur is None or str(valeur).strip() == ''
+
+
+def telephone_valide(valeur):
+    """Premier numéro d'un champ contact au format sénégalais (77 123 45 67)"""
+    premier = str(valeur).split('/')[0]
+    return bool(_TELEPHONE.match(_SEPARATEURS_TEL.sub('', premier)))
+
+
+def email_valide(valeur):
+    return bool(_EMAIL.match(str(valeur).strip()))
+
+
+def annee(valeur):
+    """Année d'une date 'AAAA' ou 'AAAA-MM-JJ' ; None si illisible"""
+    try:
+        return int(str(valeur)[:4])
+    except (TypeError, ValueError):
+        return None
+
+
+def nombre(valeur):
+    """Valeur numérique d'un champ texte ; None si vide ou illisible"""
+    try:
+        return float(str(valeur).replace(',', '.'))
+    except (TypeError, ValueError):
+        return None
+
+
+def dates_etablissement_incoherentes(ligne):
+    if ligne['dates_coherentes'] == 0:
+        return True
+    creation, ouverture = annee(ligne['date_creation']), annee(ligne['date_ouverture'])
+    annee_courante = date.today().year
+    for valeur in (creation, ouverture):
+        if valeur is not None and not ANNEE_MIN <= valeur <= annee_courante:
+            return True
+    return creation is not None and ouverture is not None and ouverture < creation
+
+
+def coordonnees_invalides(ligne):
+    """Coordonnée renseignée mais non numérique"""
+    return any(not vide(v) and nombre(v) is None for v in (ligne['coordonnees_x'], ligne['coordonnees_y']))
+
+
+def coordonnees_hors_zone(ligne):
+    """Hors de l'emprise de la région, sauf point validé dans le fichier source"""
+    x, y = nombre(ligne['coordonnees_x']), nombre(ligne['coordonnees_y'])
+    if x is None or y is None or ligne['coordonnees_validees'] == 1:
+        return False
+    return not (BORNES_X[0] <= x <= BORNES_X[1] and BORNES_Y[0] <= y <= BORNES_Y[1])
+
+
+def dates_personnel_incoherentes(ligne):
+    naissance = annee(ligne['date_naissance'])
+    entree = annee(ligne['date_entree_enseignement'])
+    arrivee = annee(ligne['date_arrivee_poste'])
+    if naissance is not None and not ANNEE_MIN <= naissance <= date.today().year - 16:
+        return True
+    if naissance is not None and entree is not None and entree - naissance < 16:
+        return True
+    return entree is not None and arrivee is not None and arrivee < entree
+
+
+# (code, poids, test renvoyant True si la règle est enfreinte)
+REGLES = {
+    'etablissements': [
+        ('directeur_manquant', 15, lambda l: vide(l['directeur'])),
+        ('directeur_non_valide', 5, lambda l: not vide(l['directeur']) and l['directeur_valide'] != 1),
+        ('contact_manquant', 15, lambda l: vide(l['contact_1'])),
+        ('contact_invalide', 10, lambda l: not vide(l['contact_1']) and not telephone_valide(l['contact_1'])),
+        ('email_manquant', 10, lambda l: vide(l['email_directeur'])),
+        ('email_invalide', 10, lambda l: not vide(l['email_directeur']) and not email_valide(l['email_directeur'])),
+        ('coordonnees_manquantes', 20, lambda l: vide(l['coordonnees_x']) or vide(l['coordonnees_y'])),
+        ('coordonnees_invalides', 20, coordonnees_invalides),
+        ('coordonnees_hors_zone', 20, coordonnees_hors_zone),
+        ('dates_manquantes', 10, lambda l: vide(l['date_creation']) and vide(l['date_ouverture'])),
+        ('dates_incoherentes', 10, dates_etablissement_incoherentes),
+    ],
+    'personnel': [
+        ('contact_manquant', 15, lambda l: vide(l['contact'])),
+        ('contact_invalide', 10, lambda l: not vide(l['contact']) and not telephone_valide(l['contact'])),
+        ('date_naissance_manquante', 15, lambda l: vide(l['date_naissance'])),
+        ('cni_manquante', 15, lambda l: vide(l['numero_cni'])),
+        ('cni_invalide', 10, lambda l: not vide(l['numero_cni'])
+            and len(re.sub(r'\D', '', l['numero_cni'])) not in (13, 14)),
+        ('etablissement_manquant', 20, lambda l: l['etablissement_id'] is None and vide(l['service'])),
+        ('dates_incoherentes', 15, dates_personnel_incoherentes),
+    ],
+}
+
+COLONNES = {
+    'etablissements': ['id', 'directeur', 'contact_1', 'email_directeur', 'coordonnees_x',
+                       'coordonnees_y', 'date_creation', 'date_ouverture', 'coordonnees_validees',
+                       'directeur_valide', 'dates_coherentes'],
+    'personnel': ['id', 'contact', 'date_naissance', 'numero_cni', 'etablissement_id', 'service',
+                  'date_entree_enseignement', 'date_arrivee_poste'],
+}
+
+
+def evaluer_lot(table, lignes):
+    """Évalue un lot de lignes ; retourne [(id, score, [règles enfreintes])]"""
+    regles = REGLES[table]
+    colonnes = COLONNES[table]
+    resultats = []
+    for valeurs in lignes:
+        ligne = dict(zip(colonnes, valeurs))
+        enfreintes = [code for code, _, test in regles if test(ligne)]
+        penalite = sum(poids for code, poids, _ in regles if code in enfreintes)
+        resultats.append((ligne['id'], max(0, 100 - penalite), enfreintes))
+    return resultats
+
+
+def _lots(cursor, taille):
+    while True:
+        lot = cursor.fetchmany(taille)
+        if not lot:
+            return
+        yield lot
+
+
+def evaluer_table(conn, table, workers=None, taille_lot=TAILLE_LOT):
+    """Recalcule qualite_score et les anomalies d'une table ; retourne le nombre de lignes"""
+    cursor = conn.execute(f"SELECT {', '.join(COLONNES[table])} FROM {table}")
+    lots = list(_lots(cursor, taille_lot))
+
+    if len(lots) > 1 and (workers is None or workers > 1):
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            resultats = pool.map(evaluer_lot, [table] * len(lots), lots)
+            resultats = [r for lot in resultats for r in lot]
+    else:
+        resultats = [r for lot in lots for r in evaluer_lot(table, lot)]
+
+    conn.execute("DELETE FROM anomalies_qualite WHERE table_source = ?", (table,))
+    conn.executemany(
+        "INSERT INTO anomalies_qualite (table_source, ligne_id, regle) VALUES (?, ?, ?)",
+        ((table, ligne_id, regle) for ligne_id, _, regles in resultats for regle in regles)
+    )
+    conn.executemany(
+        f"UPDATE {table} SET qualite_score = ? WHERE id = ?",
+        ((score, ligne_id) for ligne_id, score, _ in resultats)
+    )
+    conn.commit()
+    return len(resultats)
+
+
+def evaluer_qualite(conn, workers=None):
+    """Évalue toutes les tables ; retourne {table: nombre de lignes évaluées}"""
+    return {table: evaluer_table(conn, table, workers) for table in REGLES}
+
+
+if __name__ == '__main__':
+    conn = sqlite3.connect('ief_louga.db')
+    debut = time.perf_counter()
+    stats = evaluer_qualite(conn)
+    conn.close()
+    for table, nombre in stats.items():
+        print(f"✓ {nombre} lignes évaluées dans {table}")
+    print(f"✓ Qualité évaluée en {time.perf_counter() - debut:.2f}s")
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Résolution approximative des noms d'établissements du fichier personnel
+Index par mots et par trigrammes, avec blocage par commune
+"""
+
+import csv
+from collections import Counter, defaultdict
+
+from normalisation import normaliser_texte, trigrammes
+
+# Mots désignant le type d'établissement plutôt que son nom propre
+MOTS_TYPE = {
+    'EE', 'EM', 'EFA', 'CEM', 'CEMT', 'CTP', 'CPE', 'GC', 'LYCEE', 'ECOLE',
+    'DAARA', 'DARA', 'INSTITUT', 'CENTRE', 'COLLEGE', 'CFP', 'GSPFAMS'
+}
+
+# Mots vides ignorés dans la comparaison des noms propres
+MOTS_VIDES = {'DE', 'DU', 'DES', 'LA', 'LE', 'LES', 'D', 'L'}
+
+SEUIL_LIEN = 0.70      # en dessous : agent laissé sans établissement
+SEUIL_REVUE = 0.90     # en dessous : lien établi mais signalé pour vérification
+MARGE_AMBIGUITE = 0.05 # écart minimal entre les deux meilleurs candidats
+NB_CANDIDATS = 20
+
+# Recherche hors commune : les clés portées par plus de FREQUENCE_MAX des
+# établissements (trigrammes courants, 'EE ', 'OUL'...) ne génèrent pas de
+# candidats ; seuil relevé à POSTINGS_MIN pour les petites bases. Si toutes
+# les clés d'un nom sont courantes, seules ses CLES_RARES plus rares servent
+FREQUENCE_MAX = 0.02
+POSTINGS_MIN = 50
+CLES_RARES = 3
+
+
+def decomposer_nom(nom):
+    """Sépare un nom normalisé en (mots de type, nom propre)"""
+    mots = normaliser_texte(nom).split()
+    types = frozenset(m for m in mots if m in MOTS_TYPE)
+    propres = [m for m in mots if m not in MOTS_TYPE and m not in MOTS_VIDES]
+    return types, ' '.join(propres)
+
+
+def normaliser_commune(commune):
+    """Clé de blocage d'une commune ('COMMUNE DE LOUGA' -> 'LOUGA')"""
+    mots = [m for m in normaliser_texte(commune).split()
+            if m not in MOTS_VIDES and m != 'COMMUNE']
+    return ' '.join(mots)
+
+
+class ResolveurEtablissements:
+    """Index des établissements pour rattacher un nom approximatif à un identifiant"""
+
+    def __init__(self, etablissements):
+        """etablissements : itérable de (id, nom, commune)"""
+        self.noms = {}
+        self.types = {}
+        self.propres = {}
+        self.trigrammes = {}
+        self.exacts = defaultdict(list)
+        self.index_mots = defaultdict(set)
+        self.index_trigrammes = defaultdict(set)
+        self.blocs = defaultdict(set)
+        self._cache = {}
+
+        for etab_id, nom, commune in etablissements:
+            types, propre = decomposer_nom(nom)
+            self.noms[etab_id] = nom
+            self.types[etab_id] = types
+            self.propres[etab_id] = propre
+            self.trigrammes[etab_id] = trigrammes(propre)
+            self.exacts[normaliser_texte(nom)].append(etab_id)
+            self.blocs[normaliser_commune(commune)].add(etab_id)
+            for mot in propre.split():
+                self.index_mots[mot].add(etab_id)
+            for tri in self.trigrammes[etab_id]:
+                self.index_trigrammes[tri].add(etab_id)
+
+    def _score(self, etab_id, types, propre, tris):
+        """Similarité pondérée entre la requête et un établissement (0 à 1)"""
+        tris_cand = self.trigrammes[etab_id]
+        if not tris or not tris_cand:
+            return 0.0
+        dice = 2 * len(tris & tris_cand) / (len(tris) + len(tris_cand))
+
+        mots = set(propre.split())
+        mots_cand = set(self.propres[etab_id].split())
+        jaccard = len(mots & mots_cand) / len(mots | mots_cand) if mots | mots_cand else 0.0
+
+        if not types:
+            accord_type = 0.5
+        elif types == self.types[etab_id]:
+            accord_type = 1.0
+        elif types & self.types[etab_id]:
+            accord_type = 0.5
+        else:
+            accord_type = 0.0
+
+        score = 0.55 * dice + 0.30 * jaccard + 0.15 * accord_type
+
+        # 'EE LOUGA 1' et 'EE LOUGA 2' sont deux écoles distinctes
+        numeros = {m for m in mots if m.isdigit()}
+        numeros_cand = {m for m in mots_cand if m.isdigit()}
+        if numeros and numeros_cand and numeros != numeros_cand:
+            score *= 0.8
+        return score
+
+    def _postings(self, tris, mots, perimetre):
+        """[(ids, poids)] des clés du nom ; hors périmètre, sans les clés courantes"""
+        # Un mot entier partagé compte davantage qu'un trigramme isolé
+        postings = [(self.index_trigrammes[cle], 1) for cle in tris if cle in self.index_trigrammes]
+        postings += [(self.index_mots[cle], 3) for cle in mots if cle in self.index_mots]
+        if perimetre is not None:
+            return [(ids & perimetre, poids) for ids, poids in postings]
+
+        plafond = max(POSTINGS_MIN, FREQUENCE_MAX * len(self.noms))
+        rares = [(ids, poids) for ids, poids in postings if len(ids) <= plafond]
+        return rares or sorted(postings, key=lambda p: len(p[0]))[:CLES_RARES]
+
+    def _meilleurs(self, types, propre, perimetre):
+        """Classe les candidats partageant des trigrammes, dans un périmètre d'ids"""
+        tris = trigrammes(propre)
+        compteur = Counter()
+        for ids, poids in self._postings(tris, propre.split(), perimetre):
+            for etab_id in ids:
+                compteur[etab_id] += poids
+
+        scores = [
+            (self._score(etab_id, types, propre, tris), etab_id)
+            for etab_id, _ in compteur.most_common(NB_CANDIDATS)
+        ]
+        scores.sort(key=lambda s: (-s[0], s[1]))
+        return scores
+
+    def resoudre(self, nom, commune=None):
+        """Retourne (etablissement_id, confiance, methode) ; id à None si aucun lien sûr"""
+        cle = (nom, commune)
+        if cle in self._cache:
+            return self._cache[cle]
+
+        resultat = self._resoudre(nom, commune)
+        self._cache[cle] = resultat
+        return resultat
+
+    def _resoudre(self, nom, commune):
+        if not nom or not normaliser_texte(nom):
+            return None, 0.0, 'vide'
+
+        bloc = self.blocs.get(normaliser_commune(commune)) if commune else None
+
+        exacts = self.exacts.get(normaliser_texte(nom), [])
+        if bloc:
+            exacts_bloc = [e for e in exacts if e in bloc]
+            exacts = exacts_bloc or exacts
+        if len(exacts) == 1:
+            return exacts[0], 1.0, 'exact'
+
+        types, propre = decomposer_nom(nom)
+        if not propre:
+            return None, 0.0, 'vide'
+
+        methode = 'commune'
+        scores = self._meilleurs(types, propre, bloc) if bloc else []
+        if not scores or scores[0][0] < SEUIL_LIEN:
+            scores = self._meilleurs(types, propre, None)
+            methode = 'global'
+        if not scores:
+            return None, 0.0, 'aucun'
+
+        meilleur, etab_id = scores[0]
+        second = scores[1][0] if len(scores) > 1 else 0.0
+        confiance = meilleur
+        if meilleur - second < MARGE_AMBIGUITE:
+            confiance *= 0.75
+            methode += '_ambigu'
+        if methode.startswith('global') and bloc:
+            confiance *= 0.95
+
+        confiance = round(confiance, 3)
+        if confiance < SEUIL_LIEN:
+            return None, confiance, methode
+        return etab_id, confiance, methode
+
+    def ecrire_rapport(self, liens, chemin):
+        """Écrit les liens à vérifier (confiance < SEUIL_REVUE) dans un CSV"""
+        lignes = []
+        for (nom, commune), (etab_id, confiance, methode, nb_agents) in liens.items():
+            if confiance >= SEUIL_REVUE:
+                continue
+            lignes.append([
+                nom, commune, nb_agents, etab_id or '',
+                self.noms.get(etab_id, ''), confiance, methode
+            ])
+        lignes.sort(key=lambda l: (l[5], l[0]))
+
+        with open(chemin, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f, delimiter=';')
+            writer.writerow(['etablissement_source', 'commune_source', 'nombre_agents',
+                             'etablissement_id', 'etablissement_retenu', 'confiance', 'methode'])
+            writer.writerows(lignes)
+        return len(lignes)
@@ -32,6 +32,11 @@ CREATE TABLE IF NOT EXISTS etablissements (
     date_creation DATE,
     date_ouverture DATE,
     observations TEXT,
+    coordonnees_validees INTEGER DEFAULT 0, -- indicateurs qualité du fichier source
+    directeur_valide INTEGER DEFAULT 0,
+    dates_coherentes INTEGER DEFAULT 1,
+    notes_qualite TEXT,
+    qualite_score INTEGER, -- 0 à 100, calculé par qualite.py
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (commune_id) REFERENCES communes(id)
 );
@@ -60,6 +65,7 @@ CREATE TABLE IF NOT EXISTS personnel (
     date_arrivee_poste DATE,
     situation_matrimoniale VARCHAR(50),
     nombre_enfants INTEGER,
+    qualite_score INTEGER, -- 0 à 100, calculé par qualite.py
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (etablissement_id) REFERENCES etablissements(id)
 );
@@ -79,12 +85,108 @@ CREATE TABLE IF NOT EXISTS affectations (
     FOREIGN KEY (etablissement_id) REFERENCES etablissements(id)
 );
 
+-- Génération des données : incrémentée à chaque modification des tables
+-- principales, elle invalide les caches en mémoire de l'application.
+-- Valeur initiale horodatée pour qu'une base reconstruite ne reprenne pas
+-- une génération déjà vue.
+CREATE TABLE IF NOT EXISTS generation_donnees (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    valeur INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO generation_donnees (id, valeur)
+VALUES (1, CAST(strftime('%s', 'now') AS INTEGER) * 1000000);
+
+-- Clés phonétiques des noms et prénoms (recherche par variantes d'orthographe)
+-- rowid = personnel.id ; clés calculées en Python par phonetique.indexer_agents()
+-- (ETL), lignes retirées avec l'agent par le trigger ci-dessous
+CREATE VIRTUAL TABLE IF NOT EXISTS personnel_phonetique USING fts5(cles);
+
+-- Table des doublons potentiels du personnel (recalculée par l'ETL)
+CREATE TABLE IF NOT EXISTS doublons_personnel (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    personnel_id_1 INTEGER NOT NULL,
+    personnel_id_2 INTEGER NOT NULL,
+    score DECIMAL(4,3) NOT NULL,
+    motifs VARCHAR(200), -- cni, matricule, date_naissance, nom, phonetique
+    statut VARCHAR(20) DEFAULT 'a_verifier', -- a_verifier, confirme, rejete
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (personnel_id_1, personnel_id_2),
+    FOREIGN KEY (personnel_id_1) REFERENCES personnel(id),
+    FOREIGN KEY (personnel_id_2) REFERENCES personnel(id)
+);
+
+-- Table des anomalies de qualité (une ligne par règle enfreinte, recalculée par l'ETL)
+CREATE TABLE IF NOT EXISTS anomalies_qualite (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    table_source VARCHAR(50) NOT NULL, -- etablissements, personnel
+    ligne_id INTEGER NOT NULL,
+    regle VARCHAR(50) NOT NULL
+);
+
 -- Index pour améliorer les performances
 CREATE INDEX IF NOT EXISTS idx_personnel_matricule ON personnel(matricule);
 CREATE INDEX IF NOT EXISTS idx_personnel_etablissement ON personnel(etablissement_id);
 CREATE INDEX IF NOT EXISTS idx_etablissements_commune ON etablissements(commune_id);
 CREATE INDEX IF NOT EXISTS idx_etablissements_type ON etablissements(type_etablissement);
 CREATE INDEX IF NOT EXISTS idx_affectations_personnel ON affectations(personnel_id);
+CREATE INDEX IF NOT EXISTS idx_doublons_personnel_2 ON doublons_personnel(personnel_id_2);
+CREATE INDEX IF NOT EXISTS idx_doublons_score ON doublons_personnel(score);
+CREATE INDEX IF NOT EXISTS idx_anomalies_regle ON anomalies_qualite(table_source, regle, ligne_id);
+CREATE INDEX IF NOT EXISTS idx_anomalies_ligne ON anomalies_qualite(table_source, ligne_id);
+CREATE INDEX IF NOT EXISTS idx_etablissements_qualite ON etablissements(qualite_score);
+CREATE INDEX IF NOT EXISTS idx_personnel_qualite ON personnel(qualite_score);
+
+-- Maintien de la génération des données
+CREATE TRIGGER IF NOT EXISTS trg_generation_communes_insert AFTER INSERT ON communes
+BEGIN
+    UPDATE generation_donnees SET valeur = valeur + 1 WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_generation_communes_update AFTER UPDATE ON communes
+BEGIN
+    UPDATE generation_donnees SET valeur = valeur + 1 WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_generation_communes_delete AFTER DELETE ON communes
+BEGIN
+    UPDATE generation_donnees SET valeur = valeur + 1 WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_generation_etablissements_insert AFTER INSERT ON etablissements
+BEGIN
+    UPDATE generation_donnees SET valeur = valeur + 1 WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_generation_etablissements_update AFTER UPDATE ON etablissements
+BEGIN
+    UPDATE generation_donnees SET valeur = valeur + 1 WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_generation_etablissements_delete AFTER DELETE ON etablissements
+BEGIN
+    UPDATE generation_donnees SET valeur = valeur + 1 WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_generation_personnel_insert AFTER INSERT ON personnel
+BEGIN
+    UPDATE generation_donnees SET valeur = valeur + 1 WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_generation_personnel_update AFTER UPDATE ON personnel
+BEGIN
+    UPDATE generation_donnees SET valeur = valeur + 1 WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_generation_personnel_delete AFTER DELETE ON personnel
+BEGIN
+    UPDATE generation_donnees SET valeur = valeur + 1 WHERE id = 1;
+END;
+
+-- Clés phonétiques des agents supprimés
+CREATE TRIGGER IF NOT EXISTS trg_personnel_phonetique_delete AFTER DELETE ON personnel
+BEGIN
+    DELETE FROM personnel_phonetique WHERE rowid = OLD.id;
+END;
 
 -- Vues utiles
 CREATE VIEW IF NOT EXISTS vue_personnel_complet AS